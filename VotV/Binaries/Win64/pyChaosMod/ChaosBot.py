@@ -1,3 +1,4 @@
+import os
 import signal
 import sys
 from typing import Optional
@@ -5,12 +6,13 @@ from typing import Optional
 import asqlite
 from src.game_connection.websocket_handler import WebSocketHandler
 from src.hint_system import HintSystem
+from src.twitch.command_catalog import CommandCatalog
 from src.twitch.twitch_connection import TwitchConnection
 from src.voting_system import VotingSystem
 from src.email_system import EmailSystem
 from src.shop_system import ShopSystem
 from src.overlay.overlay_server import OverlayServer  # New import
-from src.utils.config import create_config_manager
+from src.utils.config import ConfigChange, create_config_manager
 import asyncio
 import traceback
 import logging
@@ -23,6 +25,9 @@ from src.utils.process import is_already_running
 setup_logging()
 logger = logging.getLogger(__name__)
 
+# Config sections the Twitch connection reads
+TWITCH_SECTIONS = ('twitch', 'chatShop', 'emails', 'hints')
+
 
 class ConnectionManager:
     def __init__(
@@ -31,13 +36,15 @@ class ConnectionManager:
         voting_system: VotingSystem,
         email_system: EmailSystem,
         shop_system: ShopSystem,
-        hint_system: HintSystem
+        hint_system: HintSystem,
+        command_catalog: CommandCatalog
     ):
         self.task_manager = task_manager
         self.voting_system = voting_system
         self.email_system = email_system
         self.shop_system = shop_system
         self.hint_system = hint_system
+        self.command_catalog = command_catalog
         
         self.twitch_connection = None
         self.direct_connection = None
@@ -74,7 +81,8 @@ class ConnectionManager:
             asyncio.create_task(
                 self.task_manager.start_task(
                     "websocket_server",
-                    self.websocket_handler.start
+                    self.websocket_handler.start,
+                    probe=self.websocket_handler.is_serving
                 )
             )
         )
@@ -85,12 +93,15 @@ class ConnectionManager:
         
         # Set the overlay server reference in voting system
         self.voting_system.set_overlay_server(self.overlay_server)
+        # Supervisor metrics are served on the overlay's /metrics
+        self.overlay_server.set_task_manager(self.task_manager)
         
         self.tasks.append(
             asyncio.create_task(
                 self.task_manager.start_task(
                     "overlay_server",
-                    self.overlay_server.start
+                    self.overlay_server.start,
+                    probe=self.overlay_server.is_accepting
                 )
             )
         )
@@ -108,13 +119,16 @@ class ConnectionManager:
         # Set the websocket handler if available
         if self.websocket_handler:
             self.twitch_connection.set_websocket_handler(self.websocket_handler)
+        self.twitch_connection.set_command_catalog(self.command_catalog)
 
         # Add the task to the task manager
         self.tasks.append(
             asyncio.create_task(
                 self.task_manager.start_task(
                     "twitch_mode",
-                    self.twitch_connection.start
+                    self.twitch_connection.start,
+                    probe=self.twitch_connection.is_healthy,
+                    depends_on=("websocket_server",)
                 )
             )
         )
@@ -125,27 +139,38 @@ class ConnectionManager:
         )
         if self.websocket_handler:
             self.direct_connection.set_websocket_handler(self.websocket_handler)
+        self.direct_connection.set_command_catalog(self.command_catalog)
         self.tasks.append(
             asyncio.create_task(
                 self.task_manager.start_task(
                     "direct_mode",
-                    self.direct_connection.start
+                    self.direct_connection.start,
+                    depends_on=("websocket_server",)
                 )
             )
         )
 
-    async def update_config(self, new_config):
+    async def update_config(self, new_config, change: Optional[ConfigChange] = None):
+        """Apply a config change to the connections. Without a change, every connection is updated."""
+        def changed(*sections):
+            return change is None or any(change.changed(section) for section in sections)
+
         old_twitch_enabled = self.twitch_connection is not None
         old_direct_enabled = self.direct_connection is not None
         new_twitch_enabled = new_config['twitch']['enabled']
         new_direct_enabled = new_config['direct']['enabled']
+        self.command_catalog.set_path(new_config['files']['commands'])
+        # Rewards depend on the channel_points settings and on the commands file
+        commands_changed = change is not None and os.path.basename(new_config['files']['commands']) in change.files
+        if commands_changed:
+            self.command_catalog.invalidate()
 
         # Update WebSocket server
-        if self.websocket_handler:
+        if self.websocket_handler and changed('websocket'):
             await self.websocket_handler.update_config(new_config)
             
         # Update overlay server
-        if self.overlay_server:
+        if self.overlay_server and changed('overlay'):
             await self.overlay_server.update_config(new_config)
 
         # Handle Twitch connection changes
@@ -169,9 +194,10 @@ class ConnectionManager:
                     self.direct_connection = None
 
         # Update existing connections
-        if self.direct_connection and new_direct_enabled:
+        if self.direct_connection and new_direct_enabled and changed('direct'):
             await self.direct_connection.update_config(new_config)
-        if self.twitch_connection and new_twitch_enabled:
+        if (self.twitch_connection and new_twitch_enabled
+                and (changed(*TWITCH_SECTIONS) or commands_changed)):
             await self.twitch_connection.update_config(new_config)
 
 async def main():
@@ -207,15 +233,14 @@ async def main():
         hint_system = HintSystem(config)
         voting_system = VotingSystem(config)
 
-        # Register systems for config updates
-        def update_systems(new_config):
-            email_system.update_config(new_config)
-            shop_system.update_config(new_config)
-            hint_system.update_config(new_config)
-            voting_system.update_config(new_config)
-            asyncio.create_task(connection_manager.update_config(new_config))
-        
-        config_manager.register_change_callback(update_systems)
+        # Register systems for the config sections they read
+        config_manager.subscribe(lambda change: email_system.update_config(change.config), section='emails')
+        config_manager.subscribe(lambda change: shop_system.update_config(change.config), section='chatShop')
+        config_manager.subscribe(lambda change: hint_system.update_config(change.config), section='hints')
+        config_manager.subscribe(lambda change: voting_system.update_config(change.config), section='voting')
+        config_manager.subscribe(
+            lambda change: asyncio.create_task(connection_manager.update_config(change.config, change))
+        )
 
         logger.info("Starting Connection")
 
@@ -238,9 +263,17 @@ async def main():
                 voting_system=voting_system,
                 email_system=email_system,
                 shop_system=shop_system,
-                hint_system=hint_system
+                hint_system=hint_system,
+                command_catalog=CommandCatalog(config['files']['commands'])
             )
             await connection_manager.initialize(config)
+
+            # Re-read the overlay stylesheet when it is edited
+            if connection_manager.overlay_server:
+                config_manager.register_file_callback(
+                    'styles.css',
+                    lambda: connection_manager.overlay_server.invalidate_assets('styles.css')
+                )
             # Wait for shutdown signal
             await shutdown_event.wait()
             
@@ -251,6 +284,7 @@ async def main():
         finally:
             logger.info("Shutting down task manager...")
             await task_manager.stop_all()
+            await asyncio.gather(email_system.close(), shop_system.close(), hint_system.close())
             logger.info("ChaosBot shutdown complete")
     except Exception as e:
         traceback.print_exc()
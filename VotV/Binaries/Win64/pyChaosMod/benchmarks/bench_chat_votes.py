@@ -0,0 +1,92 @@
+"""
+Chat vote parsing benchmark.
+
+Replays synthetic chat (mostly chatter, some votes in the accepted forms)
+through TwitchConnection.on_message with a stub voting system, with no
+vote open and with a vote open. Reports the per-message overhead next to
+the regex-and-int() version of on_message it replaced.
+
+Run from the pyChaosMod directory:
+    python -m benchmarks.bench_chat_votes
+"""
+import argparse
+import asyncio
+import random
+import re
+import time
+from types import SimpleNamespace
+
+from src.twitch.twitch_connection import TwitchConnection
+
+NUM_OPTIONS = 4
+CHATTER = [
+    "LUL", "KEKW", "what is this game", "@streamer hi!!", "PogChamp PogChamp", "gg", "is that a kerfur?",
+    "Pog", "lmao", "this is fine", "o7", "!shop pizza", "first time here", "2 spooky", "omegalul 10/10",
+]
+VOTE_FORMS = ["{}", "#{}", "{}!", "option {}", "{} "]
+
+
+class StubVotingSystem:
+    def __init__(self, accepting):
+        self.accepting_votes = accepting
+        self.counted = 0
+
+    def process_vote(self, voter_id, vote):
+        self.counted += 1
+
+
+def build_chat(count, vote_ratio, seed):
+    rng = random.Random(seed)
+    messages = []
+    for i in range(count):
+        if rng.random() < vote_ratio:
+            text = rng.choice(VOTE_FORMS).format(rng.randint(1, NUM_OPTIONS))
+        else:
+            text = rng.choice(CHATTER)
+        messages.append(SimpleNamespace(text=text, user=SimpleNamespace(id=str(10_000_000 + i))))
+    return messages
+
+
+VOTE_PATTERN = re.compile(r"^\d+\s*$")
+
+
+async def regex_on_message(bot, msg):
+    """on_message before the fast path: a regex and int() for every message, vote open or not."""
+    if VOTE_PATTERN.search(msg.text):
+        bot.voting_system.process_vote(msg.user.id, int(msg.text))
+
+
+async def time_on_message(on_message, messages, accepting):
+    bot = SimpleNamespace(voting_system=StubVotingSystem(accepting))
+    start = time.perf_counter()
+    for msg in messages:
+        await on_message(bot, msg)
+    return time.perf_counter() - start, bot.voting_system.counted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200_000)
+    parser.add_argument('--votes', type=float, default=0.3, help="Fraction of chat messages that are votes")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    messages = build_chat(args.messages, args.votes, seed=args.messages)
+    runs = [
+        ("before", lambda: time_on_message(regex_on_message, messages, True)),
+        ("no vote open", lambda: time_on_message(TwitchConnection.on_message, messages, False)),
+        ("vote open", lambda: time_on_message(TwitchConnection.on_message, messages, True)),
+    ]
+    print(f"{len(messages):,} messages, {args.votes:.0%} votes")
+    print(f"{'path':>14} {'ns/msg':>10} {'counted':>9}")
+    for name, run in runs:
+        best = float('inf')
+        counted = 0
+        for _ in range(args.repeat):
+            elapsed, counted = asyncio.run(run())
+            best = min(best, elapsed)
+        print(f"{name:>14} {best / len(messages) * 1e9:>10.1f} {counted:>9,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Game message router throughput benchmark.
+
+Feeds raw frames through WebSocketHandler.route_message with a fake game
+connection and stub systems, and reports messages per second for a
+connection_test ping flood and for a mix of message types.
+
+Run from the pyChaosMod directory:
+    python -m benchmarks.bench_game_router
+"""
+import argparse
+import asyncio
+import time
+
+from src.game_connection.sessions import GameSession
+from src.game_connection.websocket_handler import WebSocketHandler
+from src.utils import jsonlib
+
+WORKLOADS = {
+    'ping': ['{"type":"connection_test"}'],
+    'mixed': [
+        '{"type":"connection_test"}',
+        '{"type":"connection_test"}',
+        '{"type":"connection_test"}',
+        '{"type":"voting_started","num_options":4,"option_names":["a","b","c","d"]}',
+        '{"type":"vote_snapshot_request"}',
+        '{"type":"voting_ended"}',
+        '{"type":"shop_open"}',
+        '{"type":"shop_close"}',
+        '{"type":"unknown_event","value":1}',
+    ],
+}
+
+
+class FakeGameConnection:
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, payload):
+        self.sent += 1
+
+
+class StubVotingSystem:
+    def set_voting_active(self, active, num_options=0, option_names=None, session=None):
+        pass
+
+    def request_snapshot(self, session=None):
+        pass
+
+
+class StubShopSystem:
+    def set_shop_open(self, is_open, session=None):
+        pass
+
+
+async def run_workload(frames, count):
+    handler = WebSocketHandler({'websocket': {'replay_queue': False}}, None, StubShopSystem(), None, StubVotingSystem())
+    session = GameSession('bench', FakeGameConnection())
+    route_message = handler.route_message
+    stream = (frames * (count // len(frames) + 1))[:count]
+
+    start = time.perf_counter()
+    for frame in stream:
+        await route_message(session, frame)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"JSON backend: {jsonlib.BACKEND}")
+    print(f"{'workload':>10} {'best ms':>10} {'msgs/s':>14}")
+    for name, frames in WORKLOADS.items():
+        best = min(asyncio.run(run_workload(frames, args.messages)) for _ in range(args.repeat))
+        print(f"{name:>10} {best * 1000:>10.2f} {args.messages / best:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Channel point redemption dispatch benchmark.
+
+Registers hundreds of chaos command rewards on a ChannelPointsMixin with
+stubbed handlers and Twitch calls, then feeds redemption events through
+on_channel_points_redemption_add. Reports per-redemption latency next to
+the linear scan over self.rewards that dispatch used to do.
+
+Run from the pyChaosMod directory:
+    python -m benchmarks.bench_redemption_dispatch
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from types import SimpleNamespace
+
+from src.twitch.channel_points_mixin import ChannelPointsMixin
+
+
+class BenchChannelPoints(ChannelPointsMixin):
+    def __init__(self, num_rewards):
+        self.logger = logging.getLogger(__name__)
+        self.rewards = {}
+        self.reward_index = {}
+        self.handled = 0
+        for i in range(num_rewards):
+            self.add_reward(f"command_{i}", {'id': f"reward-{i:08x}", 'title': f"Command {i}", 'cost': 100})
+
+    async def chaos_command_channel_points(self, redemption, command_id):
+        self.handled += 1
+
+    async def refund_redemption(self, redemption):
+        pass
+
+
+def build_events(num_rewards, count, seed):
+    rng = random.Random(seed)
+    return [
+        SimpleNamespace(event=SimpleNamespace(
+            id=f"redemption-{i}",
+            user_name="viewer",
+            user_input="",
+            reward=SimpleNamespace(id=f"reward-{rng.randrange(num_rewards):08x}"),
+        ))
+        for i in range(count)
+    ]
+
+
+def linear_scan(rewards, reward_id):
+    """The reward lookup dispatch did before the reward index."""
+    for cmd_id, reward in rewards.items():
+        if reward.get('id') == reward_id:
+            return cmd_id
+    return None
+
+
+async def time_dispatch(bot, events):
+    dispatch = bot.on_channel_points_redemption_add
+    start = time.perf_counter()
+    for event in events:
+        await dispatch(event)
+    return time.perf_counter() - start
+
+
+def time_linear_scan(bot, events):
+    rewards = bot.rewards
+    start = time.perf_counter()
+    for event in events:
+        linear_scan(rewards, event.event.reward.id)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rewards', type=int, nargs='+', default=[50, 200, 500, 1000])
+    parser.add_argument('--redemptions', type=int, default=20_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rewards':>8} {'dispatch us':>12} {'scan only us':>13}")
+    for num_rewards in args.rewards:
+        bot = BenchChannelPoints(num_rewards)
+        events = build_events(num_rewards, args.redemptions, seed=num_rewards)
+        dispatch = min(asyncio.run(time_dispatch(bot, events)) for _ in range(args.repeat))
+        scan = min(time_linear_scan(bot, events) for _ in range(args.repeat))
+        assert bot.handled == args.redemptions * args.repeat
+        print(f"{num_rewards:>8} {dispatch / len(events) * 1e6:>12.2f} {scan / len(events) * 1e6:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
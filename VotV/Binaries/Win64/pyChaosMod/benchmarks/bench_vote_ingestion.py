@@ -0,0 +1,70 @@
+"""
+Vote ingestion throughput benchmark.
+
+Replays one second of synthetic chat at several vote rates through
+VotingSystem.process_vote, committing the tally every 100 ms like the
+update loop does, and reports how much of the one second budget was used.
+
+Run from the pyChaosMod directory:
+    python -m benchmarks.bench_vote_ingestion
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from src.voting_system import VotingSystem
+
+NUM_OPTIONS = 4
+COMMITS_PER_SECOND = 10
+
+
+def build_burst(rate, duplicate_ratio, seed):
+    """Build (voter_id, vote) pairs for one second of chat at the given rate."""
+    rng = random.Random(seed)
+    unique_voters = max(1, int(rate * (1 - duplicate_ratio)))
+    voter_ids = [str(10_000_000 + i) for i in range(unique_voters)]
+    return [(rng.choice(voter_ids), rng.randint(1, NUM_OPTIONS + 1)) for _ in range(rate)]
+
+
+async def run_burst(burst):
+    voting_system = VotingSystem({})
+    voting_system.set_voting_active(True, NUM_OPTIONS)
+    # Commits are driven by hand below
+    voting_system.stop_vote_updates()
+
+    process_vote = voting_system.process_vote
+    commit = voting_system.tally.commit
+    chunk = max(1, len(burst) // COMMITS_PER_SECOND)
+
+    start = time.perf_counter()
+    for offset in range(0, len(burst), chunk):
+        for voter_id, vote in burst[offset:offset + chunk]:
+            process_vote(voter_id, vote)
+        commit()
+    elapsed = time.perf_counter() - start
+    return elapsed, voting_system.tally.total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rates', type=int, nargs='+', default=[10_000, 25_000, 50_000, 100_000],
+                        help="Votes per second to replay")
+    parser.add_argument('--duplicates', type=float, default=0.3,
+                        help="Fraction of votes that come from users who already voted")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rate/s':>10} {'best ms':>10} {'votes/s':>14} {'budget':>8} {'counted':>9}")
+    for rate in args.rates:
+        burst = build_burst(rate, args.duplicates, seed=rate)
+        best = float('inf')
+        counted = 0
+        for _ in range(args.repeat):
+            elapsed, counted = asyncio.run(run_burst(burst))
+            best = min(best, elapsed)
+        print(f"{rate:>10} {best * 1000:>10.2f} {rate / best:>14,.0f} {best:>7.1%} {counted:>9}")
+
+
+if __name__ == "__main__":
+    main()
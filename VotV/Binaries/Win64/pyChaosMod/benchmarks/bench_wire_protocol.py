@@ -0,0 +1,82 @@
+"""
+Game wire protocol benchmark.
+
+Builds the traffic of a typical vote session (vote updates every 100 ms,
+a full snapshot every 5 s, chaos commands and connection_test pings),
+then encodes and decodes it with each codec and reports the cost and the
+bytes that go over the wire.
+
+Run from the pyChaosMod directory:
+    python -m benchmarks.bench_wire_protocol
+"""
+import argparse
+import random
+import time
+
+from src.game_connection.codec import COMPACT, JSON
+from src.utils import jsonlib
+
+UPDATES_PER_SECOND = 10
+SNAPSHOT_INTERVAL = 5
+
+
+def build_session(duration, num_options, votes_per_second, seed):
+    """Build the messages exchanged during one vote session of duration seconds."""
+    rng = random.Random(seed)
+    counts = [0] * num_options
+    messages = []
+    for tick in range(duration * UPDATES_PER_SECOND):
+        changed = set()
+        for _ in range(votes_per_second // UPDATES_PER_SECOND):
+            option = rng.randrange(num_options)
+            counts[option] += 1
+            changed.add(option)
+        if tick % (SNAPSHOT_INTERVAL * UPDATES_PER_SECOND) == 0:
+            messages.append({"type": "vote_update", "seq": tick + 1, "votes": list(counts)})
+        elif changed:
+            messages.append({"type": "vote_delta", "seq": tick + 1,
+                             "changes": [[i, counts[i]] for i in sorted(changed)]})
+        if tick % UPDATES_PER_SECOND == 0:
+            messages.append({"type": "connection_test"})
+        if rng.random() < 0.02:
+            messages.append({"type": "trigger_chaos", "command": f"chaos_{rng.randrange(200)}",
+                             "timestamp": time.time()})
+    return messages
+
+
+def measure(codec, messages, repeat):
+    best_encode = best_decode = float('inf')
+    frames = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frames = [codec.encode(message) for message in messages]
+        best_encode = min(best_encode, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for frame in frames:
+            codec.decode(frame)
+        best_decode = min(best_decode, time.perf_counter() - start)
+
+    wire_bytes = sum(len(frame.encode('utf-8')) if isinstance(frame, str) else len(frame) for frame in frames)
+    return best_encode, best_decode, wire_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=int, default=60, help="Vote session length in seconds")
+    parser.add_argument('--options', type=int, default=4)
+    parser.add_argument('--votes', type=int, default=500, help="Votes per second")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    messages = build_session(args.duration, args.options, args.votes, seed=args.duration)
+    print(f"{len(messages)} messages, JSON backend: {jsonlib.BACKEND}")
+    print(f"{'codec':>8} {'encode us/msg':>14} {'decode us/msg':>14} {'bytes':>10} {'bytes/msg':>10}")
+    for codec in (JSON, COMPACT):
+        encode, decode, wire_bytes = measure(codec, messages, args.repeat)
+        print(f"{codec.name:>8} {encode / len(messages) * 1e6:>14.3f} {decode / len(messages) * 1e6:>14.3f} "
+              f"{wire_bytes:>10,} {wire_bytes / len(messages):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Chat replay harness and load generator for the Twitch pipeline.
+
+Drives a real TwitchConnection, with the real voting, shop, email and hint
+systems, chat scheduler and redemption batcher, from a local event source
+instead of a live channel. Chat messages go to on_message and, for !shop,
+!email and !hint, to the command handler as well, each in its own task like
+twitchAPI's Chat does. Channel point redemptions go to
+on_channel_points_redemption_add like EventSub does. The game, chat and
+Helix ends are stand-ins that only count what reaches them.
+
+Events come from a recorded log or are generated at a given rate. Reports
+throughput, p50/p99 handling latency (from when an event was due to when
+its handler finished) and the game messages, chat messages and Helix calls
+the load produced.
+
+Run from the pyChaosMod directory:
+    python -m benchmarks.chat_replay --rate 2000 --duration 10
+    python -m benchmarks.chat_replay --rate 5000 --duration 30 --record raid.jsonl
+    python -m benchmarks.chat_replay --log raid.jsonl --speed 4
+
+Log format, one JSON object per line, t in seconds from the start:
+    {"t": 0.12, "type": "chat", "user": "viewer1", "text": "!shop pizza"}
+    {"t": 0.30, "type": "redemption", "user": "viewer2", "reward": "chatShop_points", "input": "pizza"}
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+
+from src.email_system import EmailSystem
+from src.hint_system import HintSystem
+from src.shop_system import ShopSystem
+from src.twitch.redemption_batcher import RedemptionBatcher
+from src.twitch.twitch_connection import TwitchConnection
+from src.voting_system import VotingSystem
+
+CHANNEL = "replaychannel"
+NUM_OPTIONS = 4
+NUM_CHAOS_COMMANDS = 50
+SPECIAL_REWARDS = ('emails_points', 'chatShop_points', 'hints_points')
+COMMANDS = {'shop': 'shop_command', 'email': 'email_command', 'hint': 'hint_command'}
+
+CHATTER = [
+    "LUL", "KEKW", "what is this game", "@streamer hi!!", "PogChamp PogChamp", "gg", "is that a kerfur?",
+    "Pog", "lmao", "this is fine", "o7", "first time here", "2 spooky", "RAID HYPE",
+]
+SHOP_ITEMS = ["pizza", "coffee", "battery", "kerfur", "screwdriver"]
+
+
+class FakeGame:
+    """Stands in for WebSocketHandler, counting the messages that would go to the game."""
+
+    def __init__(self):
+        self.messages = Counter()
+
+    async def send_to_game(self, message, priority=None, coalesce_key=None, ttl=None, session=None, broadcast=None):
+        self.messages[message.get('type', '?')] += 1
+        return True
+
+    async def process_chaos_command(self, command_type, command):
+        self.messages[command_type] += 1
+
+
+class FakeChat:
+    """Stands in for twitchAPI's Chat on the sending side."""
+
+    def __init__(self, moderator):
+        self.moderator = moderator
+        self.sent = 0
+
+    def is_ready(self):
+        return True
+
+    def is_mod(self, room):
+        return self.moderator
+
+    async def send_message(self, room, text):
+        self.sent += 1
+
+    async def send_raw_irc_message(self, message):
+        self.sent += 1
+
+
+class FakeHelix:
+    """Stands in for the Twitch API client, counting redemption status calls."""
+
+    def __init__(self):
+        self.status_calls = 0
+
+    async def update_redemption_status(self, broadcaster_id, reward_id, redemption_ids, status):
+        self.status_calls += 1
+
+
+def build_config():
+    return {
+        'twitch': {'app_id': 'replay', 'app_secret': 'replay', 'channel': CHANNEL, 'channel_points': True},
+        'chatShop': {'enabled': True, 'channel_points': False, 'usercooldown': 300,
+                     'announcement_message': "The shop is open for {duration} seconds!", 'open_duration': 60},
+        'emails': {'enabled': True, 'channel_points': False, 'user_cooldown': 60},
+        'hints': {'enabled': True, 'channel_points': False, 'user_cooldown': 60},
+        'files': {},
+    }
+
+
+def generate_events(rate, duration, redemption_ratio, command_ratio, vote_ratio, viewers, seed):
+    """Generate a synthetic chat log of rate events per second for duration seconds."""
+    rng = random.Random(seed)
+    events = []
+    for i in range(int(rate * duration)):
+        t = i / rate
+        user = f"viewer{rng.randrange(viewers)}"
+        roll = rng.random()
+        if roll < redemption_ratio:
+            if rng.random() < 0.7:
+                events.append({'t': t, 'type': 'redemption', 'user': user,
+                               'reward': f"chaos_{rng.randrange(NUM_CHAOS_COMMANDS)}", 'input': ""})
+            else:
+                reward = rng.choice(SPECIAL_REWARDS)
+                text = rng.choice(SHOP_ITEMS) if reward == 'chatShop_points' else "hello from chat"
+                events.append({'t': t, 'type': 'redemption', 'user': user, 'reward': reward, 'input': text})
+        elif roll < redemption_ratio + command_ratio:
+            command = rng.choice(list(COMMANDS))
+            argument = rng.choice(SHOP_ITEMS) if command == 'shop' else "hello from chat"
+            events.append({'t': t, 'type': 'chat', 'user': user, 'text': f"!{command} {argument}"})
+        elif roll < redemption_ratio + command_ratio + vote_ratio:
+            events.append({'t': t, 'type': 'chat', 'user': user, 'text': str(rng.randint(1, NUM_OPTIONS))})
+        else:
+            events.append({'t': t, 'type': 'chat', 'user': user, 'text': rng.choice(CHATTER)})
+    return events
+
+
+def load_events(path):
+    with open(path, 'r') as f:
+        return sorted((json.loads(line) for line in f if line.strip()), key=lambda event: event['t'])
+
+
+def save_events(path, events):
+    with open(path, 'w') as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+
+
+class ReplayHarness:
+    """A TwitchConnection wired to the stand-ins, and the latencies measured while replaying into it."""
+
+    def __init__(self, args):
+        config = build_config()
+        self.voting_system = VotingSystem(config)
+        self.email_system = EmailSystem(config)
+        self.shop_system = ShopSystem(config)
+        self.hint_system = HintSystem(config)
+        self.game = FakeGame()
+        self.helix = FakeHelix()
+        self.chat = FakeChat(args.moderator)
+        for system in (self.voting_system, self.email_system, self.shop_system, self.hint_system):
+            system.set_websocket_handler(self.game)
+
+        self.bot = TwitchConnection(config, self.voting_system, self.email_system, self.shop_system,
+                                    self.hint_system)
+        self.bot.set_websocket_handler(self.game)
+        self.bot.twitch = self.helix
+        self.bot.chat = self.chat
+        self.bot.channel_id = "1"
+        self.bot.is_connected = True
+        for key in SPECIAL_REWARDS + tuple(f"chaos_{i}" for i in range(NUM_CHAOS_COMMANDS)):
+            self.bot.add_reward(key, {'id': f"reward-{key}", 'title': key})
+
+        self.latencies = defaultdict(list)
+        self.redemption_ids = 0
+
+    async def start(self):
+        self.bot.chat_scheduler = self.bot.create_chat_scheduler()
+        self.bot.chat_scheduler.start()
+        self.bot.redemption_batcher = RedemptionBatcher(self.helix, "1", window=0.5)
+        self.email_system.enable_emails()
+        self.shop_system.set_shop_open(True)
+        self.voting_system.set_voting_active(True, NUM_OPTIONS)
+
+    async def close(self):
+        self.voting_system.set_voting_active(False)
+        self.voting_system.stop_vote_updates()
+        await self.bot.close_redemption_batcher()
+        await self.bot.chat_scheduler.close()
+
+    def dispatch(self, event, due):
+        """Hand an event to its handlers the way Chat and EventSub do, one task per handler."""
+        user = SimpleNamespace(id=str(abs(hash(event['user']))), name=event['user'])
+        if event['type'] == 'redemption':
+            self.redemption_ids += 1
+            redemption = SimpleNamespace(
+                id=f"redemption-{self.redemption_ids}",
+                user_name=event['user'],
+                user_input=event.get('input', ""),
+                reward=SimpleNamespace(id=f"reward-{event['reward']}")
+            )
+            return [self._run('redemption', self.bot.on_channel_points_redemption_add(
+                SimpleNamespace(event=redemption)), due)]
+
+        text = event['text']
+        message = SimpleNamespace(id=f"msg-{due}", text=text, user=user)
+        tasks = [self._run('chat', self.bot.on_message(message), due)]
+        if text.startswith('!'):
+            command = text[1:].split(maxsplit=1)[0].lower()
+            if command in COMMANDS:
+                handler = getattr(self.bot, COMMANDS[command])
+                tasks.append(self._run(f"!{command}", handler(message), due))
+        return tasks
+
+    def _run(self, kind, coroutine, due):
+        async def timed():
+            await coroutine
+            self.latencies[kind].append(time.perf_counter() - due)
+        return asyncio.create_task(timed())
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def replay(args, events):
+    harness = ReplayHarness(args)
+    await harness.start()
+
+    tasks = []
+    start = time.perf_counter()
+    for event in events:
+        due = start + event['t'] / args.speed
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.extend(harness.dispatch(event, due))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    counted_votes = harness.voting_system.tally.total
+    pending_chat = harness.bot.chat_scheduler.pending()
+    chat_metrics = harness.bot.chat_scheduler.get_metrics()
+    await harness.close()
+
+    print(f"{len(events):,} events in {elapsed:.2f}s: {len(events) / elapsed:,.0f} events/s")
+    print(f"{'handler':>12} {'count':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for kind, values in sorted(harness.latencies.items()):
+        print(f"{kind:>12} {len(values):>9,} {percentile(values, 0.5) * 1000:>9.3f} "
+              f"{percentile(values, 0.99) * 1000:>9.3f} {max(values) * 1000:>9.3f}")
+    print(f"votes counted: {counted_votes:,}")
+    print(f"game messages: {dict(harness.game.messages)}")
+    print(f"chat: {harness.chat.sent} sent, {pending_chat} still queued, {chat_metrics['dropped']} dropped, "
+          f"{chat_metrics['batched']} replies batched")
+    print(f"helix redemption status calls: {harness.helix.status_calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--log', help="Replay this recorded log instead of generating events")
+    parser.add_argument('--record', help="Write the generated events to this log file")
+    parser.add_argument('--speed', type=float, default=1.0, help="Replay speed multiplier")
+    parser.add_argument('--rate', type=float, default=1000, help="Generated events per second")
+    parser.add_argument('--duration', type=float, default=10, help="Generated seconds of chat")
+    parser.add_argument('--viewers', type=int, default=10_000)
+    parser.add_argument('--redemptions', type=float, default=0.02, help="Fraction of events that are redemptions")
+    parser.add_argument('--commands', type=float, default=0.05, help="Fraction that are !shop/!email/!hint")
+    parser.add_argument('--votes', type=float, default=0.3, help="Fraction that are votes")
+    parser.add_argument('--moderator', action='store_true', help="Use the moderator chat rate limit")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--log-level', default='ERROR')
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+
+    if args.log:
+        events = load_events(args.log)
+    else:
+        events = generate_events(args.rate, args.duration, args.redemptions, args.commands, args.votes,
+                                 args.viewers, args.seed)
+        if args.record:
+            save_events(args.record, events)
+    asyncio.run(replay(args, events))
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,7 @@ class DirectModeHandler:
         self.session_key = None
         self.captcha_verified = False
         self.websocket_handler = None
+        self.command_catalog = None
         
         # Connection management variables
         self.reconnect_attempts = 0
@@ -38,6 +39,9 @@ class DirectModeHandler:
     def set_websocket_handler(self, websocket_handler):
         self.websocket_handler = websocket_handler
 
+    def set_command_catalog(self, command_catalog):
+        self.command_catalog = command_catalog
+
     async def start(self):
         """Establishes a WebSocket connection to the Chaos control panel."""
         if self._is_running:
@@ -284,6 +288,12 @@ class DirectModeHandler:
             if not hasattr(self.websocket_handler, 'process_chaos_command'):
                 logger.error("WebSocket handler doesn't have process_chaos_command method")
                 return
+
+            # The panel may send a command's title, the game only knows IDs
+            if command_type == "trigger_chaos" and self.command_catalog and command:
+                chaos_command = self.command_catalog.find(command)
+                if chaos_command:
+                    command = chaos_command.id
                 
             await self.websocket_handler.process_chaos_command(command_type, command)
         except Exception as e:
@@ -1,14 +1,21 @@
 import logging
 import time
-import json
 import asyncio
 
+from src.utils.config_schema import get_settings
+from src.utils.cooldowns import CooldownStore
+
 class EmailSystem:
     def __init__(self, config):
         self.config = config
+        self.settings = get_settings(config).emails
         self.emails_enabled = False
-        self.email_cooldowns = {}
-        self.email_cooldown_time = config['emails']['user_cooldown']
+        self.email_cooldown_time = self.settings.user_cooldown
+        self.email_cooldowns = CooldownStore(
+            self.email_cooldown_time,
+            state_file=(config.get('files', {}).get('emails_cooldowns', 'emails_cooldowns.json')
+                        if self.settings.persist_cooldowns else None)
+        )
         self.twitch_connection = None
         self.direct_connection = None
         self.websocket_handler = None
@@ -48,23 +55,21 @@ class EmailSystem:
 
         if ctx is not None:
             # Check if the user is on cooldown
-            if twitch_user in self.email_cooldowns:
-                time_since_last_email = current_time - self.email_cooldowns[twitch_user]
-                if time_since_last_email < self.email_cooldown_time:
-                    remaining_cooldown = int(self.email_cooldown_time - time_since_last_email)
-                    cooldown_message = f"You're on cooldown. You can send another email in {remaining_cooldown} seconds."
-                    await self.twitch_connection.reply(ctx, cooldown_message)
-                    return
+            remaining_cooldown = int(self.email_cooldowns.remaining(twitch_user, current_time))
+            if remaining_cooldown > 0:
+                cooldown_message = f"You're on cooldown. You can send another email in {remaining_cooldown} seconds."
+                await self.twitch_connection.reply(ctx, cooldown_message, notice="email_cooldown")
+                return
 
         # If not on cooldown, send the email through WebSocket
         await self.send_email(twitch_user, subject, body, user)
         
         if ctx is not None:
-            self.email_cooldowns[twitch_user] = current_time
+            self.email_cooldowns.start(twitch_user, current_time)
 
     async def send_email(self, twitch_user, subject, body, user="user"):
         """Send email through WebSocket connection."""
-        if self.websocket_handler and self.websocket_handler.game_connection:
+        if self.websocket_handler:
             email_data = {
                 "type": "email",
                 "data": {
@@ -77,8 +82,10 @@ class EmailSystem:
             }
             
             try:
-                await self.websocket_handler.game_connection.send(json.dumps(email_data))
-                self.logger.debug(f"Email sent for {twitch_user}")
+                if await self.websocket_handler.send_to_game(email_data):
+                    self.logger.debug(f"Email sent for {twitch_user}")
+                else:
+                    self.logger.error("Failed to send email through WebSocket: game is not connected")
             except Exception as e:
                 self.logger.error(f"Failed to send email through WebSocket: {e}")
         else:
@@ -93,19 +100,18 @@ class EmailSystem:
         self.logger.info("Emails disabled")
 
     def are_emails_enabled(self):
+        # With Twitch connected, the config decides
+        if self.twitch_connection is not None:
+            return self.settings.enabled
         return self.emails_enabled
 
+    async def close(self):
+        """Save cooldowns still waiting to be written."""
+        await self.email_cooldowns.flush()
+
     def update_config(self, config):
         self.config = config
-        self.email_cooldown_time = config['emails']['user_cooldown']
-        self.emails_enabled = config['emails']['enabled']
-
-    def update(self):
-        if self.twitch_connection is not None:
-            self.emails_enabled = self.config.get('emails', {}).get('enabled', False)
-        
-        # Clean up expired cooldowns
-        current_time = time.time()
-        for twitch_user, cooldown_time in list(self.email_cooldowns.items()):
-            if current_time - cooldown_time >= self.email_cooldown_time:
-                del self.email_cooldowns[twitch_user]
\ No newline at end of file
+        self.settings = get_settings(config).emails
+        self.email_cooldown_time = self.settings.user_cooldown
+        self.email_cooldowns.duration = self.email_cooldown_time
+        self.emails_enabled = self.settings.enabled
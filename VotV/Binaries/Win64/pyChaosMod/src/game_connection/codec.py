@@ -0,0 +1,141 @@
+"""
+Wire encodings for the game WebSocket.
+
+JSON text frames are always understood. A game that advertises the
+"compact" capability also gets the high-volume messages as binary frames
+with a fixed layout. All integers are little endian, and every frame
+starts with a one byte kind:
+
+    1 vote_update          u32 seq, u8 n, n * u32 votes
+    2 vote_delta           u32 seq, u8 n, n * (u8 option index, u32 votes)
+    3 chaos command        u8 command type, f64 timestamp, u16 length, utf-8 command
+    4 connection_test      (no body)
+    5 connection_test_succ (no body)
+
+Messages without a binary layout, or whose values don't fit it, are still
+sent as JSON text frames.
+"""
+import struct
+from typing import Union
+
+from src.utils import jsonlib
+
+KIND_VOTE_UPDATE = 1
+KIND_VOTE_DELTA = 2
+KIND_CHAOS = 3
+KIND_CONNECTION_TEST = 4
+KIND_CONNECTION_TEST_SUCC = 5
+
+# Command types with a binary layout, by their code on the wire
+CHAOS_COMMAND_TYPES = ('trigger_chaos', 'trigger_event')
+_CHAOS_COMMAND_CODES = {name: code for code, name in enumerate(CHAOS_COMMAND_TYPES)}
+
+_HEADER = struct.Struct('<BIB')  # kind, seq, count
+_CHAOS = struct.Struct('<BBdH')  # kind, command type, timestamp, command length
+_DELTA_ENTRY = struct.Struct('<BI')
+
+PING_FRAME = bytes((KIND_CONNECTION_TEST,))
+PONG_FRAME = bytes((KIND_CONNECTION_TEST_SUCC,))
+
+Frame = Union[str, bytes]
+
+
+class JsonCodec:
+    """Plain JSON text frames, understood by every game build."""
+
+    name = 'json'
+
+    def encode(self, message: dict) -> Frame:
+        # Exactly what the game has always been sent, its parser isn't known to take anything else
+        return jsonlib.dumps_ascii(message)
+
+    def decode(self, frame: Frame) -> dict:
+        """Decode a frame. Raises ValueError if it is malformed."""
+        return jsonlib.loads(frame)
+
+
+class CompactCodec(JsonCodec):
+    """Binary frames for vote updates and chaos commands, JSON for everything else."""
+
+    name = 'compact'
+
+    def __init__(self):
+        self._encoders = {
+            'vote_update': self._encode_vote_update,
+            'vote_delta': self._encode_vote_delta,
+            'connection_test': lambda message: PING_FRAME,
+            'connection_test_succ': lambda message: PONG_FRAME,
+        }
+        for command_type in CHAOS_COMMAND_TYPES:
+            self._encoders[command_type] = self._encode_chaos
+
+    def encode(self, message: dict) -> Frame:
+        encoder = self._encoders.get(message.get('type'))
+        if encoder is not None:
+            try:
+                return encoder(message)
+            except (struct.error, KeyError, TypeError, ValueError):
+                # Values that don't fit the layout fall back to JSON
+                pass
+        # A game that negotiated compact frames also takes compact, UTF-8 JSON
+        return jsonlib.dumps(message)
+
+    @staticmethod
+    def _encode_vote_update(message):
+        votes = message['votes']
+        return _HEADER.pack(KIND_VOTE_UPDATE, message['seq'], len(votes)) + struct.pack(f'<{len(votes)}I', *votes)
+
+    @staticmethod
+    def _encode_vote_delta(message):
+        changes = message['changes']
+        frame = bytearray(_HEADER.pack(KIND_VOTE_DELTA, message['seq'], len(changes)))
+        for index, votes in changes:
+            frame += _DELTA_ENTRY.pack(index, votes)
+        return bytes(frame)
+
+    @staticmethod
+    def _encode_chaos(message):
+        command = str(message['command']).encode('utf-8')
+        return _CHAOS.pack(KIND_CHAOS, _CHAOS_COMMAND_CODES[message['type']],
+                           message.get('timestamp', 0.0), len(command)) + command
+
+    def decode(self, frame: Frame) -> dict:
+        if isinstance(frame, str):
+            return jsonlib.loads(frame)
+        try:
+            return self._decode_binary(frame)
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            raise ValueError(f"Malformed binary frame: {e}") from e
+
+    @staticmethod
+    def _decode_binary(frame: bytes) -> dict:
+        kind = frame[0]
+        if kind == KIND_CONNECTION_TEST:
+            return {"type": "connection_test"}
+        if kind == KIND_CONNECTION_TEST_SUCC:
+            return {"type": "connection_test_succ"}
+        if kind == KIND_VOTE_UPDATE:
+            _, seq, count = _HEADER.unpack_from(frame)
+            return {"type": "vote_update", "seq": seq,
+                    "votes": list(struct.unpack_from(f'<{count}I', frame, _HEADER.size))}
+        if kind == KIND_VOTE_DELTA:
+            _, seq, count = _HEADER.unpack_from(frame)
+            changes = [list(_DELTA_ENTRY.unpack_from(frame, _HEADER.size + i * _DELTA_ENTRY.size))
+                       for i in range(count)]
+            return {"type": "vote_delta", "seq": seq, "changes": changes}
+        if kind == KIND_CHAOS:
+            _, code, timestamp, length = _CHAOS.unpack_from(frame)
+            command = frame[_CHAOS.size:_CHAOS.size + length].decode('utf-8')
+            return {"type": CHAOS_COMMAND_TYPES[code], "command": command, "timestamp": timestamp}
+        raise ValueError(f"Unknown binary frame kind {kind}")
+
+
+JSON = JsonCodec()
+COMPACT = CompactCodec()
+
+
+def negotiate(capabilities, allow_compact=True) -> JsonCodec:
+    """Pick the encoding for a game from the capabilities it advertised."""
+    if allow_compact and capabilities and 'compact' in capabilities:
+        return COMPACT
+    return JSON
@@ -0,0 +1,342 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import List, Optional
+
+from src.game_connection.codec import COMPACT, JSON
+from src.utils import jsonlib
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, drained lowest number first
+PRIORITY_CHAOS = 0
+PRIORITY_VOTES = 1
+PRIORITY_NORMAL = 2
+
+
+def encode_message(message) -> str:
+    """Serialize a message as a JSON text frame, which every game build understands."""
+    return jsonlib.dumps_ascii(message)
+
+
+class OutboundMessage:
+    """A serialized message waiting in a bus lane."""
+
+    __slots__ = ('payload', 'priority', 'ttl', 'coalesce_key', 'replay_id')
+
+    def __init__(self, payload, priority: int, ttl: Optional[float] = None, coalesce_key: Optional[str] = None,
+                 replay_id: Optional[int] = None):
+        self.payload = payload  # str for text frames, bytes for binary frames
+        self.priority = priority
+        self.ttl = ttl  # Seconds to keep for replay if undeliverable; None keeps it, 0 never replays
+        self.coalesce_key = coalesce_key
+        self.replay_id = replay_id  # Replay queue row this came from, stored back under it if undelivered
+
+
+class GameMessageBus:
+    """
+    Single outbound path from ChaosBot to the game.
+
+    Messages are serialized once and queued in priority lanes (chaos commands,
+    then votes, then emails/hints/shop), and a writer task drains them in that
+    order. If the game advertised the "batch" capability, everything waiting
+    is sent as one {"type": "batch"} frame instead of one frame per message.
+    Messages are encoded with the codec negotiated with the game (see codec.py).
+    Full vote snapshots are coalesced so only the newest one is ever queued.
+
+    With a replay queue, messages that can't be delivered because the game is
+    disconnected are stored on disk and replayed in order, rate limited, once
+    the game reconnects. Only what was stored before the reconnect is
+    replayed; new messages wait in memory behind it and go out at full speed
+    as soon as it has been replayed, so the game still gets everything in order.
+    """
+
+    def __init__(self, lane_size=256, max_batch=32, replay_queue=None, replay_rate=10):
+        self.lane_size = lane_size
+        self.max_batch = max_batch
+        self.replay_queue = replay_queue
+        self.replay_rate = replay_rate  # Replayed messages per second
+        self.batching = False
+        self.codec = JSON
+        self.connection = None
+        self._lanes = (deque(), deque(), deque())
+        self._coalesced = {}  # coalesce_key -> OutboundMessage currently queued
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._writer_task: Optional[asyncio.Task] = None
+        self._replay_task: Optional[asyncio.Task] = None
+        self._replaying = False  # Stored messages are being replayed, new ones are held behind them
+        self._held = deque()  # New messages waiting for the replay to finish
+        self._held_space = asyncio.Event()
+        self._held_space.set()
+        self._storing = 0  # Stores to the replay queue in flight
+        self._stored = asyncio.Event()  # Set while no store is in flight
+        self._stored.set()
+
+    def attach(self, connection, batching=False):
+        """Start writing queued messages to a game connection."""
+        self.connection = connection
+        self.batching = batching
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._writer())
+        if self.replay_queue and (self._replay_task is None or self._replay_task.done()):
+            self._replaying = True
+            self._replay_task = asyncio.create_task(self._replay())
+
+    async def detach(self, connection=None):
+        """Stop writing to the game connection, storing anything still queued for replay."""
+        if connection is not None and connection is not self.connection:
+            return
+        self.connection = None
+        self.batching = False
+        self.codec = JSON
+        tasks = [task for task in (self._writer_task, self._replay_task) if task]
+        for task in tasks:
+            task.cancel()
+        self._writer_task = None
+        self._replay_task = None
+        # Let them put back what they were in the middle of before taking what's left
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._replaying = False
+
+        leftover = self._take(self.pending()) + list(self._held)
+        self._held.clear()
+        self._held_space.set()
+        self._space.set()
+        if leftover and not await self._store_for_replay(leftover):
+            logger.warning(f"Dropped {len(leftover)} queued game messages after disconnect")
+
+    def set_replay_queue(self, replay_queue):
+        """Hand this bus the replay queue, or take it away, replaying stored messages if connected."""
+        if replay_queue is self.replay_queue:
+            return
+        if self._replay_task:
+            self._replay_task.cancel()
+            self._replay_task = None
+        self.replay_queue = replay_queue
+        self._replaying = False
+        self._release_all()
+        if replay_queue and self.connection is not None:
+            self._replaying = True
+            self._replay_task = asyncio.create_task(self._replay())
+
+    def pending(self) -> int:
+        return sum(len(lane) for lane in self._lanes)
+
+    async def send(self, message, priority=PRIORITY_NORMAL, coalesce_key=None, ttl=None) -> bool:
+        """
+        Queue a message for the game.
+
+        Waits while the lane is full. If coalesce_key is given and a message
+        with the same key is still queued, it is replaced in place instead.
+        If the game is disconnected the message is stored for replay unless
+        its ttl is 0. While stored messages are still being replayed, the
+        message is held in memory behind them, unless its ttl is 0.
+
+        Returns:
+            bool: False if the message could be neither queued nor stored.
+        """
+        item = OutboundMessage(self.codec.encode(message), priority, ttl, coalesce_key)
+        if self.connection is None:
+            return await self._store_for_replay([item])
+        if self._replaying and ttl != 0:
+            return await self._hold(item)
+        return await self._queue(item)
+
+    async def _queue(self, item: OutboundMessage) -> bool:
+        lane = self._lanes[item.priority]
+        if item.coalesce_key is not None:
+            queued = self._coalesced.get(item.coalesce_key)
+            # Only replace in place if nothing was queued behind it, to keep ordering
+            if queued is not None and lane and lane[-1] is queued:
+                queued.payload = item.payload
+                return True
+
+        while len(lane) >= self.lane_size:
+            self._space.clear()
+            await self._space.wait()
+            if self.connection is None:
+                return await self._store_for_replay([item])
+
+        self._enqueue(item)
+        return True
+
+    async def _hold(self, item: OutboundMessage) -> bool:
+        # Bounded like the lanes, senders wait while it's full
+        while len(self._held) >= self.lane_size * len(self._lanes):
+            self._held_space.clear()
+            await self._held_space.wait()
+            if self.connection is None:
+                return await self._store_for_replay([item])
+            if not self._replaying:
+                break
+        if not self._replaying:
+            # The replay finished while this waited
+            return await self._queue(item)
+        self._held.append(item)
+        return True
+
+    def _release_all(self):
+        """Move every held message onto the lanes at once, when there is no replay left to wait for."""
+        while self._held:
+            self._enqueue(self._held.popleft())
+        self._held_space.set()
+
+    def _enqueue(self, item: OutboundMessage):
+        if item.coalesce_key is not None:
+            self._coalesced[item.coalesce_key] = item
+        self._lanes[item.priority].append(item)
+        self._ready.set()
+
+    def _take(self, limit) -> List[OutboundMessage]:
+        """Pop up to limit messages in priority order."""
+        batch = []
+        for lane in self._lanes:
+            while lane and len(batch) < limit:
+                item = lane.popleft()
+                if item.coalesce_key is not None and self._coalesced.get(item.coalesce_key) is item:
+                    del self._coalesced[item.coalesce_key]
+                batch.append(item)
+        self._space.set()
+        return batch
+
+    async def _store_for_replay(self, items: List[OutboundMessage]) -> bool:
+        keep = [item for item in items if item.ttl != 0]
+        if not keep or self.replay_queue is None:
+            return False
+        self._storing += 1
+        self._stored.clear()
+        try:
+            # Store everything as plain JSON, the game they replay to may not have negotiated the compact codec
+            await self.replay_queue.push_many([
+                (encode_message(COMPACT.decode(item.payload)), item.priority, item.ttl, item.replay_id)
+                for item in keep
+            ])
+            logger.info(f"Game not connected, stored {len(keep)} messages for replay")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to store game messages for replay: {e}")
+            return False
+        finally:
+            self._storing -= 1
+            if not self._storing:
+                self._stored.set()
+
+    async def _writer(self):
+        while True:
+            if not self.pending():
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            batch = self._take(self.max_batch if self.batching else 1)
+            connection = self.connection
+            if connection is None:
+                await self._store_for_replay(batch)
+                continue
+            try:
+                if len(batch) > 1:
+                    for frame in self._batch_frames(batch):
+                        await connection.send(frame)
+                else:
+                    await connection.send(batch[0].payload)
+            except asyncio.CancelledError:
+                await asyncio.shield(self._store_for_replay(batch))
+                raise
+            except Exception as e:
+                logger.error(f"Failed to send to game: {e}")
+                await self._store_for_replay(batch)
+
+    @staticmethod
+    def _batch_frames(batch: List[OutboundMessage]):
+        """Join runs of JSON payloads into batch frames. Binary frames can't be batched and go out alone."""
+        texts = []
+        for item in batch:
+            if isinstance(item.payload, str):
+                texts.append(item.payload)
+                continue
+            if texts:
+                yield '{"type":"batch","messages":[' + ','.join(texts) + ']}' if len(texts) > 1 else texts[0]
+                texts = []
+            yield item.payload
+        if texts:
+            yield '{"type":"batch","messages":[' + ','.join(texts) + ']}' if len(texts) > 1 else texts[0]
+
+    async def _replay(self):
+        """Replay what was stored before the game connected, then release the messages held behind it."""
+        try:
+            try:
+                await self._replay_stored()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error replaying stored game messages: {e}")
+            await self._release_held()
+        finally:
+            if self._replay_task is asyncio.current_task():
+                self._replaying = False
+                self._held_space.set()
+
+    async def _replay_stored(self):
+        """Move stored messages back onto the lanes in order, replay_rate per second."""
+        # Messages still being stored from the last disconnect belong to this replay too
+        await self._stored.wait()
+        cutoff = await self.replay_queue.last_id()
+        stored = await self.replay_queue.count() if cutoff else 0
+        if not stored:
+            return
+        logger.info(f"Replaying {stored} game messages stored while disconnected")
+        while self.connection is not None:
+            rows = await self.replay_queue.peek(max(1, int(self.replay_rate)), up_to=cutoff)
+            if not rows:
+                return
+            # Wait for room in the lanes, replayed messages are bounded like live ones
+            needed = {}
+            for row in rows:
+                needed[row[2]] = needed.get(row[2], 0) + 1
+            for priority, count in needed.items():
+                lane = self._lanes[priority]
+                while len(lane) + min(count, self.lane_size) > self.lane_size:
+                    self._space.clear()
+                    await self._space.wait()
+                    if self.connection is None:
+                        return
+            now = time.time()
+            items = [
+                OutboundMessage(payload, priority, None if expires_at is None else max(expires_at - now, 1),
+                                replay_id=row_id)
+                for row_id, payload, priority, expires_at in rows
+            ]
+            # Delete before queueing, so a row is never both on the lanes and still stored
+            deleting = asyncio.ensure_future(self.replay_queue.delete([item.replay_id for item in items]))
+            try:
+                await asyncio.shield(deleting)
+            except asyncio.CancelledError:
+                # The delete runs on regardless; once it's through, queue the rows for detach to store back
+                await asyncio.wait({deleting})
+                if not deleting.cancelled() and deleting.exception() is None:
+                    for item in items:
+                        self._enqueue(item)
+                raise
+            for item in items:
+                self._enqueue(item)
+            await asyncio.sleep(1)
+
+    async def _release_held(self):
+        """Move held messages onto the lanes in order, as fast as the lanes have room."""
+        while self._held:
+            lane = self._lanes[self._held[0].priority]
+            while len(lane) >= self.lane_size:
+                self._space.clear()
+                await self._space.wait()
+                if self.connection is None:
+                    return
+            self._enqueue(self._held.popleft())
+            self._held_space.set()
+
+    async def close(self):
+        await self.detach()
+        if self.replay_queue:
+            await self.replay_queue.close()
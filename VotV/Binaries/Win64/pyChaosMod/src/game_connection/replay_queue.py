@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayQueue:
+    """
+    Disk-backed outbox for game messages sent while the game is disconnected.
+
+    Messages are stored in SQLite in arrival order with an optional expiry
+    time. When more than max_messages are stored, messages that can expire
+    are evicted before ones that can't, oldest first. All database work
+    runs on a single worker thread so the event loop never blocks on disk.
+    """
+
+    def __init__(self, path: str = 'game_outbox.db', max_messages: int = 1000):
+        self.path = path
+        self.max_messages = max_messages
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='replay-queue')
+        self._db: Optional[sqlite3.Connection] = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS outbox ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'payload TEXT NOT NULL, '
+                'priority INTEGER NOT NULL, '
+                'expires_at REAL)'
+            )
+            self._db.commit()
+        return self._db
+
+    def _push(self, items: List[Tuple[str, int, Optional[float], Optional[int]]]) -> int:
+        db = self._connect()
+        now = time.time()
+        # A message taken out for replay but not delivered goes back under its old id, keeping its place
+        db.executemany(
+            'INSERT OR IGNORE INTO outbox (id, payload, priority, expires_at) VALUES (?, ?, ?, ?)',
+            [(row_id, payload, priority, None if ttl is None else now + ttl)
+             for payload, priority, ttl, row_id in items]
+        )
+        overflow = db.execute('SELECT COUNT(*) FROM outbox').fetchone()[0] - self.max_messages
+        if overflow > 0:
+            # Evict messages with a TTL first, so paid redemptions are the last to go
+            db.execute(
+                'DELETE FROM outbox WHERE id IN '
+                '(SELECT id FROM outbox ORDER BY expires_at IS NULL, id LIMIT ?)',
+                (overflow,)
+            )
+            logger.warning(f"Game replay queue full, dropped {overflow} oldest messages")
+        db.commit()
+        return len(items)
+
+    async def push(self, payload: str, priority: int, ttl: Optional[float] = None) -> None:
+        """Store a message for replay. ttl is in seconds; None keeps it until delivered."""
+        await self._run(self._push, [(payload, priority, ttl, None)])
+
+    async def push_many(self, items: List[Tuple[str, int, Optional[float], Optional[int]]]) -> None:
+        """
+        Store several (payload, priority, ttl, id) messages in one transaction.
+
+        id is None for new messages, or the id of a row that was taken out
+        for replay and is being put back.
+        """
+        if items:
+            await self._run(self._push, items)
+
+    def _peek(self, limit: int, up_to: Optional[int]) -> List[Tuple[int, str, int, Optional[float]]]:
+        db = self._connect()
+        expired = db.execute(
+            'DELETE FROM outbox WHERE expires_at IS NOT NULL AND expires_at < ?', (time.time(),)
+        ).rowcount
+        if expired:
+            logger.info(f"Dropped {expired} expired messages from the game replay queue")
+        db.commit()
+        if up_to is None:
+            return db.execute(
+                'SELECT id, payload, priority, expires_at FROM outbox ORDER BY id LIMIT ?', (limit,)
+            ).fetchall()
+        return db.execute(
+            'SELECT id, payload, priority, expires_at FROM outbox WHERE id <= ? ORDER BY id LIMIT ?', (up_to, limit)
+        ).fetchall()
+
+    async def peek(self, limit: int, up_to: Optional[int] = None) -> List[Tuple[int, str, int, Optional[float]]]:
+        """Get up to limit unexpired (id, payload, priority, expires_at) rows, oldest first, with id <= up_to."""
+        return await self._run(self._peek, limit, up_to)
+
+    def _last_id(self) -> int:
+        return self._connect().execute('SELECT COALESCE(MAX(id), 0) FROM outbox').fetchone()[0]
+
+    async def last_id(self) -> int:
+        """Id of the newest stored row, 0 if there are none."""
+        return await self._run(self._last_id)
+
+    def _delete(self, ids: List[int]) -> None:
+        db = self._connect()
+        db.executemany('DELETE FROM outbox WHERE id = ?', [(i,) for i in ids])
+        db.commit()
+
+    async def delete(self, ids: List[int]) -> None:
+        """Remove delivered rows."""
+        if ids:
+            await self._run(self._delete, ids)
+
+    def _count(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    async def count(self) -> int:
+        return await self._run(self._count)
+
+    def _close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    async def close(self) -> None:
+        await self._run(self._close)
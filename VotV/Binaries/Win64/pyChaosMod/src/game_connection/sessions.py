@@ -0,0 +1,90 @@
+import time
+from typing import Dict, Iterator, Optional
+
+from src.game_connection import codec
+from src.game_connection.message_bus import GameMessageBus
+
+# Name given to games that connect without identifying themselves
+DEFAULT_SESSION = 'default'
+
+
+class GameSession:
+    """A connected game instance and its outbound message bus."""
+
+    __slots__ = ('name', 'websocket', 'bus', 'capabilities', 'connected_at')
+
+    def __init__(self, name: str, websocket, capabilities=None, allow_compact=True):
+        self.name = name
+        self.websocket = websocket
+        self.bus = GameMessageBus()
+        self.connected_at = time.monotonic()
+        self.set_capabilities(capabilities, allow_compact)
+
+    def set_capabilities(self, capabilities, allow_compact=True):
+        self.capabilities = set(capabilities or ())
+        # The game can opt into batched frames and the compact codec by advertising them
+        self.bus.batching = 'batch' in self.capabilities
+        self.bus.codec = codec.negotiate(self.capabilities, allow_compact)
+
+    @property
+    def encoding(self) -> str:
+        return self.bus.codec.name
+
+
+class SessionRegistry:
+    """
+    Tracks the connected game sessions by name.
+
+    The primary session receives everything that isn't addressed to a
+    specific session or broadcast. It is the session named by
+    `primary_name` when that one is connected, otherwise the one that has
+    been connected longest.
+    """
+
+    def __init__(self, primary_name: Optional[str] = None):
+        self.primary_name = primary_name
+        self._sessions: Dict[str, GameSession] = {}
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __iter__(self) -> Iterator[GameSession]:
+        return iter(list(self._sessions.values()))
+
+    def get(self, name: str) -> Optional[GameSession]:
+        return self._sessions.get(name)
+
+    def add(self, session: GameSession) -> Optional[GameSession]:
+        """
+        Register a session.
+
+        Returns:
+            GameSession: The session previously registered under the same name, which the
+                caller should close, or None.
+        """
+        previous = self._sessions.get(session.name)
+        self._sessions[session.name] = session
+        return previous if previous is not session else None
+
+    def remove(self, session: GameSession) -> bool:
+        """Unregister a session, unless it has already been replaced by a newer one."""
+        if self._sessions.get(session.name) is session:
+            del self._sessions[session.name]
+            return True
+        return False
+
+    def rename(self, session: GameSession, name: str) -> Optional[GameSession]:
+        """Move a session to a new name. Returns the replaced session, if any."""
+        self.remove(session)
+        session.name = name
+        return self.add(session)
+
+    @property
+    def primary(self) -> Optional[GameSession]:
+        if self.primary_name is not None:
+            session = self._sessions.get(self.primary_name)
+            if session is not None:
+                return session
+        if not self._sessions:
+            return None
+        return min(self._sessions.values(), key=lambda session: session.connected_at)
@@ -1,95 +1,294 @@
 import asyncio
 import time
 import websockets
-import json
 import logging
 
+from src.game_connection.codec import PING_FRAME, PONG_FRAME
+from src.game_connection.message_bus import GameMessageBus, PRIORITY_CHAOS, PRIORITY_NORMAL, encode_message
+from src.game_connection.replay_queue import ReplayQueue
+from src.game_connection.sessions import DEFAULT_SESSION, GameSession, SessionRegistry
+from src.utils import jsonlib
+
 logger = logging.getLogger(__name__)
 
+# Fixed replies are encoded once
+CONNECTION_TEST_REPLY = encode_message({"type": "connection_test_succ"})
+CONNECTION_TEST_COMPACT_REPLY = encode_message({"type": "connection_test_succ", "encoding": "compact"})
+INVALID_JSON_REPLY = encode_message({"error": "Invalid JSON format"})
+
 class WebSocketHandler:
+    """
+    WebSocket server for game connections.
+
+    Several game instances can be connected at once (e.g. the streaming PC
+    and a capture or test instance). Each identifies itself with a hello
+    message naming its session; games that don't are treated as the default
+    session. Outbound messages go to the primary session unless they are
+    addressed to a specific session or broadcast.
+
+    A game that lists "compact" in its capabilities (in hello or
+    connection_test) gets vote updates and chaos commands as binary frames;
+    everything else stays JSON. See codec.py for the layouts.
+    """
+
     def __init__(self, config, email_system, shop_system, hint_system, voting_system):
         self.config = config
         self.email_system = email_system
         self.shop_system = shop_system
         self.hint_system = hint_system
         self.voting_system = voting_system
-        self.game_connection = None
+        websocket_config = config.get('websocket', {})
+        self.sessions = SessionRegistry(websocket_config.get('primary_session') or None)
+        self.broadcast = websocket_config.get('broadcast', False)
+        self.hello_timeout = websocket_config.get('hello_timeout', 1.0)
+        self.compact_protocol = websocket_config.get('compact_protocol', True)
+        self.replay_queue = self._create_replay_queue(config)
+        # Never attached, so anything sent through it while no game is connected is stored for replay
+        self._offline_bus = GameMessageBus(replay_queue=self.replay_queue)
+        self.message_bus = self._offline_bus  # Bus of the primary session
         self.server = None
-        self.port = config.get('websocket', {}).get('port', 3201)
+        self.port = websocket_config.get('port', 3201)
         self._running = False
+        self._handlers = {
+            'connection_test': self._on_connection_test,
+            'hello': self._on_hello,
+            'voting_started': self._on_voting_started,
+            'voting_ended': self._on_voting_ended,
+            'vote_snapshot_request': self._on_vote_snapshot_request,
+            'shop_open': self._on_shop_open,
+            'shop_close': self._on_shop_close,
+        }
     
 
+    @staticmethod
+    def _create_replay_queue(config):
+        """Create the on-disk queue for messages sent while the game is disconnected."""
+        websocket_config = config.get('websocket', {})
+        if not websocket_config.get('replay_queue', True):
+            return None
+        return ReplayQueue(
+            config.get('files', {}).get('game_outbox', 'game_outbox.db'),
+            max_messages=websocket_config.get('replay_max_messages', 1000)
+        )
+
+    @property
+    def game_connection(self):
+        """WebSocket of the primary game session, or None if no game is connected."""
+        primary = self.sessions.primary
+        return primary.websocket if primary else None
+
     async def handle_connection(self, websocket, path=None):
         """Handle game WebSocket connection."""
+        session = None
         try:
-            if self.game_connection is not None:
-                try:
-                    # Test if existing connection is still alive
-                    pong = await self.game_connection.ping()
-                    if not pong:
-                        logger.debug("Previous game connection is dead, allowing new connection")
-                        self.game_connection = None
-                    else:
-                        logger.warning("Rejecting additional connection attempt - game already connected")
-                        return
-                except websockets.exceptions.ConnectionClosed:
-                    logger.debug("Previous game connection was closed, allowing new connection")
-                    self.game_connection = None
-            
-            self.game_connection = websocket
-            logger.info("Game connected to WebSocket server")
+            # Wait briefly for a hello; older game builds start with connection_test instead
+            try:
+                first = await asyncio.wait_for(websocket.recv(), timeout=self.hello_timeout)
+            except asyncio.TimeoutError:
+                first = None
+
+            hello = self._parse_hello(first)
+            session = GameSession(hello.get('session') or DEFAULT_SESSION, websocket, hello.get('capabilities'),
+                                  self.compact_protocol)
+            await self._register_session(session)
+            if hello:
+                await websocket.send(self._hello_reply(session))
+            elif first is not None:
+                await self.route_message(session, first)
 
             # Handle messages from the game
             async for message in websocket:
-                try:
-                    data = json.loads(message)
-                    logger.debug(f"Received game message: {data}")
-
-                    if 'type' in data:
-                        if data['type'] == 'connection_test':
-                            await websocket.send(json.dumps({
-                                "type": "connection_test_succ"
-                            }))
-                        elif data['type'] == 'voting_started':
-                            logger.debug("Received voting_started message from game")
-                            num_options = data.get('num_options', 0)
-                            option_names = data.get('option_names', [])
-                            
-                            # Validate option names
-                            if len(option_names) != num_options:
-                                logger.warning(f"Option names count ({len(option_names)}) doesn't match num_options ({num_options})")
-                                # Fill missing names with defaults
-                                while len(option_names) < num_options:
-                                    option_names.append(f"Option {len(option_names) + 1}")
-                                # Trim excess names
-                                option_names = option_names[:num_options]
-                            
-                            self.voting_system.set_voting_active(True, num_options, option_names)
-                        elif data['type'] == 'voting_ended':
-                            logger.debug("Received voting_ended message from game")
-                            self.voting_system.set_voting_active(False)
-                        elif data['type'] == 'shop_open':
-                            logger.debug("Received shop_open message from game")
-                            self.shop_system.set_shop_open(True)
-                        elif data['type'] == 'shop_close':
-                            logger.debug("Received shop_close message from game")
-                            self.shop_system.set_shop_open(False)
-
-                except json.JSONDecodeError:
-                    logger.error("Invalid JSON received from game")
-                    await websocket.send(json.dumps({
-                        "error": "Invalid JSON format"
-                    }))
+                await self.route_message(session, message)
 
         except websockets.exceptions.ConnectionClosed:
             logger.info("Game connection closed unexpectedly")
         finally:
-            self.game_connection = None
-            # Make sure voting is stopped if game disconnects
-            if self.voting_system.voting_active:
-                self.voting_system.set_voting_active(False)
-            logger.info("Game disconnected from WebSocket server")
-            
+            if session is not None:
+                await self._unregister_session(session)
+
+    @staticmethod
+    def _parse_hello(message) -> dict:
+        """Return the hello payload if message is one, otherwise an empty dict."""
+        if message is None:
+            return {}
+        try:
+            data = jsonlib.loads(message)
+        except ValueError:
+            return {}
+        if isinstance(data, dict) and data.get('type') == 'hello':
+            return data
+        return {}
+
+    def _hello_reply(self, session) -> str:
+        return encode_message({
+            "type": "hello_ack",
+            "session": session.name,
+            "primary": self.sessions.primary is session,
+            "encoding": session.encoding,
+        })
+
+    async def _register_session(self, session):
+        replaced = self.sessions.add(session)
+        if replaced is not None:
+            # Same game reconnecting before its old socket timed out
+            logger.info(f"Game session '{session.name}' reconnected, closing its previous connection")
+            await self._close_session(replaced)
+        session.bus.attach(session.websocket, session.bus.batching)
+        self._update_primary()
+        logger.info(f"Game session '{session.name}' connected to WebSocket server")
+
+    async def _unregister_session(self, session):
+        if not self.sessions.remove(session):
+            return
+        await self._close_session(session)
+        self._update_primary()
+        logger.info(f"Game session '{session.name}' disconnected from WebSocket server")
+
+    async def _close_session(self, session):
+        """Stop sending to a session and reset the voting and shop state it owned."""
+        await session.bus.detach()
+        # Make sure voting is stopped if game disconnects
+        self.voting_system.set_voting_active(False, session=session.name)
+        self.shop_system.set_shop_open(False, session=session.name)
+        try:
+            await session.websocket.close()
+        except Exception as e:
+            logger.debug(f"Error closing game connection: {e}")
+
+    def _update_primary(self):
+        """Route primary traffic, and the replay queue, to the current primary session."""
+        primary = self.sessions.primary
+        bus = primary.bus if primary else self._offline_bus
+        if bus is self.message_bus:
+            return
+        self.message_bus.set_replay_queue(None)
+        self.message_bus = bus
+        bus.set_replay_queue(self.replay_queue)
+        self.voting_system.set_primary_session(primary.name if primary else DEFAULT_SESSION)
+        if primary:
+            logger.info(f"Game session '{primary.name}' is now the primary session")
+
+    def register_handler(self, message_type: str, handler):
+        """
+        Register the handler for a game message type.
+
+        Args:
+            message_type (str): Value of the message's "type" field.
+            handler: Coroutine function called as handler(session, data).
+        """
+        self._handlers[message_type] = handler
+
+    async def route_message(self, session, message):
+        """Decode one frame from a game session and dispatch it by its "type" field."""
+        if message == PING_FRAME:
+            await session.websocket.send(PONG_FRAME)
+            return
+        try:
+            data = session.bus.codec.decode(message)
+        except ValueError:
+            # Also covers JSONDecodeError
+            logger.error("Invalid message received from game")
+            await session.websocket.send(INVALID_JSON_REPLY)
+            return
+
+        if not isinstance(data, dict):
+            return
+        message_type = data.get('type')
+        handler = self._handlers.get(message_type)
+        if handler is None:
+            if message_type is not None:
+                logger.debug("Unhandled game message type: %s", message_type)
+            return
+        # connection_test pings are frequent and uninteresting, keep them out of the log
+        if message_type != 'connection_test':
+            logger.debug("Received game message from %s: %s", session.name, data)
+        await handler(session, data)
+
+    async def _on_connection_test(self, session, data):
+        capabilities = data.get('capabilities')
+        if capabilities:
+            session.set_capabilities(capabilities, self.compact_protocol)
+            if session.encoding == 'compact':
+                await session.websocket.send(CONNECTION_TEST_COMPACT_REPLY)
+                return
+        await session.websocket.send(CONNECTION_TEST_REPLY)
+
+    async def _on_hello(self, session, data):
+        # A late hello re-identifies the session, e.g. after the game reloads a save
+        name = data.get('session') or session.name
+        if name != session.name:
+            old_name = session.name
+            self.voting_system.set_voting_active(False, session=old_name)
+            self.shop_system.set_shop_open(False, session=old_name)
+            replaced = self.sessions.rename(session, name)
+            if replaced is not None:
+                await self._close_session(replaced)
+            self._update_primary()
+            logger.info(f"Game session '{old_name}' identified as '{name}'")
+        if 'capabilities' in data:
+            session.set_capabilities(data.get('capabilities'), self.compact_protocol)
+        await session.websocket.send(self._hello_reply(session))
+
+    async def _on_voting_started(self, session, data):
+        num_options = data.get('num_options', 0)
+        option_names = data.get('option_names', [])
+        
+        # Validate option names
+        if len(option_names) != num_options:
+            logger.warning(f"Option names count ({len(option_names)}) doesn't match num_options ({num_options})")
+            # Fill missing names with defaults
+            while len(option_names) < num_options:
+                option_names.append(f"Option {len(option_names) + 1}")
+            # Trim excess names
+            option_names = option_names[:num_options]
+        
+        self.voting_system.set_voting_active(True, num_options, option_names, session=session.name)
+
+    async def _on_voting_ended(self, session, data):
+        self.voting_system.set_voting_active(False, session=session.name)
+
+    async def _on_vote_snapshot_request(self, session, data):
+        self.voting_system.request_snapshot(session.name)
+
+    async def _on_shop_open(self, session, data):
+        self.shop_system.set_shop_open(True, session=session.name)
+
+    async def _on_shop_close(self, session, data):
+        self.shop_system.set_shop_open(False, session=session.name)
+
+    async def send_to_game(self, message: dict, priority: int = PRIORITY_NORMAL, coalesce_key: str = None,
+                           ttl: float = None, session: str = None, broadcast: bool = None) -> bool:
+        """
+        Queue a message for the game on the outbound message bus.
+
+        Args:
+            ttl: Seconds to keep the message for replay if the game is disconnected.
+                None keeps it until delivered, 0 drops it instead.
+            session: Name of the session to send to. Defaults to the primary session.
+            broadcast: Send to every connected session. Defaults to the websocket
+                `broadcast` setting.
+
+        Returns:
+            bool: False if the message was neither sent nor stored for replay.
+        """
+        if session is not None:
+            target = self.sessions.get(session)
+            if target is None:
+                return False
+            return await target.bus.send(message, priority, coalesce_key, ttl)
+
+        if broadcast is None:
+            broadcast = self.broadcast
+        if broadcast and len(self.sessions) > 1:
+            # Only the primary keeps messages for replay, so they aren't delivered twice later
+            sent = await self.message_bus.send(message, priority, coalesce_key, ttl)
+            for target in self.sessions:
+                if target.bus is not self.message_bus:
+                    sent = await target.bus.send(message, priority, coalesce_key, 0) or sent
+            return sent
+
+        return await self.message_bus.send(message, priority, coalesce_key, ttl)
+
     async def process_chaos_command(self, command_type: str, command: str) -> None:
         """
         Processes a chaos command by sending it to the game connection.
@@ -98,21 +297,17 @@ class WebSocketHandler:
             command_type (str): The type of the command.
             command (str): The command to be processed.
         """
-        if not self.game_connection:
+        direct = {
+            "type": command_type,
+            "command": command,
+            "timestamp": time.time(),
+        }
+        if not await self.send_to_game(direct, PRIORITY_CHAOS):
             logger.error("Cannot process command: Game is not connected")
-            return
-            
-        try:
-            direct = {
-                "type": command_type,
-                "command": command,
-                "timestamp": time.time(),
-            }
-            await self.game_connection.send(json.dumps(direct))
-        except Exception as e:
-            logger.error(f"Failed to send command to game: {str(e)}")
-            # Reset game_connection if we can't send to it
-            self.game_connection = None
+
+    def is_serving(self) -> bool:
+        """Liveness probe: the game server is up and accepting connections."""
+        return self._running and self.server is not None and self.server.is_serving()
 
     async def start(self):
         """Start the WebSocket server."""
@@ -158,10 +353,12 @@ class WebSocketHandler:
             return
 
         try:
-            # Close game connection if it exists
-            if self.game_connection:
-                await self.game_connection.close()
-                self.game_connection = None
+            # Close game connections, storing anything still queued for replay
+            primary = self.sessions.primary
+            for session in sorted(self.sessions, key=lambda session: session is primary):
+                await self._unregister_session(session)
+            if self.replay_queue:
+                await self.replay_queue.close()
 
             # Close the server
             if self.server:
@@ -178,7 +375,15 @@ class WebSocketHandler:
     async def update_config(self, new_config):
         """Update the configuration."""
         self.config = new_config
-        new_port = new_config.get('websocket', {}).get('port', 3201)
+        websocket_config = new_config.get('websocket', {})
+        self.broadcast = websocket_config.get('broadcast', False)
+        self.hello_timeout = websocket_config.get('hello_timeout', 1.0)
+        self.compact_protocol = websocket_config.get('compact_protocol', True)
+        primary_name = websocket_config.get('primary_session') or None
+        if primary_name != self.sessions.primary_name:
+            self.sessions.primary_name = primary_name
+            self._update_primary()
+        new_port = websocket_config.get('port', 3201)
         if new_port != self.port:
             logger.info(f"WebSocket port changed from {self.port} to {new_port}")
             await self.close()
@@ -1,15 +1,22 @@
 import time
-import json
 import re
 import logging
 from typing import Tuple, Optional
 
+from src.utils.config_schema import get_settings
+from src.utils.cooldowns import CooldownStore
+
 class HintSystem:
     VALID_TYPES = {'info', 'warning', 'error', 'thought'}
     
     def __init__(self, config):
         self.config = config
-        self.hint_cooldowns = {}
+        self.settings = get_settings(config).hints
+        self.hint_cooldowns = CooldownStore(
+            self.settings.user_cooldown,
+            state_file=(config.get('files', {}).get('hints_cooldowns', 'hints_cooldowns.json')
+                        if self.settings.persist_cooldowns else None)
+        )
         self.twitch_connection = None
         self.websocket_handler = None
         self.logger = logging.getLogger(__name__)
@@ -50,7 +57,7 @@ class HintSystem:
         1. process_hint(full_hint, ctx=ctx) - parses the full hint string
         2. process_hint(type, hint, ctx) - traditional way with separate type and hint
         """
-        if not self.config['hints'].get('enabled', False):
+        if not self.settings.enabled:
             return
             
         current_time = time.time()
@@ -69,24 +76,22 @@ class HintSystem:
         
         # Check cooldown if we have a Twitch context
         if ctx is not None:
-            if ctx.author.name in self.hint_cooldowns:
-                time_since_last_hint = current_time - self.hint_cooldowns[ctx.author.name]
-                if time_since_last_hint < self.config['hints']['user_cooldown']:
-                    remaining_cooldown = int(self.config['hints']['user_cooldown'] - time_since_last_hint)
-                    cooldown_message = f"You're on cooldown. You can send another hint in {remaining_cooldown} seconds."
-                    await self.twitch_connection.reply(ctx, cooldown_message)
-                    return
+            remaining_cooldown = int(self.hint_cooldowns.remaining(ctx.user.name, current_time))
+            if remaining_cooldown > 0:
+                cooldown_message = f"You're on cooldown. You can send another hint in {remaining_cooldown} seconds."
+                await self.twitch_connection.reply(ctx, cooldown_message, notice="hint_cooldown")
+                return
         
         # Send the hint through WebSocket
         await self.send_hint(hint_type, hint_message)
         
         # Update cooldown if we have a Twitch context
         if self.twitch_connection is not None and ctx is not None:
-            self.hint_cooldowns[ctx.author.name] = current_time
+            self.hint_cooldowns.start(ctx.user.name, current_time)
 
     async def send_hint(self, hint_type: str, hint_message: str):
         """Send hint through WebSocket connection."""
-        if self.websocket_handler and self.websocket_handler.game_connection:
+        if self.websocket_handler:
             hint_data = {
                 "type": "hint",
                 "data": {
@@ -97,12 +102,20 @@ class HintSystem:
             }
             
             try:
-                await self.websocket_handler.game_connection.send(json.dumps(hint_data))
-                self.logger.debug(f"Hint sent: {hint_type} - {hint_message}")
+                if await self.websocket_handler.send_to_game(hint_data):
+                    self.logger.debug(f"Hint sent: {hint_type} - {hint_message}")
+                else:
+                    self.logger.error("Failed to send hint through WebSocket: game is not connected")
             except Exception as e:
                 self.logger.error(f"Failed to send hint through WebSocket: {e}")
         else:
             self.logger.error("WebSocket connection not available")
     
+    async def close(self):
+        """Save cooldowns still waiting to be written."""
+        await self.hint_cooldowns.flush()
+
     def update_config(self, config):
-        self.config = config
\ No newline at end of file
+        self.config = config
+        self.settings = get_settings(config).hints
+        self.hint_cooldowns.duration = self.settings.user_cooldown
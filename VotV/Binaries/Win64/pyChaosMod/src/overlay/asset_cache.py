@@ -0,0 +1,173 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Map each content coding in an Accept-Encoding header to its q value."""
+    codings = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value.strip())
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+class CachedAsset:
+    """An encoded asset ready to be served, with its compressed variants and validators."""
+
+    __slots__ = ('body', 'gzip_body', 'br_body', 'content_type', 'etag', 'last_modified',
+                 'last_modified_ts', 'cache_control')
+
+    def __init__(self, body: bytes, content_type: str, mtime: Optional[float] = None,
+                 cache_control: str = 'no-cache'):
+        self.body = body
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.last_modified_ts = int(mtime if mtime is not None else time.time())
+        self.last_modified = formatdate(self.last_modified_ts, usegmt=True)
+        self.gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+        self.br_body = brotli.compress(body, quality=11) if brotli else None
+
+    def is_not_modified(self, request: web.Request) -> bool:
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return self.etag in (tag.strip() for tag in if_none_match.split(',')) or if_none_match.strip() == '*'
+
+        if_modified_since = request.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= self.last_modified_ts
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def response(self, request: web.Request) -> web.Response:
+        """Build a response for this asset, honouring conditional and Accept-Encoding headers."""
+        headers = {
+            'ETag': self.etag,
+            'Last-Modified': self.last_modified,
+            'Cache-Control': self.cache_control,
+            'Vary': 'Accept-Encoding',
+        }
+        if self.is_not_modified(request):
+            return web.Response(status=304, headers=headers)
+
+        body = self.body
+        encoding = self._pick_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding == 'br':
+            body = self.br_body
+            headers['Content-Encoding'] = 'br'
+        elif encoding == 'gzip':
+            body = self.gzip_body
+            headers['Content-Encoding'] = 'gzip'
+
+        return web.Response(body=body, content_type=self.content_type, charset=self._charset(), headers=headers)
+
+    def _pick_encoding(self, accept_encoding: str) -> Optional[str]:
+        """The accepted coding with the highest q value, brotli on a tie, or None to send it as is."""
+        if not accept_encoding:
+            return None
+        codings = parse_accept_encoding(accept_encoding)
+        wildcard = codings.get('*', 0.0)
+        best, best_quality = None, 0.0
+        for coding in ('br', 'gzip'):
+            if coding == 'br' and self.br_body is None:
+                continue
+            quality = codings.get(coding, wildcard)
+            if quality > best_quality:
+                best, best_quality = coding, quality
+        return best
+
+    def _charset(self) -> Optional[str]:
+        return 'utf-8' if self.content_type.startswith('text/') else None
+
+
+class AssetCache:
+    """
+    In-memory cache of overlay assets.
+
+    Loaders run in a worker thread, so the event loop never blocks on disk
+    I/O. Entries stay cached until invalidate() is called, which the config
+    file watcher does when cfg/styles.css changes.
+    """
+
+    def __init__(self):
+        self._assets: Dict[str, CachedAsset] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._generation = 0  # Bumped on invalidate so in-flight loads don't store stale data
+
+    def put(self, name: str, body: bytes, content_type: str, mtime: Optional[float] = None,
+            cache_control: str = 'no-cache') -> CachedAsset:
+        asset = CachedAsset(body, content_type, mtime, cache_control)
+        self._assets[name] = asset
+        return asset
+
+    async def get(self, name: str, loader: Callable[[], Optional[Tuple[bytes, Optional[float]]]],
+                  content_type: str, cache_control: str = 'no-cache') -> Optional[CachedAsset]:
+        """
+        Get a cached asset, loading it with loader() in a worker thread on a miss.
+
+        loader returns (body, mtime), or None if the asset does not exist.
+        Concurrent misses for the same asset share a single load.
+        """
+        asset = self._assets.get(name)
+        if asset is not None:
+            return asset
+
+        pending = self._loading.get(name)
+        if pending is None:
+            pending = asyncio.ensure_future(self._load(name, loader, content_type, cache_control))
+            self._loading[name] = pending
+        return await asyncio.shield(pending)
+
+    async def _load(self, name, loader, content_type, cache_control):
+        generation = self._generation
+        try:
+            loaded = await asyncio.to_thread(loader)
+            if loaded is None:
+                return None
+            body, mtime = loaded
+            # Compression is CPU bound, keep it off the event loop as well
+            asset = await asyncio.to_thread(CachedAsset, body, content_type, mtime, cache_control)
+            if generation == self._generation:
+                self._assets[name] = asset
+            logger.debug(f"Cached overlay asset {name} ({len(body)} bytes)")
+            return asset
+        finally:
+            if self._loading.get(name) is asyncio.current_task():
+                del self._loading[name]
+
+    def invalidate(self, name: Optional[str] = None):
+        """Drop one cached asset, or all of them if no name is given."""
+        self._generation += 1
+        if name is None:
+            self._assets.clear()
+            self._loading.clear()
+        else:
+            self._assets.pop(name, None)
+            self._loading.pop(name, None)
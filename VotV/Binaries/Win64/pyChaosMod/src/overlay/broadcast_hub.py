@@ -0,0 +1,129 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class OverlayClient:
+    """A connected overlay client with its own bounded send queue and writer task."""
+
+    __slots__ = ('ws', 'pending', 'ready', 'task', 'dropped')
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.pending = deque()  # (payload, droppable) pairs
+        self.ready = asyncio.Event()
+        self.task = None
+        self.dropped = 0
+
+
+class BroadcastHub:
+    """
+    Fans out overlay messages to every connected client.
+
+    Each message is serialized once and put on every client's bounded queue.
+    A writer task per client drains its queue, so a slow browser source only
+    delays itself. When a client's queue is full, the oldest droppable message
+    (vote updates, which the page recovers from via a snapshot request) is
+    discarded. Clients that fall too far behind are disconnected.
+    """
+
+    def __init__(self, queue_size=32, max_dropped=64, send_timeout=5.0):
+        self.queue_size = queue_size
+        self.max_dropped = max_dropped
+        self.send_timeout = send_timeout
+        self.clients: Dict[object, OverlayClient] = {}
+
+    def __len__(self):
+        return len(self.clients)
+
+    def add_client(self, ws):
+        """Register a client and start its writer task."""
+        client = OverlayClient(ws)
+        client.task = asyncio.create_task(self._writer(client))
+        self.clients[ws] = client
+
+    async def remove_client(self, ws):
+        """Unregister a client and stop its writer task."""
+        client = self.clients.pop(ws, None)
+        if client and client.task and client.task is not asyncio.current_task():
+            client.task.cancel()
+            try:
+                await client.task
+            except asyncio.CancelledError:
+                pass
+
+    def publish(self, message, droppable=False):
+        """Serialize a message once and queue it for every client."""
+        if not self.clients:
+            return
+        payload = json.dumps(message)
+        for client in list(self.clients.values()):
+            self._offer(client, payload, droppable)
+
+    def send_to(self, ws, message, droppable=False):
+        """Queue a message for a single client."""
+        client = self.clients.get(ws)
+        if client:
+            self._offer(client, json.dumps(message), droppable)
+
+    def _offer(self, client, payload, droppable):
+        pending = client.pending
+        if len(pending) >= self.queue_size:
+            client.dropped += 1
+            if not self._drop_oldest_droppable(pending) or client.dropped > self.max_dropped:
+                logger.warning("Overlay client is too slow, disconnecting it")
+                self._disconnect(client)
+                return
+
+        pending.append((payload, droppable))
+        client.ready.set()
+
+    @staticmethod
+    def _drop_oldest_droppable(pending):
+        """Downsample a backed-up client by dropping its oldest queued vote update."""
+        for i, (_, droppable) in enumerate(pending):
+            if droppable:
+                del pending[i]
+                return True
+        return False
+
+    def _disconnect(self, client):
+        self.clients.pop(client.ws, None)
+        if client.task:
+            client.task.cancel()
+        asyncio.create_task(client.ws.close())
+
+    async def _writer(self, client):
+        try:
+            while True:
+                if not client.pending:
+                    # Caught up, so forget earlier drops
+                    client.dropped = 0
+                    client.ready.clear()
+                    await client.ready.wait()
+                    continue
+                payload, _ = client.pending.popleft()
+                await asyncio.wait_for(client.ws.send_str(payload), timeout=self.send_timeout)
+        except asyncio.CancelledError:
+            pass
+        except asyncio.TimeoutError:
+            logger.warning("Overlay client stopped reading, disconnecting it")
+            self._disconnect(client)
+        except Exception as e:
+            logger.error(f"Failed to send to overlay client: {e}")
+            self._disconnect(client)
+
+    async def close(self):
+        """Disconnect all clients."""
+        for client in list(self.clients.values()):
+            self.clients.pop(client.ws, None)
+            if client.task:
+                client.task.cancel()
+            try:
+                await client.ws.close()
+            except Exception as e:
+                logger.debug(f"Error closing overlay client: {e}")
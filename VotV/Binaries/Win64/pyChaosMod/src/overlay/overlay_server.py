@@ -5,185 +5,14 @@ import os
 import sys
 from aiohttp import web, WSMsgType
 import aiohttp_cors
-from typing import Set, Optional
+from typing import Optional
+
+from src.overlay.asset_cache import AssetCache
+from src.overlay.broadcast_hub import BroadcastHub
 
 logger = logging.getLogger(__name__)
 
-class OverlayServer:
-    def __init__(self, config, voting_system):
-        self.config = config
-        self.voting_system = voting_system
-        self.port = config.get('overlay', {}).get('port', 3202)
-        self.app = None
-        self.runner = None
-        self.site = None
-        self.websocket_connections: Set = set()
-        self._running = False
-        self.base_path = self._find_base_path()
-        
-    def _find_base_path(self) -> str:
-        if os.path.exists('./pyChaosMod/listen') or os.path.exists('./pyChaosMod/cfg'):
-            return './pyChaosMod/'
-        elif os.path.exists('./listen') or os.path.exists('./cfg'):
-            return './'
-        else:
-            logger.warning("Could not find pyChaosMod directory structure, using current directory")
-            return './'
-    
-    def _get_font_path(self) -> str:
-        """Get the path to the ShareTech font, handling both development and PyInstaller environments."""
-        # Check if running as PyInstaller bundle
-        if getattr(sys, 'frozen', False):
-            # Running as PyInstaller bundle
-            bundle_dir = sys._MEIPASS
-            font_path = os.path.join(bundle_dir, 'ShareTechMono-Regular.ttf')
-            if os.path.exists(font_path):
-                return font_path
-        
-        # Development environment - check in cfg directory
-        font_path = os.path.join(self.base_path, 'cfg', 'ShareTechMono-Regular.ttf')
-        if os.path.exists(font_path):
-            return font_path
-        
-        # Fallback - check current directory
-        font_path = os.path.join('.', 'ShareTechMono-Regular.ttf')
-        if os.path.exists(font_path):
-            return font_path
-        
-        return None
-        
-    async def websocket_handler(self, request):
-        """Handle WebSocket connections from the overlay page."""
-        ws = web.WebSocketResponse()
-        await ws.prepare(request)
-        
-        self.websocket_connections.add(ws)
-        logger.debug("Overlay client connected")
-        
-        # Send current voting state immediately
-        await self.send_voting_update(ws)
-        
-        try:
-            async for msg in ws:
-                if msg.type == WSMsgType.ERROR:
-                    logger.error(f'WebSocket error: {ws.exception()}')
-                    break
-        except Exception as e:
-            logger.error(f"WebSocket error: {e}")
-        finally:
-            self.websocket_connections.discard(ws)
-            logger.debug("Overlay client disconnected")
-            
-        return ws
-    
-    async def send_voting_update(self, ws=None):
-        """Send voting update to overlay clients."""
-        if not self.websocket_connections and ws is None:
-            return
-            
-        # Get current voting data
-        vote_data = {
-            "type": "voting_update",
-            "active": self.voting_system.voting_active,
-            "options": [],
-            "total_votes": 0
-        }
-        
-        if self.voting_system.voting_active and hasattr(self.voting_system, 'option_names'):
-            total_votes = sum(self.voting_system.votes.values())
-            vote_data["total_votes"] = total_votes
-            
-            for i, option_name in enumerate(self.voting_system.option_names):
-                vote_count = self.voting_system.votes.get(i, 0)
-                vote_data["options"].append({
-                    "index": i + 1,
-                    "name": option_name,
-                    "votes": vote_count
-                })
-        
-        message = json.dumps(vote_data)
-        
-        # Send to specific websocket or all connections
-        connections_to_send = [ws] if ws else list(self.websocket_connections)
-        disconnected = []
-        
-        for connection in connections_to_send:
-            try:
-                await connection.send_str(message)
-            except Exception as e:
-                logger.error(f"Failed to send update to overlay client: {e}")
-                disconnected.append(connection)
-        
-        # Clean up disconnected clients
-        for conn in disconnected:
-            self.websocket_connections.discard(conn)
-    
-    async def send_voting_result(self, winning_option):
-        """Send voting result to overlay clients."""
-        if not self.websocket_connections:
-            return
-            
-        result_data = {
-            "type": "voting_result",
-            "winner": winning_option
-        }
-        
-        message = json.dumps(result_data)
-        disconnected = []
-        
-        for ws in list(self.websocket_connections):
-            try:
-                await ws.send_str(message)
-            except Exception as e:
-                logger.error(f"Failed to send result to overlay client: {e}")
-                disconnected.append(ws)
-        
-        # Clean up disconnected clients
-        for conn in disconnected:
-            self.websocket_connections.discard(conn)
-    
-    async def serve_css(self, request):
-        """Serve the CSS file from cfg/styles.css."""
-        css_path = os.path.join(self.base_path, 'cfg', 'styles.css')
-        
-        try:
-            with open(css_path, 'r', encoding='utf-8') as f:
-                css_content = f.read()
-            return web.Response(text=css_content, content_type='text/css')
-        except FileNotFoundError:
-            # If CSS file doesn't exist, create a default one
-            await self.create_default_css(css_path)
-            with open(css_path, 'r', encoding='utf-8') as f:
-                css_content = f.read()
-            return web.Response(text=css_content, content_type='text/css')
-        except Exception as e:
-            logger.error(f"Error serving CSS file: {e}")
-            return web.Response(text="/* Error loading CSS */", content_type='text/css')
-    
-    async def serve_font(self, request):
-        """Serve the font file from the bundled location or cfg directory."""
-        font_path = self._get_font_path()
-        
-        if font_path is None:
-            logger.warning("ShareTech font file not found in any expected location")
-            return web.Response(status=404, text="Font file not found")
-        
-        try:
-            with open(font_path, 'rb') as f:
-                font_content = f.read()
-            return web.Response(body=font_content, content_type='font/ttf')
-        except FileNotFoundError:
-            logger.warning(f"Font file not found at {font_path}")
-            return web.Response(status=404, text="Font file not found")
-        except Exception as e:
-            logger.error(f"Error serving font file: {e}")
-            return web.Response(status=500, text="Error loading font")
-    
-    async def create_default_css(self, css_path):
-        """Create the default CSS file if it doesn't exist."""
-        os.makedirs(os.path.dirname(css_path), exist_ok=True)
-        
-        default_css = """/* Chaos Mod Voting Overlay */
+DEFAULT_CSS = """/* Chaos Mod Voting Overlay */
 @font-face {
     font-family: 'ShareTechMono';
     src: url('ShareTechMono-Regular.ttf') format('truetype');
@@ -285,15 +114,8 @@ body {
     color: #00ff00;
     letter-spacing: 0.5px;
 }"""
-        
-        with open(css_path, 'w', encoding='utf-8') as f:
-            f.write(default_css)
-        
-        logger.info(f"Created default CSS file at {css_path}")
-    
-    async def overlay_page(self, request):
-        """Serve the overlay HTML page."""
-        html_content = """<!DOCTYPE html>
+
+OVERLAY_HTML = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -317,6 +139,8 @@ body {
     <script>
         let ws;
         let resultTimeout;
+        let voteState = null;
+        let lastSeq = 0;
 
         function connectWebSocket() {
             ws = new WebSocket(`ws://${window.location.host}/ws`);
@@ -342,12 +166,32 @@ body {
 
         function handleMessage(data) {
             if (data.type === 'voting_update') {
+                voteState = data;
+                lastSeq = data.seq || 0;
                 updateVotingDisplay(data);
+            } else if (data.type === 'voting_delta') {
+                applyVotingDelta(data);
             } else if (data.type === 'voting_result') {
                 showResult(data.winner);
             }
         }
 
+        function applyVotingDelta(data) {
+            // A missed update means our counts are stale, so ask for a full snapshot
+            if (!voteState || data.seq !== lastSeq + 1) {
+                ws.send(JSON.stringify({ type: 'snapshot_request' }));
+                return;
+            }
+            lastSeq = data.seq;
+            data.changes.forEach(([index, votes]) => {
+                if (voteState.options[index]) {
+                    voteState.options[index].votes = votes;
+                }
+            });
+            voteState.total_votes = data.total_votes;
+            updateVotingDisplay(voteState);
+        }
+
         function updateVotingDisplay(data) {
             const container = document.getElementById('overlayContainer');
             const votingContent = document.getElementById('votingContent');
@@ -417,8 +261,234 @@ body {
     </script>
 </body>
 </html>"""
+
+class OverlayServer:
+    def __init__(self, config, voting_system):
+        self.config = config
+        self.voting_system = voting_system
+        self.port = config.get('overlay', {}).get('port', 3202)
+        self.app = None
+        self.runner = None
+        self.site = None
+        self.hub = BroadcastHub(
+            queue_size=config.get('overlay', {}).get('client_queue_size', 32)
+        )
+        self._running = False
+        self.task_manager = None
+        self.base_path = self._find_base_path()
+        self.assets = AssetCache()
+        self._page_asset = self.assets.put('index.html', OVERLAY_HTML.encode('utf-8'), 'text/html')
+        
+    def _find_base_path(self) -> str:
+        if os.path.exists('./pyChaosMod/listen') or os.path.exists('./pyChaosMod/cfg'):
+            return './pyChaosMod/'
+        elif os.path.exists('./listen') or os.path.exists('./cfg'):
+            return './'
+        else:
+            logger.warning("Could not find pyChaosMod directory structure, using current directory")
+            return './'
+    
+    def _get_font_path(self) -> str:
+        """Get the path to the ShareTech font, handling both development and PyInstaller environments."""
+        # Check if running as PyInstaller bundle
+        if getattr(sys, 'frozen', False):
+            # Running as PyInstaller bundle
+            bundle_dir = sys._MEIPASS
+            font_path = os.path.join(bundle_dir, 'ShareTechMono-Regular.ttf')
+            if os.path.exists(font_path):
+                return font_path
+        
+        # Development environment - check in cfg directory
+        font_path = os.path.join(self.base_path, 'cfg', 'ShareTechMono-Regular.ttf')
+        if os.path.exists(font_path):
+            return font_path
+        
+        # Fallback - check current directory
+        font_path = os.path.join('.', 'ShareTechMono-Regular.ttf')
+        if os.path.exists(font_path):
+            return font_path
+        
+        return None
+        
+    async def websocket_handler(self, request):
+        """Handle WebSocket connections from the overlay page."""
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        
+        self.hub.add_client(ws)
+        logger.debug("Overlay client connected")
+        
+        # Send current voting state immediately
+        await self.send_voting_update(ws)
+        
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.ERROR:
+                    logger.error(f'WebSocket error: {ws.exception()}')
+                    break
+                if msg.type == WSMsgType.TEXT:
+                    await self.handle_client_message(ws, msg.data)
+        except Exception as e:
+            logger.error(f"WebSocket error: {e}")
+        finally:
+            await self.hub.remove_client(ws)
+            logger.debug("Overlay client disconnected")
+            
+        return ws
+    
+    async def handle_client_message(self, ws, raw_message):
+        """Handle a message sent by an overlay client."""
+        try:
+            data = json.loads(raw_message)
+        except json.JSONDecodeError:
+            logger.debug("Ignoring invalid JSON from overlay client")
+            return
+
+        # Clients ask for a snapshot when they notice a gap in delta sequence numbers
+        if isinstance(data, dict) and data.get('type') == 'snapshot_request':
+            await self.send_voting_update(ws)
+
+    async def send_voting_update(self, ws=None):
+        """Send voting update to overlay clients."""
+        if not self.hub and ws is None:
+            return
+            
+        # Get current voting data
+        vote_data = {
+            "type": "voting_update",
+            "seq": self.voting_system.update_seq,
+            "active": self.voting_system.voting_active,
+            "options": [],
+            "total_votes": 0
+        }
+        
+        if self.voting_system.voting_active and hasattr(self.voting_system, 'option_names'):
+            vote_counts = self.voting_system.get_vote_counts()
+            vote_data["total_votes"] = sum(vote_counts)
+            
+            for i, option_name in enumerate(self.voting_system.option_names):
+                vote_count = vote_counts[i] if i < len(vote_counts) else 0
+                vote_data["options"].append({
+                    "index": i + 1,
+                    "name": option_name,
+                    "votes": vote_count
+                })
+        
+        # Snapshots taken mid-vote are superseded by later ones, so slow clients may skip them
+        droppable = vote_data["active"]
+        if ws:
+            self.hub.send_to(ws, vote_data, droppable)
+        else:
+            self.hub.publish(vote_data, droppable)
+    
+    async def send_voting_delta(self, seq, changes, total_votes):
+        """
+        Send changed vote counts to overlay clients.
+
+        Args:
+            seq (int): Update sequence number, used by clients to detect gaps.
+            changes (list): [option_index, vote_count] pairs for changed options.
+            total_votes (int): Total votes counted so far.
+        """
+        self.hub.publish({
+            "type": "voting_delta",
+            "seq": seq,
+            "changes": changes,
+            "total_votes": total_votes
+        }, droppable=True)
+
+    async def send_voting_result(self, winning_option):
+        """Send voting result to overlay clients."""
+        self.hub.publish({
+            "type": "voting_result",
+            "winner": winning_option
+        })
+    
+    def set_task_manager(self, task_manager):
+        self.task_manager = task_manager
+
+    async def serve_metrics(self, request):
+        """Serve runtime metrics as JSON."""
+        metrics = {
+            "voting": self.voting_system.get_metrics(),
+            "overlay_clients": len(self.hub)
+        }
+        if self.task_manager:
+            metrics["tasks"] = self.task_manager.get_metrics()
+        return web.json_response(metrics)
+
+    async def is_accepting(self) -> bool:
+        """Liveness probe: the overlay port accepts connections."""
+        if not self._running:
+            return False
+        try:
+            _, writer = await asyncio.open_connection('localhost', self.port)
+        except OSError:
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+
+    def _load_css(self):
+        """Read cfg/styles.css, creating the default stylesheet if it doesn't exist."""
+        css_path = os.path.join(self.base_path, 'cfg', 'styles.css')
+        if not os.path.exists(css_path):
+            # If CSS file doesn't exist, create a default one
+            self.create_default_css(css_path)
+        with open(css_path, 'rb') as f:
+            return f.read(), os.path.getmtime(css_path)
+
+    def _load_font(self):
+        """Read the ShareTech font, or return None if it can't be found."""
+        font_path = self._get_font_path()
+        if font_path is None:
+            return None
+        with open(font_path, 'rb') as f:
+            return f.read(), os.path.getmtime(font_path)
+
+    async def serve_css(self, request):
+        """Serve the CSS file from cfg/styles.css."""
+        try:
+            asset = await self.assets.get('styles.css', self._load_css, 'text/css')
+            return asset.response(request)
+        except Exception as e:
+            logger.error(f"Error serving CSS file: {e}")
+            return web.Response(text="/* Error loading CSS */", content_type='text/css')
+    
+    async def serve_font(self, request):
+        """Serve the font file from the bundled location or cfg directory."""
+        try:
+            asset = await self.assets.get('font', self._load_font, 'font/ttf',
+                                          cache_control='public, max-age=86400')
+        except Exception as e:
+            logger.error(f"Error serving font file: {e}")
+            return web.Response(status=500, text="Error loading font")
+
+        if asset is None:
+            logger.warning("ShareTech font file not found in any expected location")
+            return web.Response(status=404, text="Font file not found")
+        return asset.response(request)
+    
+    def create_default_css(self, css_path):
+        """Create the default CSS file if it doesn't exist."""
+        os.makedirs(os.path.dirname(css_path), exist_ok=True)
+        
+        with open(css_path, 'w', encoding='utf-8') as f:
+            f.write(DEFAULT_CSS)
         
-        return web.Response(text=html_content, content_type='text/html')
+        logger.info(f"Created default CSS file at {css_path}")
+    
+    async def overlay_page(self, request):
+        """Serve the overlay HTML page."""
+        return self._page_asset.response(request)
+
+    def invalidate_assets(self, name=None):
+        """Drop cached overlay assets so they are re-read on the next request."""
+        self.assets.invalidate(name)
+        logger.debug(f"Overlay asset cache invalidated: {name or 'all'}")
     
     async def start(self):
         """Start the overlay web server."""
@@ -444,6 +514,7 @@ body {
             self.app.router.add_get('/ws', self.websocket_handler)
             self.app.router.add_get('/styles.css', self.serve_css)
             self.app.router.add_get('/ShareTechMono-Regular.ttf', self.serve_font)
+            self.app.router.add_get('/metrics', self.serve_metrics)
             
             # Add CORS to all routes
             for route in list(self.app.router.routes()):
@@ -480,9 +551,7 @@ body {
             
         try:
             # Close all WebSocket connections
-            for ws in list(self.websocket_connections):
-                await ws.close()
-            self.websocket_connections.clear()
+            await self.hub.close()
             
             # Stop the server
             if self.site:
@@ -1,16 +1,24 @@
 import logging
 import time
-import json
 import asyncio
 import sys
 import os
 
+from src.game_connection.sessions import DEFAULT_SESSION
+from src.utils.config_schema import get_settings
+from src.utils.cooldowns import CooldownStore
+
 class ShopSystem:
     def __init__(self, config):
         self.logger = logging.getLogger(__name__)
         self.config = config
-        self.user_shop_cooldowns = {}
-        self.shop_open = False
+        self.settings = get_settings(config).chat_shop
+        self.user_shop_cooldowns = CooldownStore(
+            self.settings.usercooldown,
+            state_file=(config.get('files', {}).get('chatShop_cooldowns', 'chatShop_cooldowns.json')
+                        if self.settings.persist_cooldowns else None)
+        )
+        self.open_sessions = set()  # Game sessions whose shop is open
         self.websocket_handler = None
         self.twitch_connection = None
         self.direct_connection = None
@@ -28,13 +36,13 @@ class ShopSystem:
 
     async def process_shop(self, item, username="direct", ctx=None, amount=1):
         """Process a shop request from either Twitch chat or direct connection."""
-        if not self.config['chatShop'].get('enabled', False):
+        if not self.settings.enabled:
             self.logger.debug("Shop is not enabled but a shop request was received for item: {item} and user {username}")
             return
 
-        if not self.shop_open and username != "direct":
+        if not self.open_sessions and username != "direct":
             if ctx and self.twitch_connection:
-                await self.twitch_connection.reply(ctx, "The shop is currently closed.")
+                await self.twitch_connection.reply(ctx, "The shop is currently closed.", notice="shop_closed")
             self.logger.debug("Shop is closed but a shop request was received for item: {item} and user {username}")
             return
 
@@ -43,15 +51,13 @@ class ShopSystem:
         # Handle Twitch-specific checks
         if ctx is not None:
             # Check user cooldown
-            if username in self.user_shop_cooldowns:
-                time_since_last_use = current_time - self.user_shop_cooldowns[username]
-                if time_since_last_use < self.config['chatShop'].get('usercooldown', 300):
-                    remaining_cooldown = int(self.config['chatShop']['usercooldown'] - time_since_last_use)
-                    await self.twitch_connection.reply(ctx, f"You're on cooldown. You can use the shop again in {remaining_cooldown} seconds.")
-                    return
+            remaining_cooldown = int(self.user_shop_cooldowns.remaining(username, current_time))
+            if remaining_cooldown > 0:
+                await self.twitch_connection.reply(ctx, f"You're on cooldown. You can use the shop again in {remaining_cooldown} seconds.", notice="shop_cooldown")
+                return
 
-        # Send shop request to game
-        if self.websocket_handler and self.websocket_handler.game_connection:
+        # Send shop request to every game with an open shop, or the primary game for direct requests
+        if self.websocket_handler:
             try:
                 shop_data = {
                     "type": "shop_request",
@@ -60,35 +66,58 @@ class ShopSystem:
                     "amount": amount,
                     "timestamp": current_time
                 }
-                await self.websocket_handler.game_connection.send(json.dumps(shop_data))
+                if self.open_sessions:
+                    sent = False
+                    for session in list(self.open_sessions):
+                        sent = await self.websocket_handler.send_to_game(shop_data, session=session) or sent
+                else:
+                    sent = await self.websocket_handler.send_to_game(shop_data)
+                if not sent:
+                    self.logger.error("Failed to send shop request: game is not connected")
+                    return
                 self.logger.debug(f"Shop request sent for {username}: {item}")
 
                 # Update user's cooldown for Twitch users
                 if ctx is not None:
-                    self.user_shop_cooldowns[username] = current_time
+                    self.user_shop_cooldowns.start(username, current_time)
 
             except Exception as e:
                 self.logger.error(f"Failed to send shop request: {e}")
 
-    def set_shop_open(self, is_open):
-        """Set shop open status and handle announcements."""
-        if self.shop_open == is_open:
+    @property
+    def shop_open(self):
+        return bool(self.open_sessions)
+
+    def set_shop_open(self, is_open, session=DEFAULT_SESSION):
+        """Set a game session's shop open status and handle announcements."""
+        if (session in self.open_sessions) == is_open:
             return
 
-        self.shop_open = is_open
+        was_open = self.shop_open
+        if is_open:
+            self.open_sessions.add(session)
+        else:
+            self.open_sessions.discard(session)
+        if self.shop_open == was_open:
+            return
         
         # Announce shop status changes in Twitch chat if configured
-        if self.twitch_connection and not self.config.get('chatShop', {}).get('channel_points', False):
+        settings = self.settings
+        if self.twitch_connection and not settings.channel_points:
             if is_open:
-                announcement = self.config['chatShop']['announcement_message'].format(
-                    duration=self.config['chatShop']['open_duration']
-                )
+                announcement = settings.announcement_message.format(duration=settings.open_duration)
                 asyncio.create_task(self.twitch_connection.queue_message(announcement))
             # Could add a shop closing announcement here if desired
 
+    async def close(self):
+        """Save cooldowns still waiting to be written."""
+        await self.user_shop_cooldowns.flush()
+
     def update_config(self, config):
         """Update configuration."""
         self.config = config
+        self.settings = get_settings(config).chat_shop
+        self.user_shop_cooldowns.duration = self.settings.usercooldown
 
     def is_shop_open(self):
         """Check if the shop is open."""
@@ -1,58 +1,296 @@
 import asyncio
+import inspect
 import logging
+import time
 import traceback
-from typing import Dict
+from collections import deque
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Union
 
 logger = logging.getLogger(__name__)
 
+# Supervised task states
+STATE_WAITING = 'waiting'  # For its dependencies to be ready
+STATE_STARTING = 'starting'
+STATE_RUNNING = 'running'  # Up, and passing its probe if it has one
+STATE_BACKOFF = 'backoff'  # Waiting to be restarted
+STATE_FAILED = 'failed'  # Out of restart budget, given up on
+STATE_STOPPED = 'stopped'
+
+# A liveness probe returns (or resolves to) True while the task is healthy
+Probe = Callable[[], Union[bool, Awaitable[bool]]]
+
+
+class SupervisedTask:
+    """Supervision state and metrics of one named task."""
+
+    def __init__(self, name: str, probe: Optional[Probe], depends_on: Iterable[str], max_restarts: int,
+                 restart_window: float, ready: asyncio.Event):
+        self.name = name
+        self.probe = probe
+        self.depends_on = tuple(depends_on)
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.state = STATE_STARTING
+        self.ready = ready  # Set while the task is up, dependents wait on it
+        self.stopping = False
+        self.stop_requested = asyncio.Event()  # Wakes the supervisor while it waits for dependencies or backoff
+        self.unhealthy = False  # The probe cancelled the task and wants it restarted
+        self.probe_failures = 0
+        self.restarts = 0
+        self._recent_restarts = deque()  # When restarts happened, within restart_window
+        self.started_at: Optional[float] = None  # When the current instance started
+        self.down_since: Optional[float] = None  # When the task was last seen failing
+        self.last_recovery: Optional[float] = None  # Seconds from failure to ready, for the last failure
+        self.max_recovery = 0.0
+        self.last_error: Optional[str] = None
+
+    def request_stop(self):
+        self.stopping = True
+        self.stop_requested.set()
+
+    def record_restart(self, now: float):
+        self.restarts += 1
+        self._recent_restarts.append(now)
+
+    def budget_exhausted(self, now: float) -> bool:
+        """Whether max_restarts restarts already happened within the last restart_window seconds."""
+        while self._recent_restarts and now - self._recent_restarts[0] > self.restart_window:
+            self._recent_restarts.popleft()
+        return len(self._recent_restarts) >= self.max_restarts
+
+    def as_dict(self, now: float) -> dict:
+        return {
+            'state': self.state,
+            'ready': self.ready.is_set(),
+            'depends_on': list(self.depends_on),
+            'restarts': self.restarts,
+            'uptime': round(now - self.started_at, 1) if self.started_at is not None and self.ready.is_set() else 0.0,
+            'last_time_to_recover': None if self.last_recovery is None else round(self.last_recovery, 3),
+            'max_time_to_recover': round(self.max_recovery, 3),
+            'last_error': self.last_error,
+        }
+
+
 class TaskManager:
-    def __init__(self):
+    """
+    Supervisor for the bot's long-running subsystems.
+
+    Each task is restarted with exponential backoff when it crashes or
+    when its liveness probe fails probe_failures times in a row. A task
+    that returns is restarted right away, without counting against its
+    restart budget. A task is ready once its probe first passes (right away without a
+    probe), and tasks that depend on others wait for them to be ready before
+    every start. More than max_restarts restarts within restart_window
+    seconds and the task is given up on. Lifecycle changes are logged, kept
+    in `events` and passed to listeners; get_metrics() reports restart
+    counts, uptime and time to recover per task.
+    """
+
+    def __init__(self, probe_interval: float = 15.0, probe_timeout: float = 5.0, probe_failures: int = 3,
+                 startup_grace: float = 30.0, max_restarts: int = 5, restart_window: float = 300.0,
+                 stable_after: float = 60.0):
         self.tasks: Dict[str, asyncio.Task] = {}
+        self.supervised: Dict[str, SupervisedTask] = {}
+        self._ready: Dict[str, asyncio.Event] = {}  # Task name -> ready event, shared across its restarts
         self.should_run = True
         self.restart_delays = {}  # Track delay times for exponential backoff
         self.max_restart_delay = 300  # Maximum delay of 5 minutes
         self.base_delay = 1  # Start with 1 second delay
-        
-    async def start_task(self, name: str, coro, *args, **kwargs):
-        """Start a task with automatic restart on failure."""
-        consecutive_failures = 0
-        
-        while self.should_run:
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.probe_failures = probe_failures
+        self.startup_grace = startup_grace  # Probe failures before the first pass don't count for this long
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.stable_after = stable_after  # Uptime after which backoff starts over
+        self.events = deque(maxlen=100)
+        self._listeners: List[Callable[[dict], None]] = []
+
+    def add_listener(self, callback: Callable[[dict], None]):
+        """Call callback with every lifecycle event."""
+        self._listeners.append(callback)
+
+    def _emit(self, record: SupervisedTask, event: str, **details):
+        entry = {'time': time.time(), 'task': record.name, 'event': event, 'state': record.state, **details}
+        self.events.append(entry)
+        logger.info(f"Task {record.name} {event}" + (f": {details}" if details else ""))
+        for listener in self._listeners:
             try:
-                # Add initial delay if this is a restart after multiple failures
-                if consecutive_failures > 3:
-                    await asyncio.sleep(5.0)  # Force minimum 5-second delay after repeated failures
-                
-                self.tasks[name] = asyncio.create_task(coro(*args, **kwargs))
-                await self.tasks[name]
-                # If we get here, task completed normally
-                consecutive_failures = 0
-            except asyncio.CancelledError:
-                logger.info(f"Task {name} was cancelled")
-                break
+                listener(entry)
             except Exception as e:
-                if not self.should_run:
+                logger.error(f"Error in task event listener: {e}")
+
+    async def start_task(self, name: str, coro, *args, probe: Optional[Probe] = None,
+                         depends_on: Iterable[str] = (), **kwargs):
+        """
+        Run coro(*args, **kwargs) under supervision until stopped.
+
+        Args:
+            probe: Liveness probe, sync or async, returning True while the task is healthy.
+            depends_on: Names of tasks that must be ready before this one starts.
+        """
+        record = SupervisedTask(name, probe, depends_on, self.max_restarts, self.restart_window,
+                                self._ready_event(name))
+        self.supervised[name] = record
+
+        try:
+            while self.should_run and not record.stopping:
+                await self._wait_for_dependencies(record)
+                if not self.should_run or record.stopping:
+                    break
+
+                record.state = STATE_STARTING
+                record.started_at = time.monotonic()
+                record.unhealthy = False
+                record.probe_failures = 0
+                self._emit(record, 'started', restarts=record.restarts)
+
+                task = self.tasks[name] = asyncio.create_task(coro(*args, **kwargs))
+                watcher = asyncio.create_task(self._watch(record, task))
+                try:
+                    await asyncio.wait({task})
+                finally:
+                    watcher.cancel()
+                    if not task.done():
+                        task.cancel()
+                    if self.tasks.get(name) is task:
+                        del self.tasks[name]
+                    record.ready.clear()
+
+                now = time.monotonic()
+                uptime = now - record.started_at
+                if task.cancelled() and not record.unhealthy:
+                    # Cancelled from outside, by stop_task or stop_all
                     break
-                    
-                consecutive_failures += 1
-                logger.error(f"Task {name} failed with error: {str(e)}")
-                logger.error(f"Traceback for {name}:")
-                traceback.print_exc()
-                
-                # Calculate delay with exponential backoff
+                if not self.should_run or record.stopping:
+                    break
+
+                if record.unhealthy:
+                    reason = 'unhealthy'
+                elif task.exception() is not None:
+                    error = task.exception()
+                    reason = 'crashed'
+                    record.last_error = str(error)
+                    logger.error(f"Task {name} failed with error: {error}")
+                    logger.error(f"Traceback for {name}:\n"
+                                 + "".join(traceback.format_exception(type(error), error, error.__traceback__)))
+                else:
+                    # Finished on its own, not a failure
+                    self._emit(record, 'exited', uptime=round(uptime, 1))
+                    continue
+                if record.down_since is None:
+                    record.down_since = now
+
+                if record.budget_exhausted(now):
+                    record.state = STATE_FAILED
+                    self._emit(record, 'gave_up', reason=reason, restarts=record.restarts,
+                               window=record.restart_window)
+                    logger.error(f"Task {name} restarted {record.max_restarts} times within "
+                                 f"{record.restart_window:.0f} seconds, not restarting it again")
+                    return
+
+                # Calculate delay with exponential backoff, starting over after a stable run
+                if uptime >= self.stable_after:
+                    self.reset_delay(name)
                 delay = self.get_next_delay(name)
                 # Use longer delay for network-related errors
-                if "address already in use" in str(e).lower() or "socket" in str(e).lower():
+                error_text = (record.last_error or "").lower() if reason == 'crashed' else ""
+                if "address already in use" in error_text or "socket" in error_text:
                     delay = max(delay, 10.0)  # Minimum 10-second delay for network errors
-                    
-                logger.info(f"Restarting {name} in {delay} seconds...")
-                await asyncio.sleep(delay)
-            finally:
-                if name in self.tasks:
-                    del self.tasks[name]
+
+                record.state = STATE_BACKOFF
+                self._emit(record, 'restarting', reason=reason, delay=delay)
+                if await self._wait_or_stop(record, asyncio.sleep(delay)):
+                    break
+                record.record_restart(time.monotonic())
+        except asyncio.CancelledError:
+            logger.info(f"Task {name} was cancelled")
+        finally:
+            if record.state != STATE_FAILED:
+                record.state = STATE_STOPPED
+                record.started_at = None
+                self._emit(record, 'stopped')
+
+    def _ready_event(self, name: str) -> asyncio.Event:
+        event = self._ready.get(name)
+        if event is None:
+            event = self._ready[name] = asyncio.Event()
+        return event
+
+    async def _wait_for_dependencies(self, record: SupervisedTask):
+        # Dependencies that haven't been started yet are waited for too
+        for dependency in record.depends_on:
+            ready = self._ready_event(dependency)
+            if not ready.is_set():
+                record.state = STATE_WAITING
+                self._emit(record, 'waiting', dependency=dependency)
+                if await self._wait_or_stop(record, ready.wait()):
+                    return
+
+    @staticmethod
+    async def _wait_or_stop(record: SupervisedTask, waiting) -> bool:
+        """Await waiting unless the task is stopped first. Returns True if it was stopped."""
+        waiter = asyncio.ensure_future(waiting)
+        stopper = asyncio.ensure_future(record.stop_requested.wait())
+        try:
+            await asyncio.wait({waiter, stopper}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+            stopper.cancel()
+        return record.stop_requested.is_set()
+
+    async def _watch(self, record: SupervisedTask, task: asyncio.Task):
+        """Mark the task ready once it is up, then keep probing it while it runs."""
+        if record.probe is None:
+            self._mark_ready(record)
+            return
+
+        while not task.done():
+            if await self._run_probe(record):
+                record.probe_failures = 0
+                if not record.ready.is_set():
+                    self._mark_ready(record)
+            elif record.ready.is_set() or time.monotonic() - record.started_at >= self.startup_grace:
+                record.probe_failures += 1
+                if record.probe_failures >= self.probe_failures:
+                    record.unhealthy = True
+                    record.last_error = f"failed {record.probe_failures} liveness probes in a row"
+                    record.down_since = time.monotonic()
+                    self._emit(record, 'unhealthy', failures=record.probe_failures)
+                    task.cancel()
+                    return
+            # Poll quickly until the task first comes up, so dependents start without delay
+            await asyncio.sleep(self.probe_interval if record.ready.is_set() else 0.5)
+
+    async def _run_probe(self, record: SupervisedTask) -> bool:
+        try:
+            result = record.probe()
+            if inspect.isawaitable(result):
+                result = await asyncio.wait_for(result, self.probe_timeout)
+            return bool(result)
+        except Exception as e:
+            logger.debug(f"Liveness probe of {record.name} raised: {e!r}")
+            return False
+
+    def _mark_ready(self, record: SupervisedTask):
+        record.state = STATE_RUNNING
+        record.ready.set()
+        if record.down_since is None:
+            self._emit(record, 'ready')
+            return
+        recovery = time.monotonic() - record.down_since
+        record.down_since = None
+        record.last_recovery = recovery
+        record.max_recovery = max(record.max_recovery, recovery)
+        self._emit(record, 'recovered', time_to_recover=round(recovery, 3))
 
     async def stop_task(self, name: str):
         """Stop a specific task gracefully."""
+        record = self.supervised.get(name)
+        if record is not None:
+            # Also stops a task that is waiting for its dependencies or to be restarted
+            record.request_stop()
+
         if name not in self.tasks:
             logger.debug(f"Task {name} not found - may have already been stopped")
             return
@@ -68,7 +306,7 @@ class TaskManager:
             except Exception as e:
                 logger.error(f"Error while stopping task {name}: {e}")
 
-        await self.tasks.pop(name, None)  # Safely remove task
+        self.tasks.pop(name, None)  # Safely remove task
         self.reset_delay(name)
 
     def get_next_delay(self, name: str) -> float:
@@ -83,20 +321,31 @@ class TaskManager:
         if name in self.restart_delays:
             del self.restart_delays[name]
 
+    def get_metrics(self) -> dict:
+        """Per-task state, restart counts, uptime and time to recover, and the latest lifecycle events."""
+        now = time.monotonic()
+        return {
+            'tasks': {name: record.as_dict(now) for name, record in self.supervised.items()},
+            'events': list(self.events)[-20:],
+        }
+
     async def stop_all(self):
         """Stop all tasks gracefully."""
         logger.info("TaskManager stopping all tasks...")
         self.should_run = False
-        
+        # Release supervisors waiting for dependencies or backoff, they have no task to cancel
+        for record in self.supervised.values():
+            record.request_stop()
+
         # Make a copy of tasks to avoid dict changes during iteration
         tasks_to_stop = list(self.tasks.items())
-        
+
         # First attempt to cancel all tasks
         for name, task in tasks_to_stop:
             if not task.done():
                 logger.info(f"Cancelling task: {name}")
                 task.cancel()
-        
+
         if tasks_to_stop:
             # Wait for all tasks with a timeout
             try:
@@ -106,7 +355,7 @@ class TaskManager:
                 )
             except asyncio.TimeoutError:
                 logger.warning("Some tasks did not terminate within timeout, forcing shutdown")
-        
+
         # Clear any remaining tasks
         self.tasks.clear()
         logger.info("All tasks stopped")
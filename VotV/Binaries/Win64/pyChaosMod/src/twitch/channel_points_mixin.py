@@ -1,15 +1,62 @@
 import os
+import sys
 import json
 import logging
 from datetime import datetime
+import threading
 import traceback
-from typing import Dict, Optional, List
+from functools import partial
+from typing import Callable, Dict, Optional, List, Tuple
 import asyncio
 
 from twitchAPI.helper import first
 from twitchAPI.object.eventsub import ChannelPointsCustomRewardRedemptionAddEvent
 from twitchAPI.type import CustomRewardRedemptionStatus
 
+from src.twitch.command_catalog import ChaosCommand, CommandCatalog
+from src.twitch.redemption_batcher import RedemptionBatcher
+from src.twitch.reward_provisioner import RewardProvisioner, RewardSpec
+
+LEFTOVER_REWARD_MODES = ('auto_delete', 'keep', 'prompt')
+
+_console_read: Optional[asyncio.Future] = None
+
+
+def read_console_line() -> asyncio.Future:
+    """
+    Read one line from the console on a daemon thread.
+
+    Unlike asyncio.to_thread(input), a read nobody answers doesn't keep the
+    process from exiting. A read still waiting from an earlier call is
+    reused rather than starting a second one. Resolves to '' on EOF.
+    """
+    global _console_read
+    loop = asyncio.get_running_loop()
+    if _console_read is not None and not _console_read.done() and _console_read.get_loop() is loop:
+        return _console_read
+    future = _console_read = loop.create_future()
+
+    def resolve(line, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(line)
+
+    def read():
+        try:
+            line, error = sys.stdin.readline(), None
+        except Exception as e:
+            line, error = None, e
+        try:
+            loop.call_soon_threadsafe(resolve, line, error)
+        except RuntimeError:
+            pass  # The loop closed while waiting for the console
+
+    threading.Thread(target=read, name='console-input', daemon=True).start()
+    return future
+
 
 class ChannelPointsMixin:
     """Mixin class to handle channel points rewards with twitchAPI."""
@@ -17,6 +64,9 @@ class ChannelPointsMixin:
     async def initialize_channel_points(self):
         """Initialize channel points system."""
         self.rewards: Dict[str, dict] = {}
+        self.reward_index: Dict[str, Tuple[str, Callable]] = {}
+        # Rewards left by the last session that no command has claimed yet, kept in the rewards file
+        self.unclaimed_rewards: Dict[str, dict] = {}
         self.channel_id = None
         self.rewards_file = self.config.get('files', {}).get('channel_points', 'channel_point_rewards.json')
 
@@ -25,66 +75,120 @@ class ChannelPointsMixin:
             with open(self.rewards_file, 'w') as f:
                 json.dump({}, f)
 
-        # Check for leftover rewards from previous sessions
-        await self.check_leftover_rewards()
-
         # Get channel ID if needed (should be set during twitch API initialization)
         if not self.channel_id and hasattr(self, 'twitch') and self.twitch:
             await self.get_channel_id()
 
+        # Check for leftover rewards from previous sessions
+        await self.check_leftover_rewards()
+
         if self.channel_id:
+            await self.start_redemption_batcher()
             await self.create_rewards()
+            self.channel_points_active = True
         else:
             self.logger.error("Failed to get channel ID. Cannot create rewards.")
 
+    async def start_redemption_batcher(self):
+        """Start batching redemption status updates, resuming any left pending by the last session."""
+        if getattr(self, 'redemption_batcher', None):
+            await self.redemption_batcher.close()
+        self.redemption_batcher = RedemptionBatcher(
+            self.twitch,
+            self.channel_id,
+            window=self.config.get('twitch', {}).get('redemption_batch_window', 0.5),
+            state_file=self.config.get('files', {}).get('redemption_statuses', 'pending_redemptions.json')
+        )
+        await self.redemption_batcher.start()
+
+    async def close_redemption_batcher(self):
+        """Flush pending redemption status updates, saving any that fail for the next session."""
+        if getattr(self, 'redemption_batcher', None):
+            await self.redemption_batcher.close()
+            self.redemption_batcher = None
+
     async def check_leftover_rewards(self):
-        """Check for and handle any leftover rewards from previous sessions."""
-        if not os.path.exists(self.rewards_file):
-            self.logger.debug("No rewards file found")
+        """
+        Handle rewards left on the channel by a previous session, without blocking the event loop.
+
+        What happens is set by `leftover_rewards` in twitch.cfg:
+            keep        - leave them; provisioning reuses the ones that still match a command
+            auto_delete - delete them
+            prompt      - ask on the console, keeping them if nobody answers within
+                          `leftover_prompt_timeout` seconds or there is no console
+
+        The decision and the deletes run in a background task that provisioning
+        waits for, so the game and overlay servers keep serving meanwhile.
+        """
+        leftovers = {key: reward for key, reward in self.load_stored_rewards().items() if reward.get('id')}
+        self.unclaimed_rewards = dict(leftovers)
+        if not leftovers:
+            self.logger.debug("No leftover rewards found")
             return
 
+        self.logger.warning(f"Found {len(leftovers)} leftover channel point rewards from previous session!")
+        # If channel points are disabled, we should still offer cleanup
+        if not self.config.get('twitch', {}).get('channel_points', False):
+            self.logger.warning("Channel points are currently disabled, but leftover rewards exist.")
+
+        self.leftover_cleanup_task = asyncio.create_task(self.cleanup_leftover_rewards(leftovers))
+
+    async def cleanup_leftover_rewards(self, leftovers: Dict[str, dict]):
+        """Decide what to do with leftover rewards and delete them if asked to."""
         try:
-            with open(self.rewards_file, 'r') as f:
-                stored_rewards = json.load(f)
-
-            if stored_rewards:
-                self.logger.warning("Found leftover channel point rewards from previous session!")
-
-                # If channel points are disabled, we should still offer cleanup
-                if not self.config.get('twitch', {}).get('channel_points', False):
-                    self.logger.warning("Channel points are currently disabled, but leftover rewards exist.")
-
-                self.logger.warning("Would you like to delete these rewards? Type 'yes' to confirm:")
-                response = input().lower().strip()
-
-                if response == 'yes':
-                    try:
-                        # Temporarily ensure we have a channel ID for cleanup
-                        if not self.channel_id and hasattr(self, 'twitch') and self.twitch:
-                            await self.get_channel_id()
-
-                        # Fetch and delete each reward
-                        for cmd_id, reward_data in stored_rewards.items():
-                            if self.twitch:
-                                await self.twitch.delete_custom_reward(self.channel_id, reward_data['reward_id'])
-                                self.logger.debug(f"Deleted leftover reward: {reward_data['title']}")
-                            else:
-                                self.logger.warning(
-                                    f"Cannot delete reward {reward_data['reward_id']}: Twitch API not initialized")
-
-                        self.clear_rewards_file()
-                        self.logger.info("Successfully cleaned up leftover rewards.")
-                    except Exception as e:
-                        self.logger.error(f"Failed to clean up leftover rewards: {e}")
-                        self.logger.debug(traceback.format_exc())
-                else:
-                    self.logger.info("Skipping reward cleanup.")
+            mode = str(self.config.get('twitch', {}).get('leftover_rewards', 'prompt')).lower()
+            if mode not in LEFTOVER_REWARD_MODES:
+                self.logger.warning(f"Unknown leftover_rewards mode '{mode}' in twitch.cfg, using 'prompt'")
+                mode = 'prompt'
+            if mode == 'prompt':
+                mode = 'auto_delete' if await self.prompt_leftover_cleanup() else 'keep'
+
+            if mode == 'keep':
+                self.logger.info("Keeping leftover rewards, matching ones will be reused.")
+                return
+
+            if not self.channel_id or not getattr(self, 'twitch', None):
+                self.logger.warning("Cannot delete leftover rewards: Twitch API not initialized")
+                return
+            deleted = await self.get_reward_provisioner().delete(leftovers)
+            for key in deleted:
+                self.unclaimed_rewards.pop(key, None)
+            if len(deleted) == len(leftovers):
+                self.clear_rewards_file()
+                self.logger.info("Successfully cleaned up leftover rewards.")
             else:
-                self.logger.debug("No leftover rewards found")
+                # Keep the ones still on the channel listed, so a later cleanup can find them
+                self.save_rewards()
+                self.logger.warning(f"Deleted {len(deleted)} of {len(leftovers)} leftover rewards")
         except Exception as e:
-            self.logger.error(f"Error checking leftover rewards: {e}")
+            self.logger.error(f"Failed to clean up leftover rewards: {e}")
             self.logger.debug(traceback.format_exc())
 
+    async def prompt_leftover_cleanup(self) -> bool:
+        """Ask on the console whether to delete leftover rewards. Returns False on timeout or without a console."""
+        if sys.stdin is None or not sys.stdin.isatty():
+            self.logger.info("No console to ask about leftover rewards on.")
+            return False
+
+        timeout = self.config.get('twitch', {}).get('leftover_prompt_timeout', 30)
+        self.logger.warning(f"Would you like to delete these rewards? Type 'yes' within {timeout}s to confirm:")
+        try:
+            # Shielded so a timeout leaves the read pending for the next prompt instead of orphaning it
+            response = await asyncio.wait_for(asyncio.shield(read_console_line()), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.logger.info("No answer about leftover rewards.")
+            return False
+        except (OSError, ValueError):
+            return False
+        return response.lower().strip() == 'yes'
+
+    async def wait_for_leftover_cleanup(self):
+        """Wait until leftover rewards are dealt with, so provisioning never reuses one being deleted."""
+        task = getattr(self, 'leftover_cleanup_task', None)
+        if task is not None and not task.done():
+            self.logger.info("Waiting for leftover reward cleanup before creating rewards...")
+            await asyncio.shield(task)
+
     async def get_channel_id(self):
         """Get channel ID using twitchAPI."""
         try:
@@ -100,8 +204,14 @@ class ChannelPointsMixin:
             self.logger.debug(traceback.format_exc())
 
     def save_rewards(self):
-        """Save current reward IDs to file."""
+        """
+        Save current reward IDs to file, atomically so a crash never leaves it half written.
+
+        Leftover rewards no command claimed are saved too, they are still on the channel.
+        """
         try:
+            rewards = dict(self.unclaimed_rewards)
+            rewards.update(self.rewards)
             # Save the rewards data
             reward_data = {
                 cmd_id: {
@@ -109,12 +219,14 @@ class ChannelPointsMixin:
                     'title': reward.get('title'),
                     'cost': reward.get('cost')
                 }
-                for cmd_id, reward in self.rewards.items()
+                for cmd_id, reward in rewards.items()
                 if reward.get('id')  # Only save rewards with an ID
             }
 
-            with open(self.rewards_file, 'w') as f:
+            temp_file = f"{self.rewards_file}.tmp"
+            with open(temp_file, 'w') as f:
                 json.dump(reward_data, f)
+            os.replace(temp_file, self.rewards_file)
             self.logger.debug("Saved reward IDs to file")
         except Exception as e:
             self.logger.error(f"Failed to save reward IDs to file: {e}")
@@ -130,31 +242,18 @@ class ChannelPointsMixin:
             self.logger.error(f"Failed to clear rewards file: {e}")
             self.logger.debug(traceback.format_exc())
 
-    def load_commands(self):
-        """Load commands from commands file."""
-        commands = []
+    def get_command_catalog(self) -> CommandCatalog:
+        """Get the shared command catalog, following the commands file path in the config."""
         commands_file = self.config['files']['commands']
+        if getattr(self, 'command_catalog', None) is None:
+            self.command_catalog = CommandCatalog(commands_file)
+        else:
+            self.command_catalog.set_path(commands_file)
+        return self.command_catalog
 
-        if not os.path.exists(commands_file):
-            self.logger.error(f"Commands file not found: {commands_file}")
-            return commands
-
-        with open(commands_file, 'r') as file:
-            for line in file:
-                parts = line.strip().split('|')
-                if len(parts) == 6:
-                    command = {
-                        'title': parts[0],
-                        'id': parts[1],
-                        'description': parts[2],
-                        'pointCost': int(parts[3]),
-                        'isEnabledForPoints': parts[4].lower() == 'true',
-                        'pointsCooldown': int(parts[5])
-                    }
-                    commands.append(command)
-                else:
-                    self.logger.warning(f"Invalid command format: {line.strip()}")
-        return commands
+    def load_commands(self) -> Tuple[ChaosCommand, ...]:
+        """Get the commands from the commands file, re-read only when it changed."""
+        return self.get_command_catalog().commands
 
     async def get_existing_reward(self, reward_id: str) -> Optional[dict]:
         """Fetch an existing reward by ID using twitchAPI."""
@@ -170,30 +269,176 @@ class ChannelPointsMixin:
             self.logger.debug(traceback.format_exc())
             return None
 
-    async def create_rewards(self):
-        """Create channel point rewards."""
-        # First create special system rewards if enabled
-        await self.create_special_system_rewards()
+    def get_reward_provisioner(self) -> RewardProvisioner:
+        """Create a provisioner for this channel, sized by `reward_concurrency` in twitch.cfg."""
+        return RewardProvisioner(
+            self.twitch,
+            self.channel_id,
+            concurrency=self.config.get('twitch', {}).get('reward_concurrency', 8)
+        )
 
-        if not self.config.get('twitch', {}).get('channel_points', False):
-            self.logger.debug("Chaos Command Channel points are disabled. Skipping custom reward creation.")
+    def load_stored_rewards(self) -> Dict[str, dict]:
+        """Get the rewards saved by the last session, keyed by command ID, in CustomReward dict form."""
+        try:
+            with open(self.rewards_file, 'r') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {
+            cmd_id: {'id': reward.get('reward_id'), 'title': reward.get('title'), 'cost': reward.get('cost')}
+            for cmd_id, reward in stored.items()
+            if isinstance(reward, dict)
+        }
+
+    async def provision_rewards(self, specs: List[RewardSpec]) -> bool:
+        """
+        Create, update or reuse the rewards for specs and save the rewards file once.
+
+        Returns:
+            bool: True if every reward was provisioned.
+        """
+        if not self.channel_id or not hasattr(self, 'twitch') or not self.twitch:
+            self.logger.error("Twitch API or channel ID not set. Cannot create custom rewards.")
+            return False
+
+        if not specs:
+            return True
+
+        await self.wait_for_leftover_cleanup()
+        known = dict(self.unclaimed_rewards)
+        known.update(self.rewards)
+        provisioner = self.get_reward_provisioner()
+        provisioned = await provisioner.provision(specs, known)
+        for command_id, reward in provisioned.items():
+            self.add_reward(command_id, reward)
+            self.unclaimed_rewards.pop(command_id, None)
+        self.save_rewards()
+
+        if provisioner.updated or provisioner.reused:
+            self.logger.info(f"Reused {provisioner.reused} and updated {provisioner.updated} existing rewards")
+        return len(provisioned) == len(specs)
+
+    def add_reward(self, command_id: str, reward: dict):
+        """Track a reward and index its Twitch reward ID for redemption dispatch."""
+        previous = self.rewards.get(command_id)
+        if previous and previous.get('id') != reward.get('id'):
+            self.reward_index.pop(previous.get('id'), None)
+        self.rewards[command_id] = reward
+        if reward.get('id'):
+            self.reward_index[reward['id']] = (command_id, self.get_redemption_handler(command_id))
+
+    def discard_reward(self, command_id: str) -> Optional[dict]:
+        """Stop tracking a reward. Returns it, if it was tracked."""
+        reward = self.rewards.pop(command_id, None)
+        if reward:
+            self.reward_index.pop(reward.get('id'), None)
+        return reward
+
+    def get_redemption_handler(self, command_id: str) -> Callable:
+        """Get the coroutine function that handles a redemption of the reward for command_id."""
+        special_handlers = {
+            'emails_points': self.email_channel_points,
+            'chatShop_points': self.shop_channel_points,
+            'hints_points': self.hint_channel_points,
+        }
+        handler = special_handlers.get(command_id)
+        if handler is not None:
+            return handler
+        # This is a Chaos Command reward
+        return partial(self.chaos_command_channel_points, command_id=command_id)
+
+    def get_command_reward_specs(self, paused_keys: Optional[set] = None) -> List[RewardSpec]:
+        """
+        Get reward specs for the chaos commands enabled for channel points.
+
+        Args:
+            paused_keys: If given, the IDs of commands that are listed but not enabled for points are added to it.
+        """
+        specs = []
+        for cmd in self.load_commands():
+            if not cmd.enabled_for_points:
+                if paused_keys is not None:
+                    paused_keys.add(cmd.id)
+                continue
+            if cmd.point_cost < 1:
+                self.logger.error(f"Invalid point cost for command '{cmd.title}' - must be at least 1")
+                continue
+            specs.append(RewardSpec(cmd.id, cmd.title, cmd.description, cmd.point_cost, cmd.points_cooldown))
+        return specs
+
+    def get_desired_reward_specs(self, paused_keys: Optional[set] = None) -> List[RewardSpec]:
+        """Get specs for every reward the current config wants live, special systems first."""
+        specs = self.get_special_system_reward_specs(paused_keys)
+        if self.config.get('twitch', {}).get('channel_points', False):
+            specs.extend(self.get_command_reward_specs(paused_keys))
+        return specs
+
+    async def reconcile_rewards(self):
+        """
+        Bring the channel's rewards in line with the current config, touching only what changed.
+
+        Missing rewards are created and changed ones (cost, cooldown, title, prompt)
+        updated in place. Rewards of a command or system that is still configured
+        but switched off are paused, so switching it back on is a single update.
+        Rewards whose command is gone, or whose whole category has channel points
+        turned off, are deleted.
+        """
+        paused_keys = set()
+        desired = {spec.key: spec for spec in self.get_desired_reward_specs(paused_keys)}
+        changed = [
+            spec for key, spec in desired.items()
+            if key not in self.rewards or not spec.matches(self.rewards[key])
+        ]
+        to_pause = {
+            key: reward for key, reward in self.rewards.items()
+            if key not in desired and key in paused_keys and not reward.get('is_paused', False)
+        }
+        to_delete = {
+            key: reward for key, reward in self.rewards.items()
+            if key not in desired and key not in paused_keys
+        }
+        if not (changed or to_pause or to_delete):
             return
 
-        # Then create regular command rewards
-        commands = self.load_commands()
-        enabled_commands_count = sum(1 for cmd in commands if cmd['isEnabledForPoints'])
-        if enabled_commands_count > 0:
-            self.logger.info(f"Creating {enabled_commands_count} custom channel point rewards...")
+        self.logger.info(
+            f"Syncing channel point rewards: {len(changed)} to create or update, "
+            f"{len(to_pause)} to pause, {len(to_delete)} to delete"
+        )
+        provisioner = self.get_reward_provisioner()
+        paused, deleted = await asyncio.gather(provisioner.pause(to_pause), provisioner.delete(to_delete))
+        for key, reward in paused.items():
+            self.add_reward(key, reward)
+        for key in deleted:
+            self.discard_reward(key)
+        if changed:
+            await self.provision_rewards(changed)
+        else:
+            self.save_rewards()
 
-        for cmd in commands:
-            if cmd['isEnabledForPoints']:
-                await self.create_custom_reward(cmd)
+    async def create_rewards(self):
+        """Create channel point rewards."""
+        if self.get_special_system_reward_specs():
+            self.logger.info(f"Creating special system rewards (email, chat shop, etc)...")
+        if self.config.get('twitch', {}).get('channel_points', False):
+            command_specs = self.get_command_reward_specs()
+            if command_specs:
+                self.logger.info(f"Creating {len(command_specs)} custom channel point rewards...")
+        else:
+            self.logger.debug("Chaos Command Channel points are disabled. Skipping custom reward creation.")
 
-        self.logger.warning(
+        await self.reconcile_rewards()
+
+        if self.config.get('twitch', {}).get('channel_points', False):
+            self.logger.warning(
                 "Channel points are enabled. You must use Ctrl+C to stop the bot to remove rewards properly.")
 
-    async def create_special_system_rewards(self):
-        """Create rewards for special system commands (Email, Shop, Hints)."""
+    def get_special_system_reward_specs(self, paused_keys: Optional[set] = None) -> List[RewardSpec]:
+        """
+        Get reward specs for the enabled special systems (Email, Shop, Hints).
+
+        Args:
+            paused_keys: If given, the keys of systems with channel points on but the system disabled are added to it.
+        """
         special_systems = [
             {
                 'system': 'emails',
@@ -215,76 +460,41 @@ class ChannelPointsMixin:
             }
         ]
 
-        enabled_systems_count = sum(
-            1 for system in special_systems
-            if self.config.get(system['system'], {}).get('channel_points', False) and self.config.get(system['system'],
-                                                                                                      {}).get('enabled',
-                                                                                                              False)
-        )
-
-        if enabled_systems_count > 0:
-            self.logger.info(f"Creating special system rewards (email, chat shop, etc)...")
-
+        specs = []
         for system in special_systems:
+            system_config = self.config.get(system['system'], {})
+            if not system_config.get('channel_points', False):
+                continue
+            if not system_config.get('enabled', False):
+                if paused_keys is not None:
+                    paused_keys.add(f"{system['system']}_points")
+                continue
+
             if system['cost'] < 1:
                 self.logger.error(f"Invalid cost for {system['system']}. Must be at least 1.")
                 continue
 
-            if self.config.get(system['system'], {}).get('channel_points', False) and self.config.get(system['system'],
-                                                                                                      {}).get('enabled',
-                                                                                                              False):
-                command = {
-                    'id': f"{system['system']}_points",
-                    'title': system['title'],
-                    'description': system['description'],
-                    'pointCost': system['cost'],
-                    'pointsCooldown': self.config.get(system['system'], {}).get('points_cooldown', 0),
-                    'isEnabledForPoints': True
-                }
+            # Special commands always require input
+            specs.append(RewardSpec(
+                f"{system['system']}_points",
+                system['title'],
+                system['description'],
+                system['cost'],
+                system_config.get('points_cooldown', 0),
+                user_input_required=True
+            ))
 
-                try:
-                    # Check if reward with this ID already exists in our list
-                    if command['id'] in self.rewards:
-                        self.logger.debug(f"Special reward for {system['system']} already exists")
-                        continue
-
-                    # Create the reward
-                    result = await self.twitch.create_custom_reward(
-                        broadcaster_id=self.channel_id,
-                        title=command['title'],
-                        cost=command['pointCost'],
-                        prompt=command['description'],
-                        is_global_cooldown_enabled=(command['pointsCooldown'] > 0),
-                        global_cooldown_seconds=command['pointsCooldown'] if command['pointsCooldown'] > 0 else None,
-                        is_user_input_required=True,  # Special commands always require input
-                        should_redemptions_skip_request_queue=False
-                    )
-
-                    # Store the reward data
-                    self.rewards[command['id']] = result.to_dict()
-                    self.logger.debug(f"Created special reward for {system['system']}")
-                    self.save_rewards()
-
-                except Exception as e:
-                    if "CREATE_CUSTOM_REWARD_DUPLICATE_REWARD" in str(e):
-                        # Handle duplicate reward by getting it
-                        try:
-                            rewards = await self.twitch.get_custom_reward(self.channel_id)
-                            for reward in rewards:
-                                if reward.title == command['title']:
-                                    self.rewards[command['id']] = reward.to_dict()
-                                    self.logger.info(f"Added existing reward '{command['title']}' to rewards list")
-                                    self.save_rewards()
-                                    break
-                        except Exception as fetch_error:
-                            self.logger.error(f"Error fetching duplicate reward: {fetch_error}")
-                    else:
-                        self.logger.error(f"Failed to create special reward for {system['system']}: {e}")
-                        self.logger.debug(traceback.format_exc())
+        return specs
+
+    async def create_special_system_rewards(self):
+        """Create rewards for special system commands (Email, Shop, Hints)."""
+        await self.provision_rewards(
+            [spec for spec in self.get_special_system_reward_specs() if spec.key not in self.rewards]
+        )
 
     async def create_custom_reward(self, command):
         """
-        Create a single custom reward or add existing one if duplicate.
+        Create a single custom reward or reuse an existing one with the same title.
 
         Args:
             command (dict): Dictionary containing reward configuration
@@ -292,69 +502,18 @@ class ChannelPointsMixin:
         Returns:
             bool: True if reward creation/retrieval was successful, False otherwise
         """
-        if not self.channel_id or not hasattr(self, 'twitch') or not self.twitch:
-            self.logger.error("Twitch API or channel ID not set. Cannot create custom reward.")
-            return False
-
-        # Validate point cost
         try:
-            point_cost = int(command['pointCost'])
-            if point_cost < 1:
-                self.logger.error(f"Invalid point cost for command '{command['title']}' - must be at least 1")
-                return False
+            spec = RewardSpec.from_command(command)
         except (ValueError, KeyError):
-            self.logger.error(f"Invalid point cost format for command '{command['title']}'")
+            self.logger.error(f"Invalid point cost format for command '{command.get('title')}'")
             return False
-
-        try:
-            self.logger.debug(f"Attempting to create reward with data: {command}")
-
-            # Check for existing reward in our list
-            if command['id'] in self.rewards:
-                self.logger.debug(f"Reward '{command['title']}' already exists with ID: {command['id']}")
-                return True
-
-            # Create the reward using twitchAPI
-            try:
-                result = await self.twitch.create_custom_reward(
-                    broadcaster_id=self.channel_id,
-                    title=command['title'],
-                    cost=point_cost,
-                    prompt=command['description'],
-                    is_global_cooldown_enabled=(command['pointsCooldown'] > 0),
-                    global_cooldown_seconds=command['pointsCooldown'] if command['pointsCooldown'] > 0 else None,
-                    is_user_input_required=False,
-                    should_redemptions_skip_request_queue=False
-                )
-
-                self.rewards[command['id']] = result.to_dict()
-                self.logger.info(f"Successfully created custom reward: '{command['title']}'")
-                self.save_rewards()
-                return True
-
-            except Exception as e:
-                if "CREATE_CUSTOM_REWARD_DUPLICATE_REWARD" in str(e):
-                    # Handle duplicate reward by getting it
-                    try:
-                        rewards = await self.twitch.get_custom_reward(self.channel_id)
-                        for reward in rewards:
-                            if reward.title == command['title']:
-                                self.rewards[command['id']] = reward.to_dict()
-                                self.logger.info(f"Added existing reward '{command['title']}' to rewards list")
-                                self.save_rewards()
-                                return True
-                    except Exception as fetch_error:
-                        self.logger.error(f"Error fetching duplicate reward: {fetch_error}")
-                        return False
-                else:
-                    self.logger.error(f"Error creating reward '{command['title']}': {str(e)}")
-                    self.logger.debug(f"Full traceback: {traceback.format_exc()}")
-                    return False
-
-        except Exception as e:
-            self.logger.error(f"Unexpected error in create_custom_reward for '{command['title']}': {str(e)}")
-            self.logger.debug(f"Full traceback: {traceback.format_exc()}")
+        if spec.cost < 1:
+            self.logger.error(f"Invalid point cost for command '{command['title']}' - must be at least 1")
             return False
+        if spec.key in self.rewards:
+            self.logger.debug(f"Reward '{spec.title}' already exists with ID: {spec.key}")
+            return True
+        return await self.provision_rewards([spec])
 
     async def on_channel_points_redemption_add(self, event: ChannelPointsCustomRewardRedemptionAddEvent):
         """Handle a channel point redemption event from EventSub."""
@@ -362,27 +521,12 @@ class ChannelPointsMixin:
             redemption = event.event
             reward_id = redemption.reward.id
 
-            # Find the command ID associated with this reward
-            command_id = None
-            for cmd_id, reward in self.rewards.items():
-                if reward.get('id') == reward_id:
-                    command_id = cmd_id
-                    break
-
-            if command_id:
-                self.logger.debug(f"Channel points redeemed by {redemption.user_name} for command {command_id}")
-
-                if redemption.user_input:
-                    # Special system rewards
-                    if command_id == 'emails_points':
-                        await self.email_channel_points(redemption)
-                    elif command_id == 'chatShop_points':
-                        await self.shop_channel_points(redemption)
-                    elif command_id == 'hints_points':
-                        await self.hint_channel_points(redemption)
-                else:
-                    # This is a Chaos Command redemption
-                    await self.chaos_command_channel_points(redemption, command_id)
+            # Find the command associated with this reward
+            entry = self.reward_index.get(reward_id)
+            if entry is not None:
+                command_id, handler = entry
+                self.logger.debug("Channel points redeemed by %s for command %s", redemption.user_name, command_id)
+                await handler(redemption)
             else:
                 self.logger.warning(f"Received redemption for unknown reward ID: {reward_id}")
                 await self.refund_redemption(redemption)
@@ -442,16 +586,24 @@ class ChannelPointsMixin:
             await self.websocket_handler.process_chaos_command("trigger_chaos", command_id)
         await self.fulfill_redemption(redemption)
 
+    async def update_redemption(self, redemption, status: CustomRewardRedemptionStatus):
+        """Set a redemption's status, through the redemption batcher when it is running."""
+        batcher = getattr(self, 'redemption_batcher', None)
+        if batcher is not None:
+            batcher.submit(redemption.reward.id, redemption.id, status)
+            return
+        await self.twitch.update_redemption_status(
+            broadcaster_id=self.channel_id,
+            reward_id=redemption.reward.id,
+            redemption_ids=[redemption.id],
+            status=status
+        )
+
     async def fulfill_redemption(self, redemption):
         """Mark a redemption as fulfilled using twitchAPI."""
         try:
-            await self.twitch.update_redemption_status(
-                broadcaster_id=self.channel_id,
-                reward_id=redemption.reward.id,
-                redemption_ids=[redemption.id],
-                status=CustomRewardRedemptionStatus.FULFILLED
-            )
-            self.logger.debug(f"Fulfilled redemption {redemption.id} for user {redemption.user_name}")
+            await self.update_redemption(redemption, CustomRewardRedemptionStatus.FULFILLED)
+            self.logger.debug("Fulfilled redemption %s for user %s", redemption.id, redemption.user_name)
         except Exception as e:
             self.logger.error(f"Failed to fulfill redemption {redemption.id}: {e}")
             self.logger.debug(traceback.format_exc())
@@ -459,13 +611,8 @@ class ChannelPointsMixin:
     async def refund_redemption(self, redemption):
         """Refund/cancel a redemption using twitchAPI."""
         try:
-            await self.twitch.update_redemption_status(
-                broadcaster_id=self.channel_id,
-                reward_id=redemption.reward.id,
-                redemption_ids=[redemption.id],
-                status=CustomRewardRedemptionStatus.CANCELED
-            )
-            self.logger.debug(f"Refunded redemption {redemption.id} for user {redemption.user_name}")
+            await self.update_redemption(redemption, CustomRewardRedemptionStatus.CANCELED)
+            self.logger.debug("Refunded redemption %s for user %s", redemption.id, redemption.user_name)
         except Exception as e:
             self.logger.error(f"Failed to refund redemption {redemption.id}: {e}")
             self.logger.debug(traceback.format_exc())
@@ -483,10 +630,13 @@ class ChannelPointsMixin:
                     reward_id=reward.get('id')
                 )
                 self.logger.info(f"Removed custom reward: {reward.get('title')}")
-                del self.rewards[command_id]
+                self.discard_reward(command_id)
             except Exception as e:
                 self.logger.error(f"Failed to remove custom reward {reward.get('title')}: {e}")
                 self.logger.debug(traceback.format_exc())
 
-        # Clear the rewards file after successful removal
-        self.clear_rewards_file()
\ No newline at end of file
+        # Clear the rewards file after successful removal, keeping what is still on the channel listed
+        if self.rewards or self.unclaimed_rewards:
+            self.save_rewards()
+        else:
+            self.clear_rewards_file()
\ No newline at end of file
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, sent lowest number first
+PRIORITY_ANNOUNCEMENT = 0
+PRIORITY_REPLY = 1
+PRIORITY_NOTICE = 2  # Cooldown and other "try again later" notices
+
+# Twitch chat limits per channel, messages per 30 seconds
+CHAT_LIMIT = 20
+CHAT_LIMIT_MODERATOR = 100
+CHAT_PERIOD = 30.0
+
+MAX_MESSAGE_LENGTH = 500
+
+
+class TokenBucket:
+    """
+    Chat rate limiter with `size` tokens.
+
+    Each token comes back `period` seconds after it was spent, so no window
+    of `period` seconds ever holds more than `size` messages, which is how
+    Twitch counts. A plain refill-rate bucket would allow twice that across
+    a window boundary.
+    """
+
+    def __init__(self, size: int, period: float):
+        self.size = size
+        self.period = period
+        self._spent = deque()  # Times tokens were spent, oldest first
+
+    def _expire(self, now: float):
+        while self._spent and now - self._spent[0] >= self.period:
+            self._spent.popleft()
+
+    def available(self) -> int:
+        self._expire(time.monotonic())
+        return max(0, self.size - len(self._spent))
+
+    async def acquire(self):
+        """Wait for a token and spend it."""
+        while True:
+            now = time.monotonic()
+            self._expire(now)
+            if len(self._spent) < self.size:
+                self._spent.append(now)
+                return
+            await asyncio.sleep(self._spent[len(self._spent) - self.size] + self.period - now)
+
+    def refund(self):
+        """Give back the token spent last, when it ended up not being used."""
+        if self._spent:
+            self._spent.pop()
+
+
+class OutboundChat:
+    """A chat message waiting to be sent."""
+
+    __slots__ = ('text', 'priority', 'reply_to', 'user', 'collapse_key')
+
+    def __init__(self, text: str, priority: int, reply_to: Optional[str] = None, user: Optional[str] = None,
+                 collapse_key: Optional[str] = None):
+        self.text = text
+        self.priority = priority
+        self.reply_to = reply_to  # Chat message ID to reply to
+        self.user = user  # Who the reply is for, used when batching
+        self.collapse_key = collapse_key
+
+
+class ChatScheduler:
+    """
+    Single outbound path from ChaosBot to Twitch chat.
+
+    Messages wait in priority lanes (announcements, replies, then cooldown
+    notices) and a writer task sends them as fast as Twitch's per-channel
+    limit allows: 20 messages per 30 s, or 100 when the bot is a moderator.
+    Notices with the same collapse key (one per user and cooldown) replace
+    each other while queued and are sent at most once per `dedupe_window`. With `batch_replies`, replies that piled up are sent
+    as one "@user text | @user text" message instead of one each. When the
+    lanes are full, the oldest lowest-priority message is dropped.
+    """
+
+    def __init__(self, send: Callable[[str, Optional[str]], Awaitable[None]],
+                 is_moderator: Optional[Callable[[], bool]] = None, limit: int = CHAT_LIMIT,
+                 moderator_limit: int = CHAT_LIMIT_MODERATOR, period: float = CHAT_PERIOD,
+                 batch_replies: bool = True, dedupe_window: float = 30.0, max_queue: int = 200):
+        self.send = send
+        self.is_moderator = is_moderator
+        self.max_queue = max_queue
+        self._bucket = TokenBucket(limit, period)
+        self.configure(limit, moderator_limit, batch_replies, dedupe_window)
+        self._lanes = (deque(), deque(), deque())
+        self._collapsed: Dict[str, OutboundChat] = {}  # collapse_key -> queued message
+        self._recent: Dict[str, float] = {}  # collapse_key -> when it was last queued
+        self._ready = asyncio.Event()
+        self._writer_task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+        self.batched = 0
+
+    def configure(self, limit: int, moderator_limit: int, batch_replies: bool, dedupe_window: float):
+        """Apply new settings while running. Tokens already spent still count against the new limit."""
+        self.limit = limit
+        self.moderator_limit = moderator_limit
+        self.batch_replies = batch_replies
+        self.dedupe_window = dedupe_window
+
+    def pending(self) -> int:
+        return sum(len(lane) for lane in self._lanes)
+
+    def submit(self, text: str, priority: int = PRIORITY_REPLY, reply_to: Optional[str] = None,
+               user: Optional[str] = None, collapse_key: Optional[str] = None) -> bool:
+        """
+        Queue a chat message.
+
+        Returns:
+            bool: False if it was collapsed away or dropped.
+        """
+        if not text:
+            return False
+        now = time.monotonic()
+        self._forget_recent(now)
+
+        if collapse_key is not None:
+            queued = self._collapsed.get(collapse_key)
+            if queued is not None:
+                queued.text = text[:MAX_MESSAGE_LENGTH]
+                return False
+            if self._seen_recently(collapse_key, now):
+                return False
+            self._recent[collapse_key] = now
+
+        if self.pending() >= self.max_queue and not self._drop_one(priority):
+            self.dropped += 1
+            return False
+
+        item = OutboundChat(text[:MAX_MESSAGE_LENGTH], priority, reply_to, user, collapse_key)
+        if collapse_key is not None:
+            self._collapsed[collapse_key] = item
+        self._lanes[priority].append(item)
+        self._ready.set()
+        return True
+
+    def _seen_recently(self, key, now: float) -> bool:
+        queued_at = self._recent.get(key)
+        return queued_at is not None and now - queued_at < self.dedupe_window
+
+    def _forget_recent(self, now: float):
+        if len(self._recent) < 256:
+            return
+        self._recent = {key: at for key, at in self._recent.items() if now - at < self.dedupe_window}
+
+    def _drop_one(self, priority: int) -> bool:
+        """Make room by dropping the oldest message of the lowest priority below or at this one."""
+        for lane_priority in range(len(self._lanes) - 1, priority - 1, -1):
+            lane = self._lanes[lane_priority]
+            if lane:
+                self._release(lane.popleft())
+                self.dropped += 1
+                return True
+        return False
+
+    def _release(self, item: OutboundChat):
+        if item.collapse_key is not None and self._collapsed.get(item.collapse_key) is item:
+            del self._collapsed[item.collapse_key]
+
+    def start(self):
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._writer())
+
+    async def close(self):
+        if self._writer_task:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+        if self.pending():
+            logger.debug(f"Discarding {self.pending()} unsent chat messages")
+        for lane in self._lanes:
+            lane.clear()
+        self._collapsed.clear()
+
+    async def _writer(self):
+        while True:
+            if not self.pending():
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            # Moderator status can change while running, the tokens already spent still count
+            self._bucket.size = self.moderator_limit if self.is_moderator and self.is_moderator() else self.limit
+            await self._bucket.acquire()
+            # Pick what to send only now, so anything that arrived or collapsed while waiting is included
+            text, reply_to = self._next_message()
+            if text is None:
+                # Everything queued collapsed or was dropped while waiting
+                self._bucket.refund()
+                continue
+            try:
+                await self.send(text, reply_to)
+                self.sent += 1
+            except Exception as e:
+                logger.error(f"Failed to send chat message: {e}")
+
+    def _next_message(self):
+        for lane in self._lanes:
+            if not lane:
+                continue
+            item = lane.popleft()
+            self._release(item)
+            if not (self.batch_replies and item.user and lane and lane[0].user):
+                return item.text, item.reply_to
+
+            parts = [f"@{item.user} {item.text}"]
+            length = len(parts[0])
+            while lane and lane[0].user and length + 3 + len(lane[0].user) + 2 + len(lane[0].text) <= MAX_MESSAGE_LENGTH:
+                other = lane.popleft()
+                self._release(other)
+                parts.append(f"@{other.user} {other.text}")
+                length += 3 + len(parts[-1])
+            if len(parts) == 1:
+                return item.text, item.reply_to
+            self.batched += len(parts)
+            return " | ".join(parts), None
+        return None, None
+
+    def get_metrics(self) -> dict:
+        return {
+            'pending': self.pending(),
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'batched': self.batched,
+        }
@@ -0,0 +1,171 @@
+import logging
+import os
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ChaosCommand:
+    """One chaos command from twitchChannelPoints.cfg. Read only."""
+
+    __slots__ = ('title', 'id', 'description', 'point_cost', 'enabled_for_points', 'points_cooldown')
+
+    def __init__(self, title: str, command_id: str, description: str, point_cost: int,
+                 enabled_for_points: bool, points_cooldown: int):
+        object.__setattr__(self, 'title', title)
+        object.__setattr__(self, 'id', command_id)
+        object.__setattr__(self, 'description', description)
+        object.__setattr__(self, 'point_cost', point_cost)
+        object.__setattr__(self, 'enabled_for_points', enabled_for_points)
+        object.__setattr__(self, 'points_cooldown', points_cooldown)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read only")
+
+    def __repr__(self):
+        return f"ChaosCommand({self.id!r}, {self.title!r}, cost={self.point_cost})"
+
+    @classmethod
+    def parse(cls, line: str) -> Optional['ChaosCommand']:
+        """Parse a `title|id|description|cost|enabled|cooldown` line. Returns None if it is malformed."""
+        parts = line.split('|')
+        if len(parts) != 6:
+            return None
+        try:
+            return cls(parts[0], parts[1], parts[2], int(parts[3]), parts[4].lower() == 'true', int(parts[5]))
+        except ValueError:
+            return None
+
+    def as_dict(self) -> dict:
+        """The command in the dict form ChannelPointsMixin.create_custom_reward takes."""
+        return {
+            'title': self.title,
+            'id': self.id,
+            'description': self.description,
+            'pointCost': self.point_cost,
+            'isEnabledForPoints': self.enabled_for_points,
+            'pointsCooldown': self.points_cooldown
+        }
+
+
+class CommandCatalog:
+    """
+    The chaos commands in twitchChannelPoints.cfg, indexed by ID and title.
+
+    The file is parsed once and only read again when its mtime or size
+    changes. Lookups check that at most once per check_interval seconds,
+    or on the first access after invalidate(), which the config watcher
+    calls when the file changes. Lines that didn't change keep their parsed
+    record, and a malformed line is warned about once rather than on every
+    read. Reward sync, chat and the direct panel share one catalog.
+    """
+
+    def __init__(self, path: str, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._checked_at: Optional[float] = None  # When the file was last stat'ed, None to check on next access
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._commands: Tuple[ChaosCommand, ...] = ()
+        self._by_id: Dict[str, ChaosCommand] = {}
+        self._by_title: Dict[str, ChaosCommand] = {}
+        self._parsed: Dict[str, Optional[ChaosCommand]] = {}  # raw line -> record, None if malformed
+        self.reloads = 0
+
+    def set_path(self, path: str):
+        """Point the catalog at another file, read on next access."""
+        if path != self.path:
+            self.path = path
+            self._stamp = None
+            self._checked_at = None
+
+    def invalidate(self):
+        """The file changed, check it on next access."""
+        self._checked_at = None
+
+    def _check(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """
+        Re-read the file if it changed since the last read.
+
+        Returns:
+            bool: True if the commands were reloaded.
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            if self._stamp != (0, 0):
+                logger.error(f"Commands file not found: {self.path}")
+                self._load([])
+                self._stamp = (0, 0)
+                return True
+            return False
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return False
+        try:
+            with open(self.path, 'r') as file:
+                lines = file.read().splitlines()
+        except OSError as e:
+            logger.error(f"Failed to read commands file {self.path}: {e}")
+            return False
+        self._load(lines)
+        self._stamp = stamp
+        return True
+
+    def _load(self, lines):
+        previous = self._parsed
+        parsed = {}
+        commands = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if line in parsed:
+                command = parsed[line]
+            elif line in previous:
+                command = parsed[line] = previous[line]
+            else:
+                command = parsed[line] = ChaosCommand.parse(line)
+                if command is None:
+                    logger.warning(f"Invalid command format: {line}")
+            if command is not None:
+                commands.append(command)
+
+        self._parsed = parsed
+        self._commands = tuple(commands)
+        self._by_id = {command.id: command for command in commands}
+        self._by_title = {command.title.lower(): command for command in commands}
+        self.reloads += 1
+        logger.debug(f"Loaded {len(commands)} chaos commands from {self.path}")
+
+    @property
+    def commands(self) -> Tuple[ChaosCommand, ...]:
+        self._check()
+        return self._commands
+
+    def __iter__(self) -> Iterator[ChaosCommand]:
+        return iter(self.commands)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def __contains__(self, command_id):
+        return self.get(command_id) is not None
+
+    def get(self, command_id: str) -> Optional[ChaosCommand]:
+        """Look up a command by ID."""
+        self._check()
+        return self._by_id.get(command_id)
+
+    def find(self, name: str) -> Optional[ChaosCommand]:
+        """Look up a command by ID, or else by title (case insensitive)."""
+        self._check()
+        return self._by_id.get(name) or self._by_title.get(name.strip().lower())
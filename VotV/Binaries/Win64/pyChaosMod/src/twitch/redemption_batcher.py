@@ -0,0 +1,175 @@
+import asyncio
+import json
+import logging
+import os
+import traceback
+from typing import Dict, List, Optional, Tuple
+
+from twitchAPI.type import CustomRewardRedemptionStatus, TwitchResourceNotFound
+
+from src.twitch.reward_provisioner import is_retryable_error
+
+logger = logging.getLogger(__name__)
+
+# Helix accepts at most this many redemption IDs per update_redemption_status call
+MAX_IDS_PER_CALL = 50
+
+
+class RedemptionBatcher:
+    """
+    Collects redemption status updates (fulfill/refund) and flushes them in bulk.
+
+    Updates are grouped per reward and status. A group is flushed once it
+    reaches 50 IDs, and everything else `window` seconds after the first
+    update arrives, so a hype train costs one Helix call per reward and
+    status instead of one per redemption. Rate limits, server and network
+    errors are retried with exponential backoff. Other failures are logged
+    and dropped, since retrying them can't succeed. Pending updates are
+    saved to `state_file` on every flush and loaded again on start, so
+    redemptions aren't left unfulfilled across a restart.
+    """
+
+    def __init__(self, twitch, broadcaster_id: str, window: float = 0.5, state_file: Optional[str] = None,
+                 retry_delay: float = 1.0, max_retry_delay: float = 60.0):
+        self.twitch = twitch
+        self.broadcaster_id = broadcaster_id
+        self.window = window
+        self.state_file = state_file
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._pending: Dict[Tuple[str, str], List[str]] = {}  # (reward_id, status name) -> redemption IDs
+        self._full = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.api_calls = 0
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._pending.values())
+
+    def submit(self, reward_id: str, redemption_id: str, status: CustomRewardRedemptionStatus):
+        """Queue a status update for a redemption."""
+        ids = self._pending.setdefault((reward_id, status.name), [])
+        if redemption_id in ids:
+            return
+        ids.append(redemption_id)
+        self.submitted += 1
+        if len(ids) >= MAX_IDS_PER_CALL:
+            self._full.set()
+        self._ensure_flusher()
+
+    def _ensure_flusher(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        delay = self.retry_delay
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.window)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+
+            if await self.flush():
+                delay = self.retry_delay
+            else:
+                logger.warning(f"Retrying {len(self)} redemption status updates in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+
+    async def flush(self) -> bool:
+        """
+        Send all pending status updates.
+
+        Returns:
+            bool: False if a retryable error left updates pending.
+        """
+        await self._save()
+        success = True
+        for key in list(self._pending):
+            reward_id, status_name = key
+            ids = self._pending[key]
+            while ids:
+                chunk = ids[:MAX_IDS_PER_CALL]
+                try:
+                    await self._send(reward_id, chunk, CustomRewardRedemptionStatus[status_name])
+                except TwitchResourceNotFound:
+                    # Already fulfilled or refunded, or the reward is gone
+                    logger.debug(f"No unfulfilled redemptions left to update for reward {reward_id}")
+                except Exception as e:
+                    if is_retryable_error(e):
+                        logger.error(f"Failed to update {len(chunk)} redemptions for reward {reward_id}: {e}")
+                        success = False
+                        break
+                    logger.error(f"Dropping {len(chunk)} redemption status updates for reward {reward_id}: {e}")
+                    logger.debug(traceback.format_exc())
+                # Only this method removes IDs, and new ones are appended, so the chunk is still at the front
+                del ids[:len(chunk)]
+            if not ids:
+                del self._pending[key]
+            if not success:
+                break
+        await self._save()
+        return success
+
+    async def _send(self, reward_id: str, redemption_ids: List[str], status: CustomRewardRedemptionStatus):
+        self.api_calls += 1
+        await self.twitch.update_redemption_status(
+            broadcaster_id=self.broadcaster_id,
+            reward_id=reward_id,
+            redemption_ids=redemption_ids,
+            status=status
+        )
+        logger.debug(f"Set {len(redemption_ids)} redemptions of reward {reward_id} to {status.name}")
+
+    async def _save(self):
+        if not self.state_file:
+            return
+        state = [
+            {'reward_id': reward_id, 'status': status_name, 'redemption_ids': list(ids)}
+            for (reward_id, status_name), ids in self._pending.items()
+            if ids
+        ]
+        try:
+            await asyncio.to_thread(self._write_state, state)
+        except OSError as e:
+            logger.error(f"Failed to save pending redemption statuses: {e}")
+
+    def _write_state(self, state):
+        if not state:
+            if os.path.exists(self.state_file):
+                os.remove(self.state_file)
+            return
+        temp_file = f"{self.state_file}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_file, self.state_file)
+
+    async def start(self):
+        """Load the status updates left pending by the last session and start flushing them."""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            for entry in state:
+                status = CustomRewardRedemptionStatus[entry['status']]
+                for redemption_id in entry['redemption_ids']:
+                    self.submit(entry['reward_id'], redemption_id, status)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Failed to load pending redemption statuses: {e}")
+            return
+        if self._pending:
+            logger.info(f"Resuming {len(self)} redemption status updates from the last session")
+
+    async def close(self):
+        """Make a last attempt to flush, keeping anything that fails for the next session."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._pending:
+            await self.flush()
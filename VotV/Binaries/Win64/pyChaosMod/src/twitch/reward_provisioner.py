@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import traceback
+from typing import Dict, Iterable, List, Optional
+
+import aiohttp
+from twitchAPI.type import TwitchAPIException, TwitchBackendException, TwitchResourceNotFound
+
+logger = logging.getLogger(__name__)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Check whether a failed Helix call is worth retrying (rate limits, server and network errors)."""
+    if isinstance(error, (TwitchBackendException, aiohttp.ClientError, asyncio.TimeoutError)):
+        return True
+    if not isinstance(error, TwitchAPIException):
+        return False
+    message = str(error).lower()
+    return '429' in message or 'rate limit' in message or 'too many requests' in message
+
+
+class RewardSpec:
+    """The desired state of one custom channel point reward."""
+
+    __slots__ = ('key', 'title', 'prompt', 'cost', 'cooldown', 'user_input_required')
+
+    def __init__(self, key: str, title: str, prompt: str, cost: int, cooldown: int = 0,
+                 user_input_required: bool = False):
+        self.key = key
+        self.title = title
+        self.prompt = prompt
+        self.cost = cost
+        self.cooldown = cooldown
+        self.user_input_required = user_input_required
+
+    @classmethod
+    def from_command(cls, command: dict, user_input_required: bool = False) -> 'RewardSpec':
+        """Build a spec from a command dict as used by ChannelPointsMixin."""
+        return cls(command['id'], command['title'], command['description'], int(command['pointCost']),
+                   int(command.get('pointsCooldown', 0)), user_input_required)
+
+    def matches(self, reward: dict) -> bool:
+        """Check whether an existing reward (CustomReward.to_dict()) already has this state."""
+        cooldown = reward.get('global_cooldown_setting') or {}
+        current_cooldown = cooldown.get('global_cooldown_seconds', 0) if cooldown.get('is_enabled') else 0
+        return (reward.get('title') == self.title
+                and reward.get('prompt', '') == self.prompt
+                and reward.get('cost') == self.cost
+                and current_cooldown == self.cooldown
+                and reward.get('is_user_input_required', False) == self.user_input_required
+                and not reward.get('is_paused', False))
+
+    def api_kwargs(self, update: bool = False) -> dict:
+        kwargs = {
+            'title': self.title,
+            'cost': self.cost,
+            'prompt': self.prompt,
+            'is_global_cooldown_enabled': self.cooldown > 0,
+            'global_cooldown_seconds': self.cooldown if self.cooldown > 0 else None,
+            'is_user_input_required': self.user_input_required,
+            'should_redemptions_skip_request_queue': False,
+        }
+        if update:
+            kwargs['is_paused'] = False
+            if self.cooldown <= 0:
+                # twitchAPI leaves out is_global_cooldown_enabled=False unless seconds are given,
+                # which would keep an existing cooldown switched on
+                kwargs['global_cooldown_seconds'] = 1
+        return kwargs
+
+
+class RewardProvisioner:
+    """
+    Creates and updates custom channel point rewards concurrently.
+
+    Desired rewards are diffed against the rewards the bot can already manage
+    on the channel, matched by the reward ID we stored last time and then by
+    title. Matching rewards that are unchanged are reused as is, changed ones
+    are updated in place, and only missing ones are created. At most
+    `concurrency` Helix calls are in flight at once. twitchAPI itself waits
+    out Ratelimit-Reset when the rate limit is hit; calls that still fail
+    with a rate limit or server error are retried with exponential backoff.
+    """
+
+    def __init__(self, twitch, broadcaster_id: str, concurrency: int = 8, max_retries: int = 3,
+                 retry_delay: float = 1.0):
+        self.twitch = twitch
+        self.broadcaster_id = broadcaster_id
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.created = 0
+        self.updated = 0
+        self.reused = 0
+
+    async def fetch_existing(self) -> List[dict]:
+        """Get the rewards on the channel that this app can manage."""
+        rewards = await self._call(self.twitch.get_custom_reward, self.broadcaster_id,
+                                   only_manageable_rewards=True)
+        return [reward.to_dict() for reward in rewards]
+
+    async def provision(self, specs: Iterable[RewardSpec], known: Optional[Dict[str, dict]] = None,
+                        existing: Optional[List[dict]] = None) -> Dict[str, dict]:
+        """
+        Bring the channel's rewards in line with specs.
+
+        Args:
+            specs: Desired rewards.
+            known: Rewards from the last run, keyed by spec key (needs at least 'id').
+            existing: Rewards already on the channel. Fetched if not given.
+
+        Returns:
+            Dict[str, dict]: The reward of every spec that was provisioned, keyed by spec key.
+        """
+        known = known or {}
+        if existing is None:
+            try:
+                existing = await self.fetch_existing()
+            except Exception as e:
+                logger.error(f"Failed to fetch existing rewards, creating all of them: {e}")
+                existing = []
+        by_id = {reward.get('id'): reward for reward in existing}
+        by_title = {reward.get('title'): reward for reward in existing}
+
+        specs = list(specs)
+        spec_keys = {spec.key for spec in specs}
+        # Rewards we know under other keys belong to those keys, never claim them by title
+        claimed = {reward.get('id') for key, reward in known.items() if key not in spec_keys}
+        jobs = []
+        for spec in specs:
+            stored_id = (known.get(spec.key) or {}).get('id')
+            reward = by_id.get(stored_id) or by_title.get(spec.title)
+            # Two specs must never claim the same reward
+            if reward is not None and reward.get('id') in claimed:
+                reward = None
+            if reward is not None:
+                claimed.add(reward.get('id'))
+            jobs.append(self._provision_one(spec, reward))
+
+        results = await asyncio.gather(*jobs)
+        provisioned = {spec_key: reward for spec_key, reward in results if reward is not None}
+        logger.debug(f"Rewards provisioned: {self.created} created, {self.updated} updated, {self.reused} reused")
+        return provisioned
+
+    async def _provision_one(self, spec: RewardSpec, reward: Optional[dict]):
+        try:
+            if reward is not None and spec.matches(reward):
+                self.reused += 1
+                logger.debug(f"Reusing existing reward '{spec.title}'")
+                return spec.key, reward
+
+            if reward is not None:
+                result = await self._call(self.twitch.update_custom_reward, self.broadcaster_id, reward['id'],
+                                          **spec.api_kwargs(update=True))
+                self.updated += 1
+                logger.info(f"Updated custom reward: '{spec.title}'")
+                return spec.key, result.to_dict()
+
+            result = await self._call(self.twitch.create_custom_reward, self.broadcaster_id, **spec.api_kwargs())
+            self.created += 1
+            logger.info(f"Successfully created custom reward: '{spec.title}'")
+            return spec.key, result.to_dict()
+        except Exception as e:
+            logger.error(f"Failed to provision reward '{spec.title}': {e}")
+            logger.debug(traceback.format_exc())
+            return spec.key, None
+
+    async def pause(self, rewards: Dict[str, dict]) -> Dict[str, dict]:
+        """Pause rewards concurrently. Returns the updated rewards that were paused, by key."""
+        async def pause_one(key, reward):
+            try:
+                result = await self._call(
+                    self.twitch.update_custom_reward, self.broadcaster_id, reward['id'],
+                    is_paused=True,
+                    # Unset fields fall back to twitchAPI defaults, so resend the ones the reward has
+                    is_enabled=reward.get('is_enabled', True),
+                    is_user_input_required=reward.get('is_user_input_required', False),
+                    should_redemptions_skip_request_queue=reward.get('should_redemptions_skip_request_queue', False)
+                )
+                logger.info(f"Paused custom reward: '{reward.get('title')}'")
+                return key, result.to_dict()
+            except Exception as e:
+                logger.error(f"Failed to pause reward '{reward.get('title')}': {e}")
+                return key, None
+
+        results = await asyncio.gather(*(pause_one(key, reward) for key, reward in rewards.items()))
+        return {key: reward for key, reward in results if reward is not None}
+
+    async def delete(self, rewards: Dict[str, dict]) -> List[str]:
+        """Delete rewards concurrently. Returns the keys of the rewards that are gone."""
+        async def delete_one(key, reward):
+            try:
+                await self._call(self.twitch.delete_custom_reward, self.broadcaster_id, reward['id'])
+                logger.info(f"Removed custom reward: {reward.get('title')}")
+            except TwitchResourceNotFound:
+                logger.debug(f"Reward '{reward.get('title')}' was already deleted")
+            except Exception as e:
+                logger.error(f"Failed to remove custom reward {reward.get('title')}: {e}")
+                return None
+            return key
+
+        results = await asyncio.gather(*(delete_one(key, reward) for key, reward in rewards.items()))
+        return [key for key in results if key is not None]
+
+    async def _call(self, method, *args, **kwargs):
+        """Make a Helix call within the concurrency limit, retrying rate limits and server errors."""
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                try:
+                    return await method(*args, **kwargs)
+                except (TwitchAPIException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt >= self.max_retries or not is_retryable_error(e):
+                        raise
+                    logger.warning(f"Twitch API call failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay *= 2
@@ -1,6 +1,5 @@
 import asyncio
 import logging
-import re
 from typing import Optional, Dict, Any
 
 from twitchAPI.twitch import Twitch
@@ -12,6 +11,39 @@ from twitchAPI.object.eventsub import ChannelPointsCustomRewardRedemptionAddEven
 from twitchAPI.helper import first
 
 from src.twitch.channel_points_mixin import ChannelPointsMixin
+from src.twitch.chat_scheduler import ChatScheduler, PRIORITY_ANNOUNCEMENT, PRIORITY_NOTICE, PRIORITY_REPLY
+from src.utils.config_schema import get_settings
+
+
+# Vote forms besides a bare number: "#2", "2!", "option 2"
+VOTE_FIRST_CHARS = frozenset('#oO0123456789 \t')
+VOTE_LAST_CHARS = frozenset('!0123456789 \t')
+MAX_VOTE_LENGTH = 16
+MAX_VOTE_DIGITS = 6
+
+
+def parse_vote(text: str) -> Optional[int]:
+    """Get the option number from a chat vote, or None if the message isn't one."""
+    if text.isdigit() and text.isascii():
+        return int(text)
+    # Only short messages that start and end like a vote get past this
+    if len(text) > MAX_VOTE_LENGTH or text[:1] not in VOTE_FIRST_CHARS:
+        return None
+    if text[-1] not in VOTE_LAST_CHARS and not text[-1].isspace():
+        return None
+    text = text.strip()
+    if text[:1] == '#':
+        text = text[1:]
+    elif text[:1] in 'oO':
+        # An 'o' only starts a vote as 'option', which keeps out 'o7' and 'omegalul 10/10'
+        if text[:6].lower() != 'option':
+            return None
+        text = text[6:].lstrip()
+    if text[-1:] == '!':
+        text = text.rstrip('!').rstrip()
+    if text.isdigit() and text.isascii() and len(text) <= MAX_VOTE_DIGITS:
+        return int(text)
+    return None
 
 
 class TwitchConnection(ChannelPointsMixin):
@@ -28,10 +60,8 @@ class TwitchConnection(ChannelPointsMixin):
 
         self.websocket_handler = None
         self.config = config
-        self.message_queue = asyncio.Queue()
-        self.is_connected = False
-        self.should_run = True
-        self.vote_pattern = re.compile(r"^\d+\s*$")
+        self.settings = get_settings(config)
+        self.command_catalog = None
 
         self.logger = logging.getLogger(__name__)
         self.logger.info("Initializing Twitch Connection...")
@@ -42,22 +72,41 @@ class TwitchConnection(ChannelPointsMixin):
                 self.config['twitch']['channel'] == 'notset'):
             raise ValueError("Twitch App ID, App Secret, or channel not set in config file")
 
+        self.reset_run_state()
+
+    def reset_run_state(self):
+        """Forget everything set up by a previous run, so start() can run again after close()."""
+        self.is_connected = False
+        self.should_run = True
+
         # These will be set during initialization
         self.twitch = None
         self.eventsub = None
         self.chat = None
+        self.chat_scheduler = None
         self.channel_id = None
         self.user_id = None
+        self.redemption_batcher = None
+        self.auth_scopes = []
+        self.leftover_cleanup_task = None
+        self.channel_points_active = False
 
-        # Initialize rewards dict for ChannelPointsMixin
+        # Initialize rewards dict and reward ID index for ChannelPointsMixin
         self.rewards = {}
+        self.reward_index = {}
+        self.unclaimed_rewards = {}
 
     def set_websocket_handler(self, websocket_handler):
         self.websocket_handler = websocket_handler
 
+    def set_command_catalog(self, command_catalog):
+        self.command_catalog = command_catalog
+
     async def start(self):
         """Start the Twitch connection."""
         self.logger.info("Starting Twitch Connection...")
+        # The task manager restarts this after a crash or a failed liveness probe, on the same instance
+        self.reset_run_state()
         try:
             # Initialize Twitch API
             await self.initialize_twitch_api()
@@ -80,23 +129,8 @@ class TwitchConnection(ChannelPointsMixin):
             # Create Twitch instance
             self.twitch = await Twitch(self.config['twitch']['app_id'], self.config['twitch']['app_secret'])
 
-            # Set up authentication scopes based on needed features
-            required_scopes = [
-                AuthScope.CHAT_READ,
-                AuthScope.CHAT_EDIT
-            ]
-
-            # Add channel points scopes if enabled
-            if self.is_channel_points_enabled():
-                required_scopes.extend([
-                    AuthScope.CHANNEL_READ_REDEMPTIONS,
-                    AuthScope.CHANNEL_MANAGE_REDEMPTIONS
-                ])
-
-            # Authenticate the user
-            auth = UserAuthenticator(self.twitch, required_scopes)
-            token, refresh_token = await auth.authenticate()
-            await self.twitch.set_user_authentication(token, required_scopes, refresh_token)
+            # Authenticate the user with the scopes needed for the enabled features
+            await self.authenticate(self.get_required_scopes())
 
             # Get channel ID for the configured channel - FIX: Use first() helper for async generator
             channel_user = await first(self.twitch.get_users(logins=[self.config['twitch']['channel']]))
@@ -133,11 +167,34 @@ class TwitchConnection(ChannelPointsMixin):
             self.logger.exception(f"Failed to initialize Twitch API: {e}")
             raise
 
+    def get_required_scopes(self):
+        """Get the auth scopes needed for the currently enabled features."""
+        required_scopes = [
+            AuthScope.CHAT_READ,
+            AuthScope.CHAT_EDIT
+        ]
+
+        # Add channel points scopes if enabled
+        if self.is_channel_points_enabled():
+            required_scopes.extend([
+                AuthScope.CHANNEL_READ_REDEMPTIONS,
+                AuthScope.CHANNEL_MANAGE_REDEMPTIONS
+            ])
+        return required_scopes
+
+    async def authenticate(self, scopes):
+        """Authenticate the user on the existing Twitch instance. Chat and EventSub pick up the new token."""
+        auth = UserAuthenticator(self.twitch, scopes)
+        token, refresh_token = await auth.authenticate()
+        await self.twitch.set_user_authentication(token, scopes, refresh_token)
+        self.auth_scopes = list(scopes)
+
     async def initialize_chat(self):
         """Initialize the chat connection."""
         try:
             # Create chat instance
             self.chat = await Chat(self.twitch)
+            self.chat_scheduler = self.create_chat_scheduler()
 
             # Register event handlers
             self.chat.register_event(ChatEvent.READY, self.on_ready)
@@ -180,19 +237,20 @@ class TwitchConnection(ChannelPointsMixin):
         self.logger.info(f'Chat bot is ready, joining channel: {self.config["twitch"]["channel"]}')
         await ready_event.chat.join_room(self.config['twitch']['channel'])
 
-        # Start tasks
-        loop = asyncio.get_event_loop()
-        loop.create_task(self.process_message_queue())
-        loop.create_task(self.update_systems())
+        # Start sending chat messages
+        self.chat_scheduler.start()
 
         self.logger.info("ChaosBot is now running...")
         self.logger.info("Use Ctrl+C to stop the bot gracefully.")
 
     async def on_message(self, msg: ChatMessage):
         """Handler for chat messages."""
-        # Process potential vote
-        if self.vote_pattern.search(msg.text):
-            self.voting_system.process_vote(msg.user.name, int(msg.text))
+        # Runs for every chat message, so bail out before parsing when no vote is open
+        if not self.voting_system.accepting_votes:
+            return
+        vote = parse_vote(msg.text)
+        if vote is not None:
+            self.voting_system.process_vote(msg.user.id, vote)
 
     async def shop_command(self, cmd: ChatCommand):
         """Handler for shop command."""
@@ -200,16 +258,17 @@ class TwitchConnection(ChannelPointsMixin):
         item = parts[1] if len(parts) > 1 else None
 
         if self.config.get('chatShop', {}).get('channel_points', False):
-            await cmd.reply("Please use channel points to interact with the shop.")
+            await self.reply(cmd, "Please use channel points to interact with the shop.")
             return
 
         if item is None:
-            await cmd.reply(
+            await self.reply(
+                cmd,
                 f"You can order items from the shop using !shop <item>. The shop is currently {'open' if self.shop_system.is_shop_open() else 'closed'}.")
             return
 
         if not self.shop_system.is_shop_open():
-            await cmd.reply(f"The shop is currently closed. Please wait for it to open.")
+            await self.reply(cmd, "The shop is currently closed. Please wait for it to open.", notice="shop_closed")
             return
 
         await self.shop_system.process_shop(item, cmd.user.name, cmd)
@@ -219,11 +278,11 @@ class TwitchConnection(ChannelPointsMixin):
         from src.dataclass.email_message import EmailCommandProcessor
 
         if self.config.get('emails', {}).get('channel_points', False):
-            await cmd.reply("Please use channel points to send emails.")
+            await self.reply(cmd, "Please use channel points to send emails.")
             return
 
         if not self.email_system.are_emails_enabled():
-            await cmd.reply("Emails are currently disabled.")
+            await self.reply(cmd, "Emails are currently disabled.")
             return
 
         # Get the content after the command
@@ -239,7 +298,8 @@ class TwitchConnection(ChannelPointsMixin):
         email_message = email_processor.parse_email_string(content)
 
         if not email_message:
-            await cmd.reply(
+            await self.reply(
+                cmd,
                 "To send emails, use either:\n1. Simple format: !email your message\n2. Detailed format: !email subject:<email subject> body:<email body> user:<username>")
             return
 
@@ -255,11 +315,11 @@ class TwitchConnection(ChannelPointsMixin):
         hint_text = parts[1] if len(parts) > 1 else ""
 
         if not hint_text:
-            await cmd.reply("Please provide a hint text.")
+            await self.reply(cmd, "Please provide a hint text.")
             return
 
         if self.config.get('hints', {}).get('channel_points', False):
-            await cmd.reply("Please use channel points to send hints.")
+            await self.reply(cmd, "Please use channel points to send hints.")
             return
 
         await self.hint_system.process_hint(hint_text, None, cmd)
@@ -272,33 +332,68 @@ class TwitchConnection(ChannelPointsMixin):
         # Call the mixin's implementation
         await ChannelPointsMixin.on_channel_points_redemption_add(self, event)
 
-    async def update_systems(self):
-        """Update the various systems in the bot."""
-        while self.should_run:
-            self.email_system.update()
-            await asyncio.sleep(1 / 15)  # Update at 15 FPS
-
-    async def process_message_queue(self):
-        """Process the message queue."""
-        while self.should_run:
-            try:
-                message = await asyncio.wait_for(self.message_queue.get(), timeout=1.0)
-                self.logger.debug(f"Processing message from queue: {message}")
-                await self.send_message(message)
-                self.message_queue.task_done()
-            except asyncio.TimeoutError:
-                pass  # This allows the loop to check should_run regularly
-            except asyncio.CancelledError:
-                # Handle cancellation properly
-                self.logger.info("Message queue processing cancelled")
-                break
-            except Exception as e:
-                self.logger.error(f"Error processing message queue: {e}")
-
-    async def queue_message(self, message):
-        """Queue a message to be sent."""
+    def create_chat_scheduler(self):
+        """Create the outbound chat scheduler, configured from twitch.cfg."""
+        return ChatScheduler(
+            self.send_chat,
+            is_moderator=lambda: bool(self.chat and self.chat.is_mod(self.settings.twitch.channel)),
+            **self.chat_scheduler_settings()
+        )
+
+    def chat_scheduler_settings(self) -> dict:
+        """The chat scheduler's rate limits and options from the validated twitch.cfg settings."""
+        twitch_settings = self.settings.twitch
+        return {
+            'limit': twitch_settings.chat_rate_limit,
+            'moderator_limit': twitch_settings.chat_rate_limit_mod,
+            'batch_replies': twitch_settings.chat_batch_replies,
+            'dedupe_window': twitch_settings.chat_dedupe_window,
+        }
+
+    async def queue_message(self, message, priority=PRIORITY_ANNOUNCEMENT):
+        """Queue a message to be sent to the channel."""
         self.logger.debug(f"Queueing message: {message}")
-        await self.message_queue.put(message)
+        if not isinstance(message, str):
+            self.logger.error(f"Invalid message type: {type(message)}. Expected str.")
+            return
+        if self.chat_scheduler is None:
+            self.logger.warning("Cannot queue message: Chat not initialized")
+            return
+        self.chat_scheduler.submit(message, priority)
+
+    async def reply(self, ctx: ChatMessage, text: str, notice: Optional[str] = None):
+        """
+        Queue a reply to a chat message.
+
+        Args:
+            ctx: The message or command to reply to.
+            text: The reply.
+            notice: Marks the reply as a notice of this kind (e.g. 'shop_cooldown'). Notices of one
+                kind to the same user collapse into one and are sent after regular replies.
+        """
+        if self.chat_scheduler is None:
+            self.logger.warning("Cannot reply: Chat not initialized")
+            return
+        user = ctx.user.name
+        self.chat_scheduler.submit(
+            text,
+            PRIORITY_NOTICE if notice else PRIORITY_REPLY,
+            reply_to=ctx.id,
+            user=user,
+            collapse_key=f"{notice}:{user}" if notice else None
+        )
+
+    async def send_chat(self, text: str, reply_to: Optional[str] = None):
+        """Send a message from the chat scheduler, as a reply if reply_to is a chat message ID."""
+        if reply_to is None:
+            await self.send_message(text)
+            return
+        if self.chat and self.chat.is_ready():
+            # Chat.send_raw_irc_message skips twitchAPI's own rate limit bucket, the scheduler enforces the limit
+            channel = self.config['twitch']['channel'].lower()
+            await self.chat.send_raw_irc_message(f'@reply-parent-msg-id={reply_to} PRIVMSG #{channel} :{text}')
+        else:
+            self.logger.warning("Cannot send message: Chat not ready")
 
     async def send_message(self, message):
         if message is None:
@@ -313,13 +408,12 @@ class TwitchConnection(ChannelPointsMixin):
         else:
             self.logger.warning("Cannot send message: Chat not ready")
 
-    def get_messages(self):
-        """Get all messages from the message queue."""
-        self.logger.debug("Getting all messages from the message queue")
-        messages = []
-        while not self.message_queue.empty():
-            messages.append(self.message_queue.get_nowait())
-        return messages
+    def is_healthy(self) -> bool:
+        """Liveness probe: chat is connected, once the connection is set up."""
+        if not self.is_connected or self.chat is None:
+            # Still starting, possibly waiting for the streamer to authorize the bot
+            return True
+        return self.chat.is_connected()
 
     def is_connected_to_twitch(self):
         """Check if the bot is connected to Twitch."""
@@ -328,57 +422,66 @@ class TwitchConnection(ChannelPointsMixin):
 
     def is_channel_points_enabled(self):
         """Check if channel points features are enabled."""
-        return (self.config.get('twitch', {}).get('channel_points', False) or
-                self.config.get('chatShop', {}).get('channel_points', False) or
-                self.config.get('emails', {}).get('channel_points', False) or
-                self.config.get('hints', {}).get('channel_points', False))
+        return self.settings.channel_points_enabled
 
     async def update_config(self, new_config):
-        """Update the config for the bot and handle any necessary cleanup or initialization."""
-        old_channel_points_enabled = self.is_channel_points_enabled()
+        """
+        Update the config for the bot and sync channel point rewards with it.
 
-        # Update the config
+        Chat and EventSub stay connected. Only the rewards whose settings
+        changed are created, updated, paused or deleted.
+        """
         self.config = new_config
+        self.settings = get_settings(new_config)
+        if self.chat_scheduler is not None:
+            self.chat_scheduler.configure(**self.chat_scheduler_settings())
+        if not self.is_connected:
+            return
 
-        new_channel_points_enabled = self.is_channel_points_enabled()
-
-        # Handle channel points changes
-        if old_channel_points_enabled != new_channel_points_enabled:
-            if new_channel_points_enabled and self.is_connected:
+        channel_points_enabled = self.is_channel_points_enabled()
+        try:
+            if channel_points_enabled and not self.channel_points_active:
                 # Enabling channel points
                 self.logger.info("Channel points being enabled - initializing rewards...")
-                try:
-                    # Reinitialize Twitch API with updated scopes
-                    await self.close()
-                    await self.initialize_twitch_api()
-                except Exception as e:
-                    self.logger.error(f"Error initializing channel points: {e}")
-            elif old_channel_points_enabled and not new_channel_points_enabled:
+                required_scopes = self.get_required_scopes()
+                if not set(required_scopes).issubset(self.auth_scopes):
+                    await self.authenticate(required_scopes)
+                if not self.eventsub:
+                    await self.initialize_eventsub()
+                await self.initialize_channel_points()
+            elif channel_points_enabled:
+                await self.reconcile_rewards()
+            elif self.channel_points_active:
                 # Disabling channel points
                 self.logger.info("Channel points being disabled - cleaning up rewards...")
-                try:
-                    await self.remove_all_rewards()
-                    # Reinitialize Twitch API with updated scopes
-                    await self.close()
-                    await self.initialize_twitch_api()
-                    self.logger.info("Channel points cleanup completed successfully")
-                except Exception as e:
-                    self.logger.error(f"Error cleaning up channel points: {e}")
+                await self.close_redemption_batcher()
+                await self.remove_all_rewards()
+                self.channel_points_active = False
+                self.logger.info("Channel points cleanup completed successfully")
+        except Exception as e:
+            self.logger.error(f"Error syncing channel points with the new config: {e}")
 
     async def close(self):
         """Clean up and close connections."""
         self.logger.info("Test Closing Twitch Connection...")
         self.should_run = False
 
-        try:
-            # Put a sentinel value to wake up any waiting get() operations
-            self.message_queue.put_nowait(None)
-        except asyncio.QueueFull:
-            pass
+        # Stop sending chat messages
+        if self.chat_scheduler:
+            await self.chat_scheduler.close()
+
+        # Stop waiting on the leftover reward prompt
+        if self.leftover_cleanup_task and not self.leftover_cleanup_task.done():
+            self.leftover_cleanup_task.cancel()
 
+        # Send pending redemption status updates while the rewards still exist
+        try:
+            await self.close_redemption_batcher()
+        except Exception as e:
+            self.logger.error(f"Error flushing redemption status updates: {e}")
 
         # Remove channel point rewards if enabled
-        if self.is_channel_points_enabled():
+        if self.channel_points_active or self.is_channel_points_enabled():
             try:
                 await self.remove_all_rewards()
                 self.logger.info("Channel points rewards removed successfully")
@@ -409,13 +512,5 @@ class TwitchConnection(ChannelPointsMixin):
             except Exception as e:
                 self.logger.error(f"Error closing Twitch API: {e}")
 
-        # Clean up message queue
-        while not self.message_queue.empty():
-            try:
-                self.message_queue.get_nowait()
-                self.message_queue.task_done()
-            except asyncio.QueueEmpty:
-                break
-
         self.is_connected = False
         self.logger.info("Twitch Connection closed.")
\ No newline at end of file
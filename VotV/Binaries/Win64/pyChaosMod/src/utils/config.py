@@ -1,14 +1,23 @@
 import os
+import io
+import time
+import hashlib
 import configparser
-from typing import Dict, Any, Callable, List
+from typing import Dict, Any, Callable, Iterable, List, Optional, Set, Tuple
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 import asyncio
 import logging
 from functools import partial
 
+from src.utils.config_schema import SECTION_SCHEMAS, ConfigSnapshot, validate_section
+
 logger = logging.getLogger(__name__)
 
+class ConfigFileError(ValueError):
+    """A cfg file that exists but can't be parsed."""
+
+
 class NoSpacesConfigParser(configparser.ConfigParser):
     def write(self, fp, space_around_delimiters=False):
         """Write an .ini-format representation of the configuration state."""
@@ -16,12 +25,58 @@ class NoSpacesConfigParser(configparser.ConfigParser):
         super().write(fp, space_around_delimiters=False)
 
 
+class ConfigChange:
+    """
+    What one config reload changed.
+
+    sections maps each changed section to {key: (old value, new value)}, with
+    None standing in for a key that was added or removed. files holds the
+    names of changed cfg/ files that aren't config sections, such as
+    twitchChannelPoints.cfg. config is the whole config after the change.
+    """
+
+    __slots__ = ('sections', 'files', 'config')
+
+    def __init__(self, sections: Dict[str, Dict[str, Tuple[Any, Any]]], files: Iterable[str] = (),
+                 config: Optional[Dict[str, Any]] = None):
+        self.sections = sections
+        self.files: Set[str] = set(files)
+        self.config = config
+
+    def __bool__(self):
+        return bool(self.sections or self.files)
+
+    def __repr__(self):
+        return f"ConfigChange(sections={self.sections!r}, files={sorted(self.files)!r})"
+
+    def changed(self, section: str, key: Optional[str] = None) -> bool:
+        """Check whether a section, or one key in it, changed."""
+        keys = self.sections.get(section)
+        if keys is None:
+            return False
+        return key is None or key in keys
+
+    def keys(self, section: str) -> Set[str]:
+        return set(self.sections.get(section, ()))
+
+    @staticmethod
+    def diff(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Tuple[Any, Any]]:
+        """The keys that differ between two versions of a section, as {key: (old, new)}."""
+        return {
+            key: (old.get(key), new.get(key))
+            for key in old.keys() | new.keys()
+            if key not in old or key not in new or old[key] != new[key]
+        }
+
+
 class AsyncConfigManager:
     def __init__(self):
         self.config: Dict[str, Any] = {}
         self.base_path = self._find_base_path()
         self.observer = None
         self._change_callbacks: List[Callable] = []
+        self._subscribers: List[Tuple[Callable, Optional[str], Optional[frozenset]]] = []
+        self._file_callbacks: Dict[str, List[Callable]] = {}  # Non-.cfg files in cfg/, by file name
         self._shutdown_event = asyncio.Event()
         self._loop = asyncio.get_event_loop()
         self._config_files = {
@@ -32,9 +87,37 @@ class AsyncConfigManager:
             'direct': 'direct.cfg',
             'hints': 'hints.cfg',
             'misc': 'misc.cfg',
+            'overlay': 'overlay.cfg',
+            'websocket': 'websocket.cfg',
         }
+        # Sections whose file the game doesn't generate, read as empty (all defaults) when it's missing
+        self._optional_sections = {'overlay', 'websocket'}
         self._config_parsers = {}  # Store parsers to maintain file structure
+        self._section_settings: Dict[str, Any] = {}  # Section -> typed settings from its last load
+        self.reload_debounce = 0.25  # Seconds a file must stay quiet before it is reloaded
+        self._pending_reloads: Dict[str, asyncio.TimerHandle] = {}  # File name -> scheduled reload
+        self._reload_tasks: Set[asyncio.Task] = set()
+        self._reload_lock = asyncio.Lock()  # Reloads one at a time, in the order they were scheduled
+        self._file_hashes: Dict[str, str] = {}  # File name -> hash of the content last loaded or written
+        self._own_writes: Dict[str, Set[str]] = {}  # File name -> hashes of content we wrote ourselves
+        self.save_delay = 0.5  # Seconds save_config waits to gather more changes before writing
+        self._dirty_sections: Set[str] = set()
+        self._unsaved_values: Dict[str, Dict[str, Any]] = {}  # Section -> values set in memory but not yet written
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self._save_task: Optional[asyncio.Task] = None
+        self._save_lock = asyncio.Lock()
         
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """The typed config, replaced as a whole on every reload."""
+        return self.config['settings']
+
+    def _swap_snapshot(self):
+        sections = {}
+        for section, (attribute, settings_class) in SECTION_SCHEMAS.items():
+            sections[attribute] = self._section_settings.get(section) or settings_class()
+        self.config['settings'] = ConfigSnapshot(**sections)
+
     # Dictionary-like access methods
     def __getitem__(self, key):
         """Allow dictionary-like access to config sections: config['section']"""
@@ -61,83 +144,45 @@ class AsyncConfigManager:
             raise FileNotFoundError("Could not find pyChaosMod directory structure")
 
     def register_change_callback(self, callback: Callable[[Dict[str, Any]], None]):
+        """Call callback with the whole config after every change. Prefer subscribe()."""
         self._change_callbacks.append(callback)
 
-    def load_config(self) -> Dict[str, Any]:
-        config: Dict[str, Any] = {}
-        
-        base_path_listen = os.path.join(self.base_path, 'listen')
-        base_path_cfg = os.path.join(self.base_path, 'cfg')
-        
-        for section, filename in self._config_files.items():
-            config_path = os.path.join(base_path_cfg, filename)
-            parser = NoSpacesConfigParser()
-            
-            if not os.path.exists(config_path):
-                alt_config_path = os.path.join('./cfg', filename)
-                if os.path.exists(alt_config_path):
-                    config_path = alt_config_path
-                else:
-                    raise FileNotFoundError(
-                        f"Config file not found: {config_path} or {alt_config_path}\n"
-                        "You may need to run the mod in-game once to generate the config files."
-                    )
-            
+    def subscribe(self, callback: Callable[[ConfigChange], None], section: Optional[str] = None,
+                  keys: Optional[Iterable[str]] = None):
+        """
+        Call callback with the ConfigChange whenever a reload changes what it watches.
+
+        Args:
+            callback: Gets the ConfigChange.
+            section: Only changes to this section. None means any change, including non-section files.
+            keys: Only changes to these keys of section.
+        """
+        self._subscribers.append((callback, section, frozenset(keys) if keys is not None else None))
+
+    def register_file_callback(self, filename: str, callback: Callable[[], None]):
+        """Call callback on the event loop whenever cfg/<filename> changes."""
+        self._file_callbacks.setdefault(filename, []).append(callback)
+
+    def _handle_file_change(self, filename: str):
+        for callback in self._file_callbacks.get(filename, []):
             try:
-                parser.read(config_path)
-            except configparser.ParsingError as e:
-                logger.error(f"Config parsing error in {config_path}: {e}")
-                logger.info(f"Attempting to backup corrupted config file: {filename}")
-                
-                # Create backup of corrupted file
-                backup_path = f"{config_path}.corrupted.backup"
-                try:
-                    os.rename(config_path, backup_path)
-                    logger.info(f"Corrupted config backed up to: {backup_path}")
-                except OSError:
-                    logger.warning(f"Could not backup corrupted config file: {config_path}")
-                
-                logger.warning(f"Config file {config_path} backed up to {backup_path}. "
-                               "Please run the mod in-game to regenerate it.")
-                
-                raise FileNotFoundError(
-                    f"Malformed config file: {config_path}\n"
-                    f"Please check the file format or delete it to regenerate. Error: {e}"
-                )
-                    
-            except configparser.Error as e:
-                logger.error(f"General config error in {config_path}: {e}")
-                raise FileNotFoundError(
-                    f"Config file error: {config_path}\n"
-                    f"Try deleting the file to regenerate it. Error: {e}"
-                )
+                callback()
             except Exception as e:
-                logger.error(f"Unexpected error reading config {config_path}: {e}")
-                raise FileNotFoundError(
-                    f"Unexpected error reading config: {config_path}\n"
-                    f"Error: {e}"
-                )
-            
-            self._config_parsers[section] = {
-                'parser': parser,
-                'path': config_path
-            }
-            
-            config[section] = {}
-            for section_name in parser.sections():
-                for key, value in parser.items(section_name):
-                    if value.replace('.', '').isdigit():
-                        if '.' in value:
-                            config[section][key] = float(value)
-                        else:
-                            config[section][key] = int(value)
-                    elif value.lower() in ['true', 'false']:
-                        config[section][key] = value.lower() == 'true'
-                    else:
-                        config[section][key] = value
+                logger.error(f"Error in file change callback for {filename}: {e}")
+
+    def load_config(self) -> Dict[str, Any]:
+        config: Dict[str, Any] = {}
+        for section in self._config_files:
+            config[section] = self._load_section(section)
 
+        base_path_cfg = os.path.join(self.base_path, 'cfg')
         config['files'] = {
-            'commands': os.path.join(base_path_cfg, 'twitchChannelPoints.cfg')
+            'commands': os.path.join(base_path_cfg, 'twitchChannelPoints.cfg'),
+            'game_outbox': os.path.join(self.base_path, 'game_outbox.db'),
+            'redemption_statuses': os.path.join(self.base_path, 'pending_redemptions.json'),
+            'chatShop_cooldowns': os.path.join(self.base_path, 'chatShop_cooldowns.json'),
+            'emails_cooldowns': os.path.join(self.base_path, 'emails_cooldowns.json'),
+            'hints_cooldowns': os.path.join(self.base_path, 'hints_cooldowns.json'),
         }
         
         if not os.path.exists(config['files']['commands']):
@@ -148,8 +193,110 @@ class AsyncConfigManager:
         # VERSION
         
         self.config = config
+        self._swap_snapshot()
         return config
 
+    def _load_section(self, section: str, content: Optional[str] = None) -> Dict[str, Any]:
+        """Parse the cfg file of one section, or content already read from it."""
+        filename = self._config_files[section]
+        config_path = os.path.join(self.base_path, 'cfg', filename)
+        parser = NoSpacesConfigParser()
+        
+        if content is not None:
+            config_path = self._file_path(filename)
+        elif not os.path.exists(config_path):
+            alt_config_path = os.path.join('./cfg', filename)
+            if os.path.exists(alt_config_path):
+                config_path = alt_config_path
+            elif section in self._optional_sections:
+                self._config_parsers.pop(section, None)
+                self._file_hashes.pop(filename, None)
+                return {}
+            else:
+                raise FileNotFoundError(
+                    f"Config file not found: {config_path} or {alt_config_path}\n"
+                    "You may need to run the mod in-game once to generate the config files."
+                )
+        
+        try:
+            if content is None:
+                with open(config_path, 'r') as f:
+                    content = f.read()
+            parser.read_string(content, source=config_path)
+            self._file_hashes[filename] = self._hash_content(content)
+        except configparser.ParsingError as e:
+            logger.error(f"Config parsing error in {config_path}: {e}")
+            logger.info(f"Attempting to backup corrupted config file: {filename}")
+            
+            # Create backup of corrupted file
+            backup_path = f"{config_path}.corrupted.backup"
+            try:
+                os.rename(config_path, backup_path)
+                logger.info(f"Corrupted config backed up to: {backup_path}")
+            except OSError:
+                logger.warning(f"Could not backup corrupted config file: {config_path}")
+            
+            logger.warning(f"Config file {config_path} backed up to {backup_path}. "
+                           "Please run the mod in-game to regenerate it.")
+            
+            raise ConfigFileError(
+                f"Malformed config file: {config_path}\n"
+                f"Please check the file format or delete it to regenerate. Error: {e}"
+            ) from e
+                
+        except configparser.Error as e:
+            logger.error(f"General config error in {config_path}: {e}")
+            raise ConfigFileError(
+                f"Config file error: {config_path}\n"
+                f"Try deleting the file to regenerate it. Error: {e}"
+            ) from e
+        except (OSError, UnicodeDecodeError) as e:
+            logger.error(f"Unexpected error reading config {config_path}: {e}")
+            raise ConfigFileError(
+                f"Unexpected error reading config: {config_path}\n"
+                f"Error: {e}"
+            ) from e
+        
+        self._config_parsers[section] = {
+            'parser': parser,
+            'path': config_path
+        }
+        
+        raw = {}
+        for section_name in parser.sections():
+            raw.update(parser.items(section_name))
+        settings, values, errors = validate_section(section, raw)
+        # A bad value only costs its own key, the rest of the section still loads
+        for error in errors:
+            logger.warning(f"Invalid value in {filename}: {error}")
+        self._section_settings[section] = settings
+        return values
+
+    @staticmethod
+    def _hash_content(content: str) -> str:
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+    def _file_path(self, filename: str) -> str:
+        """Where a cfg file is read from: where its section was loaded from, else base_path/cfg or ./cfg."""
+        parser_info = self._config_parsers.get(self._section_for_file(filename))
+        if parser_info is not None:
+            return parser_info['path']
+        path = os.path.join(self.base_path, 'cfg', filename)
+        alt_path = os.path.join('./cfg', filename)
+        if not os.path.exists(path) and os.path.exists(alt_path):
+            return alt_path
+        return path
+
+    def _read_file(self, filename: str) -> str:
+        with open(self._file_path(filename), 'r') as f:
+            return f.read()
+
+    def _section_for_file(self, filename: str) -> Optional[str]:
+        for section, section_file in self._config_files.items():
+            if section_file == filename:
+                return section
+        return None
+
     def update_config_value(self, section: str, key: str, value: Any) -> bool:
         """
         Update a configuration value in memory
@@ -167,35 +314,83 @@ class AsyncConfigManager:
             return False
             
         self.config[section][key] = value
+        # Kept until written, so a reload of the file in the meantime doesn't lose it
+        self._unsaved_values.setdefault(section, {})[key] = value
+        self._revalidate(section)
         return True
+
+    def _revalidate(self, section: str):
+        if section in SECTION_SCHEMAS:
+            settings, self.config[section], errors = validate_section(section, self.config[section])
+            for error in errors:
+                logger.warning(f"Invalid value set in memory: {error}")
+            self._section_settings[section] = settings
+            self._swap_snapshot()
         
     def save_config(self, section: str = None) -> bool:
         """
         Save the configuration to the file system
         
+        Writes are behind: the sections are marked dirty and written together
+        save_delay seconds later, off the event loop, so a run of
+        update_config_value + save_config calls costs one write per file.
+        Outside a running event loop the write happens right away.
+        
         Args:
             section: Optional section to save. If None, saves all sections
             
         Returns:
-            bool: True if successful, False otherwise
+            bool: True if the save was scheduled (or done), False otherwise
         """
+        sections = [section] if section is not None else list(self._config_parsers)
+        for section_name in sections:
+            if section_name not in self._config_parsers:
+                logger.error(f"No parser found for section {section_name}")
+                return False
+        self._dirty_sections.update(sections)
+
         try:
-            if section is not None:
-                return self._save_section(section)
-                
-            # Save all sections
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
             success = True
-            for section_name in self._config_parsers:
-                if not self._save_section(section_name):
+            while self._dirty_sections:
+                if not self._save_section(self._dirty_sections.pop()):
                     success = False
             return success
-        except Exception as e:
-            logger.error(f"Error saving configuration: {e}")
-            return False
+        if self._save_handle is None:
+            self._save_handle = loop.call_later(self.save_delay, self._start_flush)
+        return True
+
+    def _start_flush(self):
+        self._save_handle = None
+        self._save_task = asyncio.create_task(self.flush_config())
+
+    async def flush_config(self) -> bool:
+        """
+        Write every section with unsaved changes now.
+        
+        Returns:
+            bool: True if all writes succeeded
+        """
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        success = True
+        # One flush at a time, so an older write can never land after a newer one
+        async with self._save_lock:
+            while self._dirty_sections:
+                section = self._dirty_sections.pop()
+                path, content, unsaved = self._render_section(section)
+                if await asyncio.to_thread(self._write_file, path, content):
+                    self._forget_unsaved(section, unsaved)
+                else:
+                    self._forget_own_write(path, content)
+                    success = False
+        return success
             
     def _save_section(self, section: str) -> bool:
         """
-        Save a specific section to its config file
+        Save a specific section to its config file, blocking until it is written
         
         Args:
             section: The section to save
@@ -206,7 +401,22 @@ class AsyncConfigManager:
         if section not in self._config_parsers:
             logger.error(f"No parser found for section {section}")
             return False
-            
+        path, content, unsaved = self._render_section(section)
+        if not self._write_file(path, content):
+            self._forget_own_write(path, content)
+            return False
+        self._forget_unsaved(section, unsaved)
+        return True
+
+    def _render_section(self, section: str) -> Tuple[str, str, Dict[str, Any]]:
+        """
+        Put the section's current values into its parser.
+
+        Returns:
+            The path, the file content, and the unsaved values it includes,
+            to forget once the file is written.
+        """
+        unsaved = dict(self._unsaved_values.get(section, {}))
         parser_info = self._config_parsers[section]
         parser = parser_info['parser']
         path = parser_info['path']
@@ -219,65 +429,207 @@ class AsyncConfigManager:
                     new_value = self.config[section][key]
                     if isinstance(new_value, bool):
                         new_value = 'true' if new_value else 'false'
+                    elif isinstance(new_value, float) and new_value.is_integer():
+                        # Numbers typed as float by the schema keep the whole-number form the game wrote
+                        new_value = int(new_value)
                     parser.set(section_name, key, str(new_value))
         
-        # Write to file
+        buffer = io.StringIO()
+        parser.write(buffer)
+        content = buffer.getvalue()
+        # Remember the content so the watcher knows the change is ours
+        self._own_writes.setdefault(os.path.basename(path), set()).add(self._hash_content(content))
+        return path, content, unsaved
+
+    def _forget_unsaved(self, section: str, written: Dict[str, Any]):
+        """Stop re-applying values over reloads now that they are in the file, unless set again since."""
+        unsaved = self._unsaved_values.get(section)
+        if unsaved is None:
+            return
+        for key, value in written.items():
+            if key in unsaved and unsaved[key] == value:
+                del unsaved[key]
+        if not unsaved:
+            del self._unsaved_values[section]
+
+    def _forget_own_write(self, path: str, content: str):
+        self._own_writes.get(os.path.basename(path), set()).discard(self._hash_content(content))
+
+    @staticmethod
+    def _write_file(path: str, content: str, attempts: int = 3) -> bool:
+        """
+        Replace a config file atomically, so the game never reads a half-written one.
+        
+        The content goes to a temp file next to it, which is then renamed over
+        it. On Windows the rename fails while another process has the file
+        open, so it is retried briefly.
+        """
+        temp_path = f"{path}.tmp"
         try:
-            with open(path, 'w') as configfile:
-                parser.write(configfile)
-            logger.info(f"Config section {section} saved to {path}")
+            with open(temp_path, 'w') as configfile:
+                configfile.write(content)
+                configfile.flush()
+                os.fsync(configfile.fileno())
+            for attempt in range(attempts):
+                try:
+                    os.replace(temp_path, path)
+                    break
+                except PermissionError:
+                    if attempt == attempts - 1:
+                        raise
+                    time.sleep(0.1)
+            logger.info(f"Config saved to {path}")
             return True
-        except Exception as e:
+        except OSError as e:
             logger.error(f"Error writing config file {path}: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
             return False
 
     class ConfigFileHandler(FileSystemEventHandler):
+        """Hands every change in cfg/ to the config manager on its event loop."""
+
         def __init__(self, config_manager):
             self.config_manager = config_manager
-            self.last_modified_times: Dict[str, float] = {}
-            self._is_our_write = False
-            
+
+        def on_created(self, event):
+            self._notify(event)
+
+        def on_moved(self, event):
+            self._notify(event)
+
         def on_modified(self, event):
-            if not event.is_directory and event.src_path.endswith('.cfg'):
-                # Skip if this is our own write operation
-                if self._is_our_write:
-                    self._is_our_write = False
-                    return
-                    
-                current_time = os.path.getmtime(event.src_path)
-                last_time = self.last_modified_times.get(event.src_path, 0)
-                
-                if current_time > last_time:
-                    self.last_modified_times[event.src_path] = current_time
-                    self.config_manager._loop.call_soon_threadsafe(
-                        self.config_manager._handle_config_change
-                    )
-        
-        def mark_our_write(self):
-            """Mark that the next file change is from our own write operation"""
-            self._is_our_write = True
+            self._notify(event)
+
+        def _notify(self, event):
+            if event.is_directory:
+                return
+            path = getattr(event, 'dest_path', '') or event.src_path
+            filename = os.path.basename(path)
+            if filename.endswith('.cfg') or filename in self.config_manager._file_callbacks:
+                self.config_manager._loop.call_soon_threadsafe(self.config_manager._schedule_reload, filename)
+
+    def _schedule_reload(self, filename: str):
+        """
+        Reload a file once it has been quiet for reload_debounce seconds.
+
+        Editors and the game write files in several chunks, each firing its
+        own event, so every event pushes the reload back and a burst ends up
+        as a single reload.
+        """
+        handle = self._pending_reloads.pop(filename, None)
+        if handle is not None:
+            handle.cancel()
+        self._pending_reloads[filename] = self._loop.call_later(
+            self.reload_debounce, self._start_reload, filename
+        )
+
+    def _start_reload(self, filename: str):
+        self._pending_reloads.pop(filename, None)
+        task = asyncio.create_task(self._reload_file(filename))
+        self._reload_tasks.add(task)
+        task.add_done_callback(self._reload_tasks.discard)
+
+    async def _reload_file(self, filename: str):
+        if not filename.endswith('.cfg'):
+            self._handle_file_change(filename)
+            return
 
-    def _handle_config_change(self):
+        async with self._reload_lock:
+            try:
+                content = await asyncio.to_thread(self._read_file, filename)
+            except (OSError, UnicodeDecodeError) as e:
+                logger.debug(f"Could not read changed config file {filename}: {e}")
+                return
+            self._apply_file_content(filename, content)
+
+    def _apply_file_content(self, filename: str, content: str):
+        content_hash = self._hash_content(content)
+        # Writes that didn't change the content, or that we made ourselves, need no reload
+        if content_hash == self._file_hashes.get(filename):
+            return
+        own_writes = self._own_writes.get(filename)
+        if own_writes and content_hash in own_writes:
+            own_writes.discard(content_hash)
+            self._file_hashes[filename] = content_hash
+            return
+        self._file_hashes[filename] = content_hash
+        self._handle_config_change(filename, content)
+
+    def _handle_config_change(self, filename: Optional[str] = None, content: Optional[str] = None):
+        """Reload the cfg file that changed (all of them if filename is None) and notify about what changed."""
         try:
-            self.load_config()
-            for callback in self._change_callbacks:
-                try:
-                    callback(self.config)
-                except Exception as e:
-                    logger.error(f"Error in config change callback: {e}")
+            change = self.reload(filename, content)
         except Exception as e:
             logger.error(f"Error reloading configuration: {e}")
+            return
+        if not change:
+            logger.debug(f"Config file {filename} was written without changes")
+            return
+        logger.debug(f"Config changed: {change}")
+        self._notify(change)
+
+    def reload(self, filename: Optional[str] = None, content: Optional[str] = None) -> ConfigChange:
+        """
+        Re-parse one cfg file, or all of them, and work out what changed.
+
+        Sections are replaced in place in the config dict, so everything
+        holding the config sees the new values. content is the file's
+        content if the caller already read it.
+        """
+        if filename is None:
+            sections = list(self._config_files)
+        else:
+            section = self._section_for_file(filename)
+            if section is None:
+                # Not a config section, e.g. twitchChannelPoints.cfg
+                return ConfigChange({}, [filename], self.config)
+            sections = [section]
+
+        changed = {}
+        for section in sections:
+            new_values = self._load_section(section, content)
+            unsaved = self._unsaved_values.get(section)
+            if unsaved:
+                # Edits made in memory and not written yet win over the file
+                new_values.update(unsaved)
+                self._section_settings[section], new_values, _ = validate_section(section, new_values)
+            diff = ConfigChange.diff(self.config.get(section, {}), new_values)
+            if diff:
+                self.config[section] = new_values
+                changed[section] = diff
+        if changed:
+            self._swap_snapshot()
+        return ConfigChange(changed, (), self.config)
+
+    def _notify(self, change: ConfigChange):
+        for callback, section, keys in self._subscribers:
+            if section is not None:
+                changed_keys = change.sections.get(section)
+                if not changed_keys or (keys is not None and keys.isdisjoint(changed_keys)):
+                    continue
+            try:
+                callback(change)
+            except Exception as e:
+                logger.error(f"Error in config change subscriber: {e}")
+        for callback in self._change_callbacks:
+            try:
+                callback(self.config)
+            except Exception as e:
+                logger.error(f"Error in config change callback: {e}")
 
     async def start(self) -> None:
         self.observer = Observer()
         handler = self.ConfigFileHandler(self)
         self._file_handler = handler  # Store reference to handler
         
-        cfg_paths = [
-            os.path.join(self.base_path, 'cfg')
-        ]
+        # Also watch ./cfg if sections were loaded from there
+        cfg_paths = {os.path.normpath(os.path.join(self.base_path, 'cfg'))}
+        cfg_paths.update(os.path.normpath(os.path.dirname(info['path'])) for info in self._config_parsers.values())
         
-        for path in cfg_paths:
+        for path in sorted(cfg_paths):
             if os.path.exists(path):
                 self.observer.schedule(handler, path, recursive=False)
                 logger.debug(f"Cfg Observer: {path} added")
@@ -292,6 +644,13 @@ class AsyncConfigManager:
 
     async def stop(self) -> None:
         self._shutdown_event.set()
+        for handle in self._pending_reloads.values():
+            handle.cancel()
+        self._pending_reloads.clear()
+        for task in list(self._reload_tasks):
+            task.cancel()
+        if self._dirty_sections:
+            await self.flush_config()
         if self.observer:
             self.observer.stop()
             self.observer.join()
@@ -0,0 +1,239 @@
+import re
+import sys
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Tuple, get_type_hints
+
+# Frozen so a snapshot can be shared freely, slotted where the dataclass module supports it (3.10+)
+_SETTINGS_OPTIONS = {'frozen': True, 'slots': True} if sys.version_info >= (3, 10) else {'frozen': True}
+
+INT_PATTERN = re.compile(r'[+-]?\d+')
+FLOAT_PATTERN = re.compile(r'[+-]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?')
+TRUE_WORDS = frozenset(('true', 'yes', 'on', '1'))
+FALSE_WORDS = frozenset(('false', 'no', 'off', '0'))
+
+
+def parse_scalar(text: str) -> Any:
+    """Best-effort typing of a cfg value without a schema: int, float, bool, or the text itself."""
+    if INT_PATTERN.fullmatch(text):
+        return int(text)
+    if FLOAT_PATTERN.fullmatch(text):
+        return float(text)
+    lowered = text.lower()
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    return text
+
+
+def coerce(value: Any, kind: type) -> Any:
+    """Convert a raw cfg string, or an already typed value, to kind. Raises ValueError if it can't."""
+    if kind is bool:
+        if isinstance(value, bool):
+            return value
+        lowered = str(value).strip().lower()
+        if lowered in TRUE_WORDS:
+            return True
+        if lowered in FALSE_WORDS:
+            return False
+        raise ValueError("expected true or false")
+    if kind is int:
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        text = str(value).strip()
+        if INT_PATTERN.fullmatch(text):
+            return int(text)
+        if FLOAT_PATTERN.fullmatch(text) and float(text).is_integer():
+            return int(float(text))
+        raise ValueError("expected a whole number")
+    if kind is float:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        text = str(value).strip()
+        if FLOAT_PATTERN.fullmatch(text):
+            return float(text)
+        raise ValueError("expected a number")
+    return value if isinstance(value, str) else str(value)
+
+
+class InvalidConfigValue(ValueError):
+    """One cfg key whose value doesn't fit the schema."""
+
+    def __init__(self, section: str, key: str, value: Any, reason: str, default: Any):
+        self.section = section
+        self.key = key
+        self.value = value
+        self.reason = reason
+        self.default = default
+        super().__init__(f"[{section}] {key}={value!r}: {reason}, using {default!r}")
+
+
+def _bounded(default, minimum=0):
+    return field(default=default, metadata={'min': minimum})
+
+
+@dataclass(**_SETTINGS_OPTIONS)
+class TwitchSettings:
+    enabled: bool = False
+    app_id: str = 'notset'
+    app_secret: str = 'notset'
+    channel: str = 'notset'
+    prefix: str = ''
+    channel_points: bool = False
+    chat_rate_limit: int = _bounded(20, 1)
+    chat_rate_limit_mod: int = _bounded(100, 1)
+    chat_batch_replies: bool = True
+    chat_dedupe_window: float = _bounded(30.0)
+    redemption_batch_window: float = _bounded(0.5)
+    reward_concurrency: int = _bounded(8, 1)
+    leftover_rewards: str = 'prompt'
+    leftover_prompt_timeout: float = _bounded(30.0)
+
+
+@dataclass(**_SETTINGS_OPTIONS)
+class ChatShopSettings:
+    enabled: bool = False
+    channel_points: bool = False
+    points_cost: int = _bounded(1000, 1)
+    points_cooldown: int = _bounded(0)
+    usercooldown: float = _bounded(300.0)
+    persist_cooldowns: bool = False
+    announcement_message: str = "The shop is open for {duration} seconds!"
+    open_duration: int = _bounded(60)
+
+
+@dataclass(**_SETTINGS_OPTIONS)
+class EmailSettings:
+    enabled: bool = False
+    channel_points: bool = False
+    points_cost: int = _bounded(1000, 1)
+    points_cooldown: int = _bounded(0)
+    user_cooldown: float = _bounded(60.0)
+    persist_cooldowns: bool = False
+
+
+@dataclass(**_SETTINGS_OPTIONS)
+class HintSettings:
+    enabled: bool = False
+    channel_points: bool = False
+    points_cost: int = _bounded(500, 1)
+    points_cooldown: int = _bounded(0)
+    user_cooldown: float = _bounded(60.0)
+    persist_cooldowns: bool = False
+
+
+@dataclass(**_SETTINGS_OPTIONS)
+class VotingSettings:
+    snapshot_interval: float = _bounded(5.0)
+    delta_updates: bool = False
+    min_update_interval: float = _bounded(0.1)
+    max_update_interval: float = _bounded(5.0)
+
+
+@dataclass(**_SETTINGS_OPTIONS)
+class DirectSettings:
+    enabled: bool = False
+    panel_username: str = ''
+    panel_cooldown: float = _bounded(0.0)
+    panel_photos: bool = False
+    publish_panel: bool = False
+
+
+@dataclass(**_SETTINGS_OPTIONS)
+class MiscSettings:
+    auto_bot_update: bool = False
+
+
+@dataclass(**_SETTINGS_OPTIONS)
+class ConfigSnapshot:
+    """
+    Typed, read-only view of every config section.
+
+    The config manager builds a new snapshot on each reload and swaps it in
+    with one assignment, so a handler that grabs the snapshot once sees
+    consistent values even if a reload lands while it runs.
+    """
+
+    twitch: TwitchSettings = field(default_factory=TwitchSettings)
+    chat_shop: ChatShopSettings = field(default_factory=ChatShopSettings)
+    emails: EmailSettings = field(default_factory=EmailSettings)
+    hints: HintSettings = field(default_factory=HintSettings)
+    voting: VotingSettings = field(default_factory=VotingSettings)
+    direct: DirectSettings = field(default_factory=DirectSettings)
+    misc: MiscSettings = field(default_factory=MiscSettings)
+
+    @property
+    def channel_points_enabled(self) -> bool:
+        """Whether any system uses channel point rewards."""
+        return (self.twitch.channel_points or self.chat_shop.channel_points or
+                self.emails.channel_points or self.hints.channel_points)
+
+
+# Config section name -> (ConfigSnapshot attribute, settings class)
+SECTION_SCHEMAS = {
+    'twitch': ('twitch', TwitchSettings),
+    'chatShop': ('chat_shop', ChatShopSettings),
+    'emails': ('emails', EmailSettings),
+    'hints': ('hints', HintSettings),
+    'voting': ('voting', VotingSettings),
+    'direct': ('direct', DirectSettings),
+    'misc': ('misc', MiscSettings),
+}
+
+_field_types: Dict[type, Dict[str, type]] = {}
+
+
+def validate_section(section: str, raw: Dict[str, Any]) -> Tuple[Any, Dict[str, Any], List[InvalidConfigValue]]:
+    """
+    Check one section's values against its schema.
+
+    raw holds the values as read from the cfg file, or already typed. Keys
+    that don't fit the schema fall back to their default and are reported
+    one by one; keys the schema doesn't know are kept as they are.
+
+    Returns:
+        The settings object (None for a section without a schema), the typed
+        values as a dict, and the invalid values.
+    """
+    values = {key: parse_scalar(value) if isinstance(value, str) else value for key, value in raw.items()}
+    schema = SECTION_SCHEMAS.get(section)
+    if schema is None:
+        return None, values, []
+
+    settings_class = schema[1]
+    types = _field_types.get(settings_class)
+    if types is None:
+        types = _field_types[settings_class] = get_type_hints(settings_class)
+
+    errors = []
+    settings_values = {}
+    for settings_field in fields(settings_class):
+        key = settings_field.name
+        if key not in raw:
+            continue
+        try:
+            value = coerce(raw[key], types[key])
+            minimum = settings_field.metadata.get('min')
+            if minimum is not None and value < minimum:
+                raise ValueError(f"must be at least {minimum}")
+        except ValueError as e:
+            errors.append(InvalidConfigValue(section, key, raw[key], str(e), settings_field.default))
+            value = settings_field.default
+        settings_values[key] = value
+        values[key] = value
+    return settings_class(**settings_values), values, errors
+
+
+def get_settings(config) -> ConfigSnapshot:
+    """
+    The typed snapshot of a config.
+
+    Uses the one the config manager keeps under config['settings'], or builds
+    one from the section dicts for a plain dict config (benchmarks, tools).
+    """
+    snapshot = config.get('settings')
+    if isinstance(snapshot, ConfigSnapshot):
+        return snapshot
+    sections = {}
+    for section, (attribute, _) in SECTION_SCHEMAS.items():
+        settings, _, _ = validate_section(section, config.get(section) or {})
+        sections[attribute] = settings
+    return ConfigSnapshot(**sections)
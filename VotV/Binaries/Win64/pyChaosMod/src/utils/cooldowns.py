@@ -0,0 +1,151 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CooldownStore:
+    """
+    Per-user cooldowns with O(1) checks and expiry as a side effect of use.
+
+    Start times live in a dict, and a heap ordered by start time lets
+    start() drop the expired entries from the front without scanning
+    everything. Since cooldowns are measured against the current duration,
+    changing it (e.g. on config reload) applies to running cooldowns too.
+    At most max_entries users are tracked; past that the oldest cooldown is
+    dropped early. With a state_file, running cooldowns are saved shortly
+    after they change, on a worker thread, and loaded on start, so they
+    survive a restart.
+    """
+
+    def __init__(self, duration: float, max_entries: int = 100_000, state_file: Optional[str] = None,
+                 save_delay: float = 1.0):
+        self.duration = duration
+        self.max_entries = max_entries
+        self.state_file = state_file
+        self.save_delay = save_delay
+        self._started: Dict[Hashable, float] = {}
+        self._heap: List[Tuple[float, Hashable]] = []
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self._save_task: Optional[asyncio.Task] = None
+        if state_file:
+            self.load()
+
+    def __len__(self):
+        return len(self._started)
+
+    def __contains__(self, key):
+        return self.remaining(key) > 0
+
+    def remaining(self, key: Hashable, now: Optional[float] = None) -> float:
+        """Seconds left on key's cooldown, 0 if it has none."""
+        started = self._started.get(key)
+        if started is None:
+            return 0.0
+        left = self.duration - ((time.time() if now is None else now) - started)
+        return left if left > 0 else 0.0
+
+    def start(self, key: Hashable, now: Optional[float] = None):
+        """Start (or restart) key's cooldown."""
+        now = time.time() if now is None else now
+        self.expire(now)
+        self._started[key] = now
+        heapq.heappush(self._heap, (now, key))
+        while len(self._started) > self.max_entries:
+            self._pop_oldest()
+        self._schedule_save()
+
+    def clear(self):
+        self._started.clear()
+        self._heap.clear()
+        self._schedule_save()
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drop expired cooldowns. Returns how many were dropped."""
+        cutoff = (time.time() if now is None else now) - self.duration
+        dropped = 0
+        heap = self._heap
+        while heap and heap[0][0] <= cutoff:
+            dropped += self._pop_oldest()
+        return dropped
+
+    def _pop_oldest(self) -> int:
+        started, key = heapq.heappop(self._heap)
+        # Restarted cooldowns leave their old heap entry behind, only the current one counts
+        if self._started.get(key) == started:
+            del self._started[key]
+            return 1
+        return 0
+
+    def _schedule_save(self):
+        if not self.state_file or self._save_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+        self._save_handle = loop.call_later(self.save_delay, self._start_save)
+
+    def _start_save(self):
+        self._save_handle = None
+        if self._save_task is not None and not self._save_task.done():
+            # Still writing the previous state, write again once it is done so writes never overlap
+            self._schedule_save()
+            return
+        self._save_task = asyncio.create_task(self.save_async())
+
+    def _serialize(self) -> str:
+        self.expire()
+        return json.dumps({str(key): started for key, started in self._started.items()})
+
+    def _write(self, content: str):
+        try:
+            temp_file = f"{self.state_file}.tmp"
+            with open(temp_file, 'w') as f:
+                f.write(content)
+            os.replace(temp_file, self.state_file)
+        except OSError as e:
+            logger.error(f"Failed to save cooldowns to {self.state_file}: {e}")
+
+    async def flush(self):
+        """Write a change still waiting for its delayed save now, e.g. on shutdown."""
+        pending = self._save_handle is not None
+        if pending:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if self._save_task is not None and not self._save_task.done():
+            await self._save_task
+        if pending:
+            await self.save_async()
+
+    async def save_async(self):
+        """Write running cooldowns to state_file without blocking the event loop."""
+        if self.state_file:
+            await asyncio.to_thread(self._write, self._serialize())
+
+    def save(self):
+        """Write running cooldowns to state_file, blocking until written."""
+        if self.state_file:
+            self._write(self._serialize())
+
+    def load(self):
+        """Load the cooldowns saved in state_file that are still running."""
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                saved = json.load(f)
+            cutoff = time.time() - self.duration
+            for key, started in saved.items():
+                if started > cutoff:
+                    self._started[key] = started
+                    self._heap.append((started, key))
+            heapq.heapify(self._heap)
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            logger.error(f"Failed to load cooldowns from {self.state_file}: {e}")
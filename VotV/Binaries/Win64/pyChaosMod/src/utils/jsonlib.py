@@ -0,0 +1,35 @@
+"""
+JSON backend for hot message paths.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise. dumps() always returns str and produces compact output, with
+non-ASCII characters as raw UTF-8 under orjson. dumps_ascii() produces the
+standard library's default output for peers that may not parse that.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    BACKEND = 'orjson'
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can catch either
+    JSONDecodeError = orjson.JSONDecodeError
+    loads = orjson.loads
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode('utf-8')
+else:
+    BACKEND = 'json'
+    JSONDecodeError = json.JSONDecodeError
+    loads = json.loads
+
+    def dumps(obj) -> str:
+        return json.dumps(obj, separators=(',', ':'))
+
+
+def dumps_ascii(obj) -> str:
+    """Serialize like json.dumps with its defaults: ', ' and ': ' separators, non-ASCII escaped."""
+    return json.dumps(obj)
@@ -0,0 +1,70 @@
+from array import array
+from typing import Hashable, List
+
+
+class VoteTally:
+    """
+    Fixed-size vote counter for a single voting round.
+
+    Incoming votes are added to a pending array and only folded into the
+    published counts when commit() is called by the update loop, so the chat
+    hot path is a set lookup plus an integer increment with no logging.
+    Everything runs on the event loop thread, so no locking is needed.
+    """
+
+    __slots__ = ('num_options', 'counts', 'voters', 'total', '_pending', '_pending_total')
+
+    def __init__(self, num_options: int = 0):
+        self.reset(num_options)
+
+    def reset(self, num_options: int) -> None:
+        """Clear all votes and size the tally for a new round."""
+        self.num_options = max(0, int(num_options))
+        self.counts = array('L', bytes(self.num_options * array('L').itemsize))
+        self._pending = array('L', bytes(self.num_options * array('L').itemsize))
+        self._pending_total = 0
+        self.voters = set()
+        self.total = 0
+
+    def add(self, voter_id: Hashable, option: int) -> bool:
+        """
+        Record a vote for a 1-based option number.
+
+        Returns False if the option is out of range or the voter already voted.
+        """
+        if option < 1 or option > self.num_options:
+            return False
+        voters = self.voters
+        if voter_id in voters:
+            return False
+        voters.add(voter_id)
+        self._pending[option - 1] += 1
+        self._pending_total += 1
+        return True
+
+    @property
+    def has_pending(self) -> bool:
+        return self._pending_total > 0
+
+    def commit(self) -> List[int]:
+        """Fold pending votes into the published counts and return the changed option indices."""
+        if not self._pending_total:
+            return []
+
+        changed = []
+        counts = self.counts
+        pending = self._pending
+        for i in range(self.num_options):
+            added = pending[i]
+            if added:
+                counts[i] += added
+                pending[i] = 0
+                changed.append(i)
+
+        self.total += self._pending_total
+        self._pending_total = 0
+        return changed
+
+    def snapshot(self) -> List[int]:
+        """Return the committed vote counts as a list, indexed by option."""
+        return self.counts.tolist()
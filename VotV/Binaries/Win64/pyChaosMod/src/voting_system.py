@@ -1,71 +1,273 @@
 import logging
 import asyncio
-import json
+import time
+from collections import deque
+
+from src.game_connection.message_bus import PRIORITY_VOTES
+from src.game_connection.sessions import DEFAULT_SESSION
+from src.utils.config_schema import get_settings
+from src.vote_tally import VoteTally
+
+
+class VoteUpdateMetrics:
+    """Latency and rate of emitted vote updates."""
+
+    RATE_WINDOW = 10.0  # Seconds of history used for the update rate
+
+    def __init__(self):
+        self.updates_sent = 0
+        self.last_latency = 0.0
+        self.avg_latency = 0.0
+        self.max_latency = 0.0
+        self.current_interval = 0.0
+        self._sent_times = deque()
+
+    def record_update(self, now, latency=None):
+        """Record an emitted update. latency is the age of the oldest vote it carried."""
+        self.updates_sent += 1
+        self._sent_times.append(now)
+        while self._sent_times and now - self._sent_times[0] > self.RATE_WINDOW:
+            self._sent_times.popleft()
+
+        if latency is not None:
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            # Exponential moving average keeps this O(1)
+            self.avg_latency = latency if self.avg_latency == 0 else self.avg_latency * 0.9 + latency * 0.1
+
+    def as_dict(self):
+        now = time.monotonic()
+        recent = sum(1 for t in self._sent_times if now - t <= self.RATE_WINDOW)
+        return {
+            "updates_sent": self.updates_sent,
+            "updates_per_second": round(recent / self.RATE_WINDOW, 2),
+            "latency_ms_last": round(self.last_latency * 1000, 1),
+            "latency_ms_avg": round(self.avg_latency * 1000, 1),
+            "latency_ms_max": round(self.max_latency * 1000, 1),
+            "current_interval_ms": round(self.current_interval * 1000, 1),
+        }
+
+
+class VoteRound:
+    """Voting state of a single game session."""
+
+    __slots__ = ('session', 'active', 'tally', 'num_options', 'option_names', 'update_seq',
+                 'last_snapshot_time', 'snapshot_requested', 'first_pending_at')
+
+    def __init__(self, session):
+        self.session = session
+        self.active = False
+        self.tally = VoteTally()
+        self.num_options = 0
+        self.option_names = []
+        # Change tracking for vote_update messages
+        self.update_seq = 0
+        self.last_snapshot_time = 0.0
+        self.snapshot_requested = True
+        self.first_pending_at = None
+
+    def open(self, num_options, option_names=None):
+        self.active = True
+        self.num_options = num_options
+        self.option_names = option_names or [f"Option {i+1}" for i in range(num_options)]
+        self.tally.reset(num_options)
+        self.first_pending_at = None
+        self.snapshot_requested = True
+
 
 class VotingSystem:
+    """
+    Chat voting for every connected game session.
+
+    Each session runs its own voting round with its own tally. A vote in
+    chat counts towards every round that is open. The overlay shows the
+    round of the primary session.
+    """
+
     def __init__(self, config):
         self.config = config
-        self.voting_active = False
-        self.votes = {}  # key: option number, value: vote count
-        self.voters = set()
-        self.num_options = 0
-        self.option_names = []  # Store option names
+        self.settings = get_settings(config).voting
+        self.rounds = {}  # session name -> VoteRound
+        self._active_rounds = []
+        self.primary_session = DEFAULT_SESSION
         self.websocket_handler = None
         self.overlay_server = None  # Reference to overlay server
         self.logger = logging.getLogger(__name__)
         self._vote_update_task = None
+        # Adaptive update cadence
+        self._votes_pending = asyncio.Event()
+        self.metrics = VoteUpdateMetrics()
 
     def set_websocket_handler(self, websocket_handler):
         self.websocket_handler = websocket_handler
         
     def set_overlay_server(self, overlay_server):
         self.overlay_server = overlay_server
+
+    def set_primary_session(self, session):
+        """Show the voting round of this session on the overlay."""
+        if session != self.primary_session:
+            self.primary_session = session
+            if self.overlay_server:
+                asyncio.create_task(self.overlay_server.send_voting_update())
+
+    @property
+    def primary_round(self):
+        vote_round = self.rounds.get(self.primary_session)
+        if vote_round is None:
+            vote_round = self.rounds[self.primary_session] = VoteRound(self.primary_session)
+        return vote_round
+
+    @property
+    def voting_active(self):
+        return self.primary_round.active
+
+    @property
+    def accepting_votes(self):
+        """True while any session has a vote open. Cheap enough to check for every chat message."""
+        return bool(self._active_rounds)
+
+    @property
+    def tally(self):
+        return self.primary_round.tally
+
+    @property
+    def num_options(self):
+        return self.primary_round.num_options
+
+    @property
+    def option_names(self):
+        return self.primary_round.option_names
+
+    @property
+    def update_seq(self):
+        return self.primary_round.update_seq
+
+    def request_snapshot(self, session=None):
+        """Send a full vote snapshot on the next update instead of a delta, to one session or all."""
+        for vote_round in self.rounds.values():
+            if session is None or vote_round.session == session:
+                vote_round.snapshot_requested = True
         
     async def send_votes_update(self):
-        """Send current votes to the game via WebSocket."""
-        if self.websocket_handler and self.websocket_handler.game_connection:
+        """
+        Send vote changes to the game sessions and overlay.
+
+        Nothing is sent for a round if no votes changed since its last update.
+        A full snapshot goes out every `snapshot_interval` seconds (voting.cfg)
+        or when one was requested; otherwise only the changed options are sent.
+        """
+        for vote_round in list(self._active_rounds):
+            await self._send_round_update(vote_round)
+
+    async def _send_round_update(self, vote_round):
+        # Fold buffered chat votes into the tally before publishing
+        changed = vote_round.tally.commit()
+        now = time.monotonic()
+        settings = self.settings
+        snapshot_due = vote_round.snapshot_requested or now - vote_round.last_snapshot_time >= settings.snapshot_interval
+        if not changed and not snapshot_due:
+            return
+
+        vote_round.update_seq += 1
+        vote_counts = vote_round.tally.snapshot()
+        changes = [[i, vote_counts[i]] for i in changed]
+        if snapshot_due:
+            vote_round.snapshot_requested = False
+            vote_round.last_snapshot_time = now
+
+        latency = None
+        if changed and vote_round.first_pending_at is not None:
+            latency = now - vote_round.first_pending_at
+        vote_round.first_pending_at = None
+        self.metrics.record_update(now, latency)
+
+        if self.websocket_handler:
             try:
-                # Convert votes to array format
-                vote_counts = [self.votes.get(i, 0) for i in range(self.num_options)]
-                
-                message = {
-                    "type": "vote_update",
-                    "votes": vote_counts
-                }
+                if snapshot_due or not settings.delta_updates:
+                    message = {
+                        "type": "vote_update",
+                        "seq": vote_round.update_seq,
+                        "votes": vote_counts
+                    }
+                    # A newer full snapshot supersedes one that hasn't gone out yet
+                    coalesce_key = "vote_update"
+                else:
+                    message = {
+                        "type": "vote_delta",
+                        "seq": vote_round.update_seq,
+                        "changes": changes
+                    }
+                    coalesce_key = None
                 
-                await self.websocket_handler.game_connection.send(json.dumps(message))
-                self.logger.debug(f"Sent vote update: {vote_counts}")
+                # Vote counts are stale by the time the game reconnects, so never replay them
+                if await self.websocket_handler.send_to_game(message, PRIORITY_VOTES, coalesce_key, ttl=0,
+                                                             session=vote_round.session):
+                    self.logger.debug(f"Sent vote update {vote_round.update_seq} to {vote_round.session}: {vote_counts}")
+                else:
+                    self.logger.error(f"Game session {vote_round.session} is not connected to send vote update")
             except Exception as e:
                 self.logger.error(f"Failed to send vote update: {e}")
         else:
             self.logger.error("No game connection available to send vote update")
             
         # Also send to overlay server
-        if self.overlay_server:
+        if self.overlay_server and vote_round.session == self.primary_session:
             try:
-                await self.overlay_server.send_voting_update()
+                if snapshot_due:
+                    await self.overlay_server.send_voting_update()
+                else:
+                    await self.overlay_server.send_voting_delta(vote_round.update_seq, changes, vote_round.tally.total)
             except Exception as e:
                 self.logger.error(f"Failed to send overlay update: {e}")
 
+    def get_update_intervals(self):
+        """Get the (min, max) vote update intervals in seconds from voting.cfg."""
+        min_interval = self.settings.min_update_interval
+        max_interval = self.settings.max_update_interval
+        if min_interval <= 0:
+            min_interval = 0.1
+        if max_interval < min_interval:
+            max_interval = max(min_interval, 5)
+        return min_interval, max_interval
+
     async def vote_update_loop(self):
-        """Continuously send vote updates while voting is active."""
-        while True:
+        """
+        Send vote updates while any voting round is open.
+
+        When votes are arriving, updates are coalesced for `min_update_interval`
+        and flushed. When idle, the loop backs off towards `max_update_interval`
+        heartbeats, which still deliver periodic snapshots.
+        """
+        interval = 0
+        while self._active_rounds:
             try:
-                if self.voting_active:
-                    await self.send_votes_update()
-                    await asyncio.sleep(1)  # Update interval is 1 second
-                else:
-                    # Voting is not active, exit the loop
-                    break
+                min_interval, max_interval = self.get_update_intervals()
+                try:
+                    await asyncio.wait_for(self._votes_pending.wait(), timeout=max(interval, min_interval))
+                    # Votes are arriving: let a short burst accumulate before flushing
+                    await asyncio.sleep(min_interval)
+                    interval = min_interval
+                except asyncio.TimeoutError:
+                    interval = min(max(interval, min_interval) * 2, max_interval)
+                self._votes_pending.clear()
+                self.metrics.current_interval = interval
+                await self.send_votes_update()
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 self.logger.error(f"Error in vote update loop: {e}")
                 await asyncio.sleep(1)
 
+    def get_metrics(self):
+        """Get vote update latency and rate metrics."""
+        metrics = self.metrics.as_dict()
+        metrics["open_rounds"] = [vote_round.session for vote_round in self._active_rounds]
+        return metrics
+
     def start_vote_updates(self):
         """Start the vote update task."""
-        if not self._vote_update_task:
+        if not self._vote_update_task or self._vote_update_task.done():
             self._vote_update_task = asyncio.create_task(self.vote_update_loop())
 
     def stop_vote_updates(self):
@@ -74,71 +276,97 @@ class VotingSystem:
             self._vote_update_task.cancel()
             self._vote_update_task = None
 
-    def process_vote(self, username, vote):
-        """Process a vote from a user."""
-        if self.voting_active and 1 <= vote <= self.num_options and username not in self.voters:
-            self.logger.debug(f"Received vote from {username}: {vote}")
-            self.votes[vote - 1] = self.votes.get(vote - 1, 0) + 1
-            self.voters.add(username)
+    def process_vote(self, voter_id, vote):
+        """
+        Process a vote from a user, counting it in every open voting round.
+
+        This runs for every vote in chat, so it deliberately does no logging.
+        voter_id should be the Twitch user ID, which is stable across renames.
+        """
+        counted = False
+        for vote_round in self._active_rounds:
+            if vote_round.tally.add(voter_id, vote):
+                counted = True
+                if vote_round.first_pending_at is None:
+                    vote_round.first_pending_at = time.monotonic()
+        if counted and not self._votes_pending.is_set():
+            self._votes_pending.set()
+        return counted
+
+    def get_vote_counts(self):
+        """Get the committed vote counts of the primary session, indexed by option."""
+        return self.primary_round.tally.snapshot()
+
+    def set_voting_active(self, active, num_options=0, option_names=None, session=DEFAULT_SESSION):
+        """Set a session's voting status, number of options, and option names."""
+        vote_round = self.rounds.get(session)
+        if vote_round is None:
+            vote_round = self.rounds[session] = VoteRound(session)
+        if active == vote_round.active:
+            return
+
+        if active:
+            self.logger.debug(f"Voting opened in {session} with {num_options} options")
+            vote_round.open(num_options, option_names)
+            self._active_rounds.append(vote_round)
+            self.start_vote_updates()
+            return
+
+        self.logger.debug(f"Voting closed in {session}")
+        vote_round.active = False
+        self._active_rounds.remove(vote_round)
+
+        # Determine winner before clearing data
+        vote_round.tally.commit()
+        winner = self.get_winning_option(vote_round)
+
+        vote_round.tally.voters.clear()
+        if not self._active_rounds:
+            self.stop_vote_updates()
+
+        if session != self.primary_session:
+            return
+        # Send result to overlay if there was a winner
+        if winner and self.overlay_server:
+            asyncio.create_task(self.overlay_server.send_voting_result(winner))
+            # Don't send the voting update immediately - let the result display first
         else:
-            self.logger.debug(f"Ignored vote from {username}: {vote}, voting_active={self.voting_active}, num_options={self.num_options}, username in voters={username in self.voters}")
-
-    def set_voting_active(self, active, num_options=0, option_names=None):
-        """Set the voting status, number of options, and option names."""
-        if active != self.voting_active:
-            self.voting_active = active
-            if active:
-                self.logger.debug(f"Voting opened with {num_options} options")
-                self.num_options = num_options
-                self.option_names = option_names or [f"Option {i+1}" for i in range(num_options)]
-                self.votes = {i: 0 for i in range(num_options)}
-                self.voters.clear()
-                self.start_vote_updates()
-            else:
-                self.logger.debug("Voting closed")
-                
-                # Determine winner before clearing data
-                winner = self.get_winning_option()
-                
-                self.voters.clear()
-                self.stop_vote_updates()
-                
-                # Send result to overlay if there was a winner
-                if winner and self.overlay_server:
-                    asyncio.create_task(self.overlay_server.send_voting_result(winner))
-                    # Don't send the voting update immediately - let the result display first
-                else:
-                    # No winner, safe to hide immediately
-                    if self.overlay_server:
-                        asyncio.create_task(self.overlay_server.send_voting_update())
+            # No winner, safe to hide immediately
+            if self.overlay_server:
+                asyncio.create_task(self.overlay_server.send_voting_update())
 
-    def get_winning_option(self):
-        """Get the winning option name."""
-        if not self.votes or not self.option_names:
+    def get_winning_option(self, vote_round=None):
+        """Get the winning option name of a voting round, by default the primary session's."""
+        if vote_round is None:
+            vote_round = self.primary_round
+        vote_counts = vote_round.tally.snapshot()
+        option_names = vote_round.option_names
+        if not vote_counts or not option_names:
             return None
             
         # Find the option with the most votes
-        max_votes = max(self.votes.values()) if self.votes.values() else 0
+        max_votes = max(vote_counts)
         if max_votes == 0:
             return None
             
         # Find all options with max votes (handle ties)
-        winning_indices = [i for i, votes in self.votes.items() if votes == max_votes]
+        winning_indices = [i for i, votes in enumerate(vote_counts) if votes == max_votes]
         
         if len(winning_indices) == 1:
             winning_index = winning_indices[0]
-            if winning_index < len(self.option_names):
-                return f"{winning_index + 1}. {self.option_names[winning_index]} ({max_votes} votes)"
+            if winning_index < len(option_names):
+                return f"{winning_index + 1}. {option_names[winning_index]} ({max_votes} votes)"
         else:
             # Handle tie
             tied_options = []
             for i in winning_indices:
-                if i < len(self.option_names):
-                    tied_options.append(f"{i + 1}. {self.option_names[i]}")
+                if i < len(option_names):
+                    tied_options.append(f"{i + 1}. {option_names[i]}")
             if tied_options:
                 return f"Tie between: {', '.join(tied_options)} ({max_votes} votes each)"
                 
         return None
 
     def update_config(self, config):
-        self.config = config
\ No newline at end of file
+        self.config = config
+        self.settings = get_settings(config).voting
\ No newline at end of file